@@ -0,0 +1,220 @@
+"""
+Versioned schema migrations, run once per deploy before the API workers start:
+
+    python migrate.py
+
+Creates any missing tables from the models, applies every pending
+sql/migrations/NNNN_*.sql file in order (each in its own transaction,
+recorded in schema_migrations), then re-applies sql/audit_setup.sql so new
+tables get their audit triggers. A PostgreSQL advisory lock makes
+concurrent runs wait instead of racing.
+
+With ATTENDANCE_TIMESCALE=true, attendance is then turned into a TimescaleDB
+hypertable with continuous aggregates and compression (see setup_timescale).
+When the extension is not installed on the server this step is skipped and
+attendance stays a plain PostgreSQL table.
+"""
+import logging
+import os
+import re
+
+from sqlalchemy import text
+
+from db import db
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+MIGRATIONS_DIR = os.path.join(SQL_DIR, 'migrations')
+AUDIT_SETUP_PATH = os.path.join(SQL_DIR, 'audit_setup.sql')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+ADVISORY_LOCK_KEY = 827310001
+
+ATTENDANCE_TIMESCALE = os.getenv('ATTENDANCE_TIMESCALE', 'false').lower() == 'true'
+# Chunks are compressed once every date in them is older than this; keep it
+# beyond the window in which attendance is still corrected
+ATTENDANCE_COMPRESS_AFTER_DAYS = int(os.getenv('ATTENDANCE_COMPRESS_AFTER_DAYS', '180'))
+ATTENDANCE_CHUNK_INTERVAL = os.getenv('ATTENDANCE_CHUNK_INTERVAL', '1 month')
+
+# Continuous aggregates over attendance: (view name, grouping column, bucket width)
+ATTENDANCE_PRESENCE_VIEWS = (
+    ('attendance_class_daily', 'class_id', '1 day'),
+    ('attendance_class_weekly', 'class_id', '1 week'),
+    ('attendance_student_daily', 'student_id', '1 day'),
+    ('attendance_student_weekly', 'student_id', '1 week'),
+)
+
+
+def list_migrations():
+    """Return [(version, name, path)] for every migration file, in version order"""
+    migrations = []
+    for file_name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, file_name)))
+    return migrations
+
+
+def _read_sql(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def run_migrations(engine):
+    """Bring the database schema up to date. Returns the versions applied."""
+    applied_now = []
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    " version VARCHAR(20) PRIMARY KEY,"
+                    " name VARCHAR(200) NOT NULL,"
+                    " applied_at TIMESTAMP NOT NULL DEFAULT now())"
+                ))
+                # New tables come straight from the models; existing ones are left to migrations
+                db.metadata.create_all(bind=conn)
+
+            already_applied = {
+                row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))
+            }
+            conn.commit()
+
+            for version, name, path in list_migrations():
+                if version in already_applied:
+                    continue
+                logging.info("Applying migration %s_%s", version, name)
+                with conn.begin():
+                    conn.execute(text(_read_sql(path)))
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                        {"version": version, "name": name}
+                    )
+                applied_now.append(version)
+
+            # Audit triggers and RLS are idempotent and must cover newly created tables
+            with conn.begin():
+                conn.execute(text(_read_sql(AUDIT_SETUP_PATH)))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            conn.commit()
+    return applied_now
+
+
+def _convert_attendance_to_hypertable(conn):
+    # Unique indexes on a hypertable must contain the partitioning column;
+    # uq_attendance_student_class_date already does, the primary key becomes (_id, date)
+    conn.execute(text("""
+        DO $$
+        DECLARE
+            pk_name TEXT;
+        BEGIN
+            SELECT conname INTO pk_name FROM pg_constraint
+            WHERE conrelid = 'attendance'::regclass AND contype = 'p';
+            IF pk_name IS NOT NULL THEN
+                EXECUTE format('ALTER TABLE attendance DROP CONSTRAINT %I', pk_name);
+            END IF;
+            ALTER TABLE attendance ADD CONSTRAINT attendance_pkey PRIMARY KEY (_id, date);
+        END $$;
+    """))
+    conn.execute(
+        text("SELECT create_hypertable('attendance', 'date',"
+             " chunk_time_interval => CAST(:chunk AS INTERVAL), migrate_data => true)"),
+        {"chunk": ATTENDANCE_CHUNK_INTERVAL}
+    )
+
+
+def _create_presence_view(conn, view, key, width):
+    present = "sum(CASE WHEN status = '{0}' THEN 1 ELSE 0 END) AS {0}_count"
+    conn.execute(text(
+        f"CREATE MATERIALIZED VIEW {view}"
+        " WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS"
+        f" SELECT time_bucket(INTERVAL '{width}', date) AS bucket, {key},"
+        f" {present.format('present')}, {present.format('absent')},"
+        f" {present.format('late')}, {present.format('excused')},"
+        " count(*) AS total_count"
+        f" FROM attendance GROUP BY bucket, {key}"
+        " WITH NO DATA"
+    ))
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{view}_{key} ON {view} ({key}, bucket)"))
+    conn.execute(text(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL)"))
+    # Refreshes only recompute invalidated buckets, so covering all history stays cheap
+    # and corrections to old dates still reach the aggregates
+    conn.execute(text(
+        f"SELECT add_continuous_aggregate_policy('{view}', start_offset => NULL,"
+        " end_offset => INTERVAL '1 day', schedule_interval => INTERVAL '1 hour', if_not_exists => true)"
+    ))
+
+
+def setup_timescale(engine):
+    """
+    Optional TimescaleDB mode for attendance. Idempotent; returns True when
+    the hypertable, continuous aggregates and compression policy are in place,
+    False when TimescaleDB is unavailable (attendance stays a plain table).
+    """
+    # Continuous aggregates cannot be created inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            return _setup_timescale_locked(engine, conn)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def _setup_timescale_locked(engine, conn):
+    available = conn.execute(text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'"
+    )).first()
+    if not available:
+        logging.warning("TimescaleDB is not available on this server; attendance stays a plain table")
+        return False
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+    except Exception as e:
+        # Typically timescaledb missing from shared_preload_libraries
+        logging.warning("Could not enable TimescaleDB, attendance stays a plain table: %s", e)
+        return False
+
+    hypertable = conn.execute(text(
+        "SELECT compression_enabled FROM timescaledb_information.hypertables"
+        " WHERE hypertable_name = 'attendance'"
+    )).first()
+    if hypertable is None:
+        logging.info("Converting attendance to a hypertable partitioned on date")
+        with engine.begin() as tx:
+            _convert_attendance_to_hypertable(tx)
+
+    existing_views = {
+        row[0] for row in conn.execute(text(
+            "SELECT view_name FROM timescaledb_information.continuous_aggregates"
+        ))
+    }
+    for view, key, width in ATTENDANCE_PRESENCE_VIEWS:
+        if view not in existing_views:
+            logging.info("Creating continuous aggregate %s", view)
+            _create_presence_view(conn, view, key, width)
+
+    if hypertable is None or not hypertable[0]:
+        conn.execute(text(
+            "ALTER TABLE attendance SET (timescaledb.compress,"
+            " timescaledb.compress_segmentby = 'class_id',"
+            " timescaledb.compress_orderby = 'date DESC, student_id')"
+        ))
+    conn.execute(
+        text("SELECT add_compression_policy('attendance',"
+             " compress_after => make_interval(days => :days), if_not_exists => true)"),
+        {"days": ATTENDANCE_COMPRESS_AFTER_DAYS}
+    )
+    return True
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    # Importing the app registers every model and configures the database URI
+    from webPlatform_api import app
+
+    with app.app_context():
+        applied = run_migrations(db.engine)
+        if ATTENDANCE_TIMESCALE:
+            setup_timescale(db.engine)
+    logging.info("Schema up to date (%d migration(s) applied)", len(applied))
@@ -8,6 +8,10 @@ class AssignmentModel(db.Model):
     Links to subject, class, term, and assessment type
     """
     __tablename__ = 'assignment'
+    __table_args__ = (
+        db.Index('idx_assignment_class_term', 'class_id', 'term_id'),
+        db.Index('idx_assignment_subject_term', 'subject_id', 'term_id'),
+    )
 
     _id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(200), nullable=False)
@@ -64,7 +68,8 @@ class AssignmentModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def find_by_class(cls, class_id):
@@ -86,6 +91,21 @@ class AssignmentModel(db.Model):
         """Get assignments for a specific class in a specific term"""
         return cls.query.filter_by(class_id=class_id, term_id=term_id).all()
 
+    @classmethod
+    def find_published_with_types(cls, class_id, term_id=None):
+        """
+        Get published assignments for a class (optionally a term) together with
+        their assessment type in one query.
+        Returns a list of (assignment, assessment_type) tuples; the type may be None.
+        """
+        from models.assessment_type import AssessmentTypeModel
+        query = db.session.query(cls, AssessmentTypeModel).outerjoin(
+            AssessmentTypeModel, AssessmentTypeModel._id == cls.assessment_type_id
+        ).filter(cls.class_id == class_id, cls.status == 'published')
+        if term_id:
+            query = query.filter(cls.term_id == term_id)
+        return query.order_by(cls.due_date, cls.created_date).all()
+
     @classmethod
     def find_by_status(cls, status):
         """Get all assignments with a specific status"""
@@ -95,3 +115,19 @@ class AssignmentModel(db.Model):
     def find_all(cls):
         return cls.query.all()
 
+    @classmethod
+    def filter_query(cls, class_id=None, term_id=None, subject_id=None, status=None, teacher_id=None):
+        """Unexecuted query for the assignment list filters"""
+        query = cls.query
+        if class_id:
+            query = query.filter(cls.class_id == class_id)
+        if term_id:
+            query = query.filter(cls.term_id == term_id)
+        if subject_id:
+            query = query.filter(cls.subject_id == subject_id)
+        if status:
+            query = query.filter(cls.status == status)
+        if teacher_id:
+            query = query.filter(cls.created_by == teacher_id)
+        return query
+
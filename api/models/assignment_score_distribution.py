@@ -0,0 +1,68 @@
+from db import db
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+class AssignmentScoreDistributionModel(db.Model):
+    """
+    Assignment Score Distribution Model - Snapshot of an assignment's graded score percentages
+    Maintained by triggers on student_assignment and assignment
+    (sql/migrations/0007_assignment_score_distribution.sql); never written by the API directly
+    """
+    __tablename__ = 'assignment_score_distribution'
+    __table_args__ = (
+        db.Index('idx_assignment_score_distribution_class', 'class_id'),
+    )
+
+    assignment_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('assignment._id', ondelete='CASCADE'), primary_key=True)
+    class_id = db.Column(db.UUID(as_uuid=True), nullable=False)
+    graded_count = db.Column(db.Integer, nullable=False)
+    mean_score = db.Column(db.Float, nullable=False)
+    min_score = db.Column(db.Float, nullable=False)
+    max_score = db.Column(db.Float, nullable=False)
+    p25_score = db.Column(db.Float, nullable=False)
+    median_score = db.Column(db.Float, nullable=False)
+    p75_score = db.Column(db.Float, nullable=False)
+    p90_score = db.Column(db.Float, nullable=False)
+    # Counts per 10-point bucket: 0-10, 10-20, ..., 90-100 (the last one includes 100 and above)
+    histogram = db.Column(ARRAY(db.Integer), nullable=False)
+    # Every graded percentage, ascending
+    scores = db.Column(ARRAY(db.Float), nullable=False)
+    updated_at = db.Column(db.TIMESTAMP, nullable=False, server_default=db.func.now())
+
+    def json(self):
+        return {
+            'assignment_id': str(self.assignment_id),
+            'class_id': str(self.class_id),
+            'graded_count': self.graded_count,
+            'mean': self.mean_score,
+            'min': self.min_score,
+            'max': self.max_score,
+            'p25': self.p25_score,
+            'median': self.median_score,
+            'p75': self.p75_score,
+            'p90': self.p90_score,
+            'histogram': list(self.histogram or []),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def find_by_assignments(cls, assignment_ids):
+        """Snapshots for a set of assignments in one query (assignments without graded scores have none)"""
+        assignment_ids = list(assignment_ids)
+        if not assignment_ids:
+            return []
+        return cls.query.filter(cls.assignment_id.in_(assignment_ids)).all()
+
+    @classmethod
+    def refresh(cls, assignment_ids=None):
+        """
+        Recompute the snapshots of the given assignments (all when None)
+        and commit. Returns the number of snapshot rows written.
+        """
+        written = db.session.execute(
+            text("SELECT refresh_assignment_score_distribution(CAST(:ids AS UUID[]))"),
+            {'ids': [str(_id) for _id in assignment_ids] if assignment_ids is not None else None}
+        ).scalar()
+        db.session.commit()
+        return written
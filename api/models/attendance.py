@@ -1,9 +1,15 @@
 from db import db
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class AttendanceModel(db.Model):
     __tablename__ = 'attendance'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', 'date', name='uq_attendance_student_class_date'),
+        db.Index('idx_attendance_class_date', 'class_id', 'date'),
+    )
 
     _id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('student._id'), nullable=False)
@@ -52,6 +58,32 @@ class AttendanceModel(db.Model):
     @classmethod
     def find_all(cls):
         return cls.query.all()
+
+    @classmethod
+    def filter_query(cls, student_id=None, class_id=None, start_date=None, end_date=None,
+                     subject_id=None, term_id=None, year_id=None):
+        """Unexecuted query for the attendance list filters; class filters join the class table"""
+        query = cls.query
+        if student_id:
+            query = query.filter(cls.student_id == student_id)
+        if class_id:
+            query = query.filter(cls.class_id == class_id)
+        if start_date:
+            query = query.filter(cls.date >= start_date)
+        if end_date:
+            query = query.filter(cls.date <= end_date)
+        if subject_id or term_id or year_id:
+            from models.class_model import ClassModel
+            query = query.join(ClassModel, ClassModel._id == cls.class_id)
+            if subject_id:
+                query = query.filter(ClassModel.subject_id == subject_id)
+            if term_id:
+                query = query.filter(ClassModel.term_id == term_id)
+            if year_id:
+                from models.term import TermModel
+                query = query.join(TermModel, TermModel._id == ClassModel.term_id)
+                query = query.filter(TermModel.year_id == year_id)
+        return query
     
     @classmethod
     def find_by_student_id(cls, student_id):
@@ -100,6 +132,130 @@ class AttendanceModel(db.Model):
                 return None
         return cls.query.filter_by(student_id=student_id, class_id=class_id, date=date).first()
     
+    @classmethod
+    def class_view_query(cls, class_id, subject_id, term_id, year_id=None):
+        """
+        Unexecuted query behind the class attendance view, as one join.
+        Covers every student enrolled in any class sharing class_id's name,
+        subject and term, and returns their attendance in classes of that
+        subject and term (and school year, if given).
+        Rows are (AttendanceModel, given_name, surname, class_name).
+        """
+        from models.class_model import ClassModel
+        from models.student import StudentModel
+        from models.student_class import StudentClassModel
+        from models.term import TermModel
+
+        target_class = aliased(ClassModel)
+        enrolled_class = aliased(ClassModel)
+        enrolled_students = db.session.query(StudentClassModel.student_id).join(
+            enrolled_class, enrolled_class._id == StudentClassModel.class_id
+        ).join(
+            target_class, target_class.class_name == enrolled_class.class_name
+        ).filter(
+            target_class._id == class_id,
+            enrolled_class.subject_id == subject_id,
+            enrolled_class.term_id == term_id
+        )
+
+        query = db.session.query(
+            cls, StudentModel.given_name, StudentModel.surname, ClassModel.class_name
+        ).join(
+            ClassModel, ClassModel._id == cls.class_id
+        ).outerjoin(
+            StudentModel, StudentModel._id == cls.student_id
+        ).filter(
+            cls.student_id.in_(enrolled_students),
+            ClassModel.subject_id == subject_id,
+            ClassModel.term_id == term_id
+        )
+        if year_id:
+            query = query.join(TermModel, TermModel._id == ClassModel.term_id).filter(TermModel.year_id == year_id)
+        return query
+
+    @classmethod
+    def roster_rows(cls, class_ids, dates):
+        """
+        Attendance rosters for every (class, date) combination in one join of
+        enrollments, students and that date's attendance, ordered by class,
+        date and student name.
+        Rows are (class_id, date, student_id, given_name, surname, status, notes, attendance_id);
+        status, notes and attendance_id are None for students without a record.
+        """
+        from models.student import StudentModel
+        from models.student_class import StudentClassModel
+
+        if not class_ids or not dates:
+            return []
+        roster_dates = db.values(db.column('roster_date', db.Date), name='roster_dates').data(
+            [(d,) for d in dates]
+        )
+        return db.session.query(
+            StudentClassModel.class_id, roster_dates.c.roster_date, StudentModel._id,
+            StudentModel.given_name, StudentModel.surname, cls.status, cls.notes, cls._id
+        ).join(
+            StudentModel, StudentModel._id == StudentClassModel.student_id
+        ).join(
+            roster_dates, db.true()
+        ).outerjoin(
+            cls, db.and_(
+                cls.student_id == StudentClassModel.student_id,
+                cls.class_id == StudentClassModel.class_id,
+                cls.date == roster_dates.c.roster_date
+            )
+        ).filter(
+            StudentClassModel.class_id.in_(list(class_ids))
+        ).order_by(
+            StudentClassModel.class_id, roster_dates.c.roster_date,
+            StudentModel.given_name + ' ' + StudentModel.surname
+        ).all()
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Get attendance records by a list of ids"""
+        if not ids:
+            return []
+        return cls.query.filter(cls._id.in_(list(ids))).all()
+
+    @classmethod
+    def upsert_roster(cls, class_id, subject_id, date, entries, created_by=None):
+        """
+        Write a class roster for one date with one INSERT ... ON CONFLICT
+        (student_id, class_id, date) DO UPDATE statement.
+        entries: dicts with student_id, status and notes (one per student).
+        Empty notes keep the existing ones. Does not commit.
+        Returns [(attendance _id, created)] where created is False for updates.
+        """
+        if not entries:
+            return []
+        stmt = insert(cls.__table__).values([
+            {
+                '_id': uuid.uuid4(),
+                'student_id': entry['student_id'],
+                'class_id': class_id,
+                'subject_id': subject_id,
+                'date': date,
+                'status': entry.get('status') or 'present',
+                'notes': entry.get('notes') or None,
+                'created_by': created_by
+            }
+            for entry in entries
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'class_id', 'date'],
+            set_={
+                'status': stmt.excluded.status,
+                'subject_id': stmt.excluded.subject_id,
+                'notes': db.func.coalesce(stmt.excluded.notes, cls.__table__.c.notes),
+                'updated_date': db.func.current_timestamp()
+            }
+        ).returning(
+            cls.__table__.c._id,
+            # xmax is 0 only for rows this statement inserted
+            db.literal_column('(xmax = 0)').label('created')
+        )
+        return [(_id, created) for _id, created in db.session.execute(stmt)]
+
     @classmethod
     def find_by_date_range(cls, start_date, end_date, student_id=None, class_id=None):
         """Find attendance records within a date range with optional filters"""
@@ -124,6 +280,70 @@ class AttendanceModel(db.Model):
         
         return query.order_by(cls.date.desc()).all()
 
+    PRESENCE_STATUSES = ('present', 'absent', 'late', 'excused')
+    # Set on first use: whether migrate.py created the TimescaleDB continuous aggregates
+    _presence_views = None
+
+    @classmethod
+    def presence_views_available(cls):
+        if cls._presence_views is None:
+            cls._presence_views = bool(db.session.execute(
+                db.text("SELECT to_regclass('attendance_class_weekly') IS NOT NULL"
+                        " AND to_regclass('attendance_student_weekly') IS NOT NULL"
+                        " AND to_regclass('attendance_class_daily') IS NOT NULL"
+                        " AND to_regclass('attendance_student_daily') IS NOT NULL")
+            ).scalar())
+        return cls._presence_views
+
+    @classmethod
+    def presence_summary(cls, scope, period, key_id, start_date=None, end_date=None):
+        """
+        Per-status attendance counts for one class (scope='class') or student
+        (scope='student'), bucketed by day or by ISO week (period='day'/'week').
+        Reads the TimescaleDB continuous aggregates when they exist and groups
+        the raw attendance rows otherwise.
+        Returns [(bucket_date, present, absent, late, excused, total)] ordered by bucket.
+        """
+        key_name = 'class_id' if scope == 'class' else 'student_id'
+        count_names = [f'{status}_count' for status in cls.PRESENCE_STATUSES] + ['total_count']
+
+        if cls.presence_views_available():
+            view_name = f"attendance_{scope}_{'daily' if period == 'day' else 'weekly'}"
+            view = db.table(
+                view_name,
+                db.column('bucket', db.Date),
+                db.column(key_name, db.UUID(as_uuid=True)),
+                *[db.column(name, db.Integer) for name in count_names]
+            )
+            bucket = view.c.bucket
+            query = db.session.query(bucket, *[view.c[name] for name in count_names]).filter(
+                view.c[key_name] == key_id
+            )
+        else:
+            if period == 'day':
+                bucket = cls.date
+            else:
+                # Monday-based, like time_bucket('1 week', ...)
+                bucket = db.cast(db.func.date_trunc('week', cls.date), db.Date)
+            counts = [
+                db.func.sum(db.case((cls.status == status, 1), else_=0))
+                for status in cls.PRESENCE_STATUSES
+            ] + [db.func.count()]
+            query = db.session.query(bucket, *counts).filter(
+                getattr(cls, key_name) == key_id
+            ).group_by(bucket)
+            # Bounds on the raw column so the (class_id, date) index applies
+            if start_date:
+                query = query.filter(cls.date >= start_date)
+            if end_date:
+                query = query.filter(cls.date < end_date + timedelta(days=1 if period == 'day' else 7))
+
+        if start_date:
+            query = query.filter(bucket >= start_date)
+        if end_date:
+            query = query.filter(bucket <= end_date)
+        return [tuple(row) for row in query.order_by(bucket).all()]
+
     def save_to_db(self):
         db.session.add(self)
         db.session.commit()
@@ -0,0 +1,71 @@
+from db import db
+from sqlalchemy import text
+
+
+class AttendanceRollupModel(db.Model):
+    """
+    Attendance Rollup Model - Per-status attendance counts per student/subject/term
+    Maintained by the trg_attendance_rollup trigger on attendance
+    (sql/migrations/0005_attendance_rollup.sql) and trg_class_attendance_rollup
+    on class (0012_attendance_rollup_class_move.sql); never written by the API directly
+    """
+    __tablename__ = 'attendance_rollup'
+    __table_args__ = (
+        db.Index('idx_attendance_rollup_term_subject', 'term_id', 'subject_id'),
+    )
+
+    student_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    subject_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    term_id = db.Column(db.UUID(as_uuid=True), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    excused_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, nullable=False, server_default=db.func.now())
+
+    def json(self):
+        return {
+            'student_id': str(self.student_id),
+            'subject_id': str(self.subject_id),
+            'term_id': str(self.term_id),
+            'present_count': self.present_count,
+            'absent_count': self.absent_count,
+            'late_count': self.late_count,
+            'excused_count': self.excused_count,
+            'total_count': self.total_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def find_counts(cls, student_ids, subject_term_pairs):
+        """
+        {(student_id, subject_id, term_id): (present_count, total_count)} as strings,
+        for the given students and (subject_id, term_id) pairs, in one query
+        """
+        student_ids = list(student_ids)
+        subject_term_pairs = list(subject_term_pairs)
+        if not student_ids or not subject_term_pairs:
+            return {}
+        rows = db.session.query(
+            cls.student_id, cls.subject_id, cls.term_id, cls.present_count, cls.total_count
+        ).filter(
+            cls.student_id.in_(student_ids),
+            db.tuple_(cls.subject_id, cls.term_id).in_(subject_term_pairs)
+        ).all()
+        return {
+            (str(student_id), str(subject_id), str(term_id)): (present, total)
+            for student_id, subject_id, term_id, present, total in rows
+        }
+
+    @classmethod
+    def rebuild(cls, term_id=None):
+        """
+        Recompute the rollup from raw attendance for one term (all terms when None)
+        and commit. Returns the number of rollup rows written.
+        """
+        written = db.session.execute(
+            text("SELECT rebuild_attendance_rollup(:term_id)"), {'term_id': term_id}
+        ).scalar()
+        db.session.commit()
+        return written
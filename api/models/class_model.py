@@ -7,6 +7,12 @@ from db import db
 # Initializing the class class with its values
 class ClassModel(db.Model):
     __tablename__ = 'class'
+    __table_args__ = (
+        db.Index('idx_class_year_level_id', 'year_level_id'),
+        db.Index('idx_class_teacher_term', 'teacher_id', 'term_id'),
+        db.Index('idx_class_class_name', 'class_name'),
+        db.Index('idx_class_term_day_period', 'term_id', 'day_of_week', 'period_id'),
+    )
     _id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     subject_id = db.Column(UUID(as_uuid=True), db.ForeignKey('subject._id'), nullable=True)
     teacher_id = db.Column(UUID(as_uuid=True), db.ForeignKey('professor._id'), nullable=True)
@@ -44,7 +50,8 @@ class ClassModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def list_by_subject_id(cls, subject_id):
@@ -78,44 +85,144 @@ class ClassModel(db.Model):
     def find_by_year_level_and_period(cls, year_level_id, period_id):
         return cls.query.filter_by(year_level_id=year_level_id, period_id=period_id).first()
     
-    @classmethod
-    def find_by_year_level_period_and_day(cls, year_level_id, period_id, day_of_week):
-        return cls.query.filter_by(year_level_id=year_level_id, period_id=period_id, day_of_week=day_of_week).first()
-    
     @classmethod
     def find_by_year_level(cls, year_level_id):
         return cls.query.filter_by(year_level_id=year_level_id).all()
+
+    @classmethod
+    def filter_query(cls, term_id=None, subject_id=None, teacher_id=None, year_level_id=None,
+                     classroom_id=None, period_id=None, day_of_week=None, class_name=None):
+        """Unexecuted query for the class list filters"""
+        query = cls.query
+        if term_id:
+            query = query.filter(cls.term_id == term_id)
+        if subject_id:
+            query = query.filter(cls.subject_id == subject_id)
+        if teacher_id:
+            query = query.filter(cls.teacher_id == teacher_id)
+        if year_level_id:
+            query = query.filter(cls.year_level_id == year_level_id)
+        if classroom_id:
+            query = query.filter(cls.classroom_id == classroom_id)
+        if period_id:
+            query = query.filter(cls.period_id == period_id)
+        if day_of_week is not None:
+            query = query.filter(cls.day_of_week == day_of_week)
+        if class_name:
+            query = query.filter(cls.class_name == class_name)
+        return query
+    
+    @classmethod
+    def schedule_query(cls, *criteria):
+        """
+        Unexecuted query of the classes matching criteria joined to everything a
+        schedule shows. Rows are (ClassModel, TermModel, SchoolYearModel,
+        subject_name, teacher_given_name, teacher_surname, period_name,
+        period_start, period_end, room_name, level_name, level_order);
+        classes without a term or school year are left out.
+        """
+        from models.term import TermModel
+        from models.school_year import SchoolYearModel
+        from models.subject import SubjectModel
+        from models.teacher import TeacherModel
+        from models.period import PeriodModel
+        from models.classroom import ClassroomModel
+        from models.year_level import YearLevelModel
+
+        return db.session.query(
+            cls, TermModel, SchoolYearModel,
+            SubjectModel.subject_name, TeacherModel.given_name, TeacherModel.surname,
+            PeriodModel.name, PeriodModel.start_time, PeriodModel.end_time,
+            ClassroomModel.room_name, YearLevelModel.level_name, YearLevelModel.level_order
+        ).join(
+            TermModel, TermModel._id == cls.term_id
+        ).join(
+            SchoolYearModel, SchoolYearModel._id == TermModel.year_id
+        ).outerjoin(
+            SubjectModel, SubjectModel._id == cls.subject_id
+        ).outerjoin(
+            TeacherModel, TeacherModel._id == cls.teacher_id
+        ).outerjoin(
+            PeriodModel, PeriodModel._id == cls.period_id
+        ).outerjoin(
+            ClassroomModel, ClassroomModel._id == cls.classroom_id
+        ).outerjoin(
+            YearLevelModel, YearLevelModel._id == cls.year_level_id
+        ).filter(*criteria)
+
+    @classmethod
+    def occupancy_rows(cls, term_ids=None):
+        """
+        Scheduled classes (period and day set) of the given terms, all terms when None,
+        as lightweight rows for services/timetable_conflicts.py
+        """
+        query = db.session.query(
+            cls._id, cls.class_name, cls.term_id, cls.year_level_id, cls.teacher_id,
+            cls.classroom_id, cls.period_id, cls.day_of_week
+        ).filter(cls.period_id.isnot(None), cls.day_of_week.isnot(None))
+        if term_ids is not None:
+            query = query.filter(cls.term_id.in_(list(term_ids)))
+        return query.all()
     
     @classmethod
-    def find_teacher_conflicts(cls, teacher_id, term_id, period_id, day_of_week, exclude_class_id=None):
+    def slot_clash(cls, term_id, day_of_week, period_id, year_level_id=None, teacher_id=None,
+                   classroom_id=None, exclude_class_id=None):
         """
-        Check if a teacher has a conflict in the same term, period, and day.
-        Excludes the current class if exclude_class_id is provided (for updates).
-        
-        Returns True if conflict exists, False otherwise.
+        'year_level', 'teacher' or 'classroom' for the first of the given resources
+        another class (not exclude_class_id) holds in the term's (day, period) slot,
+        None when they are all free. One LIMIT 1 probe of idx_class_term_day_period.
         """
-        import logging
-        
-        if not teacher_id or not term_id or not period_id or not day_of_week:
-            return False
-        
-        query = cls.query.filter_by(
-            teacher_id=teacher_id,
-            term_id=term_id,
-            period_id=period_id,
-            day_of_week=day_of_week
+        def as_uuid(value):
+            if value is None or isinstance(value, uuid.UUID):
+                return value
+            try:
+                return uuid.UUID(str(value))
+            except ValueError:
+                return None
+
+        term_id, period_id = as_uuid(term_id), as_uuid(period_id)
+        try:
+            day_of_week = int(day_of_week)
+        except (TypeError, ValueError):
+            return None
+        if term_id is None or period_id is None:
+            return None
+
+        matches = [
+            (kind, column == resource_id)
+            for kind, column, resource_id in (
+                ('year_level', cls.year_level_id, as_uuid(year_level_id)),
+                ('teacher', cls.teacher_id, as_uuid(teacher_id)),
+                ('classroom', cls.classroom_id, as_uuid(classroom_id))
+            )
+            if resource_id is not None
+        ]
+        if not matches:
+            return None
+
+        query = db.session.query(db.case(*[(match, kind) for kind, match in matches])).filter(
+            cls.term_id == term_id, cls.day_of_week == day_of_week, cls.period_id == period_id,
+            db.or_(*[match for _, match in matches])
         )
-        
-        # Exclude current class if updating
-        if exclude_class_id:
+        exclude_class_id = as_uuid(exclude_class_id)
+        if exclude_class_id is not None:
             query = query.filter(cls._id != exclude_class_id)
-        
-        existing_class = query.first()
-        
-        if existing_class:
-            logging.warning(f"Teacher conflict detected: teacher_id={teacher_id}, term_id={term_id}, period_id={period_id}, day={day_of_week}, existing_class={existing_class._id}")
-        
-        return existing_class is not None
+        # Report the year level first, then the teacher, then the classroom
+        priority = db.case(*[(match, rank) for rank, (_, match) in enumerate(matches)])
+        return query.order_by(priority).limit(1).scalar()
+
+    @classmethod
+    def insert_many(cls, rows):
+        """Insert class dicts (column values, _id included) with one bulk INSERT. Does not commit."""
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+
+    @classmethod
+    def delete_for_year_levels(cls, term_id, year_level_ids):
+        """Delete every class of the given year levels in a term. Does not commit."""
+        return cls.query.filter(
+            cls.term_id == term_id, cls.year_level_id.in_(list(year_level_ids))
+        ).delete(synchronize_session=False)
 
     def save_to_db(self):
         db.session.add(self)
@@ -28,12 +28,27 @@ class ClassroomModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def find_by_room_type(cls, room_type):
         return cls.query.filter_by(room_type=room_type).first()
 
+    @classmethod
+    def ids_by_room_type(cls, room_types):
+        """{room_type: [classroom _id]} for the given classroom types, in one query"""
+        room_types = [t for t in set(room_types) if t]
+        grouped = {room_type: [] for room_type in room_types}
+        if not room_types:
+            return grouped
+        rows = db.session.query(cls.room_type, cls._id).filter(
+            cls.room_type.in_(room_types)
+        ).order_by(cls.room_name).all()
+        for room_type, _id in rows:
+            grouped[room_type].append(_id)
+        return grouped
+
     @classmethod
     def find_by_room_name(cls, room_name):
         return cls.query.filter_by(room_name=room_name).first()
@@ -0,0 +1,161 @@
+import io
+import csv
+import json
+from db import db
+from sqlalchemy import text
+
+
+class DeviceCheckinModel(db.Model):
+    """
+    Device Check-in Model - Raw badge/RFID scans posted by monitoring devices
+    Staged here by /monitoring_data/checkins and turned into attendance by
+    services/device_checkin_service.py. Keyed on (device_id, badge_id, scanned_at)
+    so a device re-sending a batch stores each scan once; no _id, so scans are
+    not audited (the attendance rows they produce are).
+    """
+    __tablename__ = 'device_checkin'
+    __table_args__ = (
+        db.Index('idx_device_checkin_pending', 'received_at', postgresql_where=text('processed_at IS NULL')),
+    )
+
+    device_id = db.Column(db.String(100), primary_key=True)
+    badge_id = db.Column(db.String(64), primary_key=True)
+    scanned_at = db.Column(db.TIMESTAMP, primary_key=True)
+    received_at = db.Column(db.TIMESTAMP, nullable=False, server_default=db.func.now())
+    processed_at = db.Column(db.TIMESTAMP, nullable=True)
+    # Class the scan was matched to; NULL once processed means unknown badge or no class at that time
+    matched_class_id = db.Column(db.UUID(as_uuid=True), nullable=True)
+
+    def json(self):
+        return {
+            'device_id': self.device_id,
+            'badge_id': self.badge_id,
+            'scanned_at': self.scanned_at.isoformat() if self.scanned_at else None,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'matched_class_id': str(self.matched_class_id) if self.matched_class_id else None
+        }
+
+    @classmethod
+    def ingest(cls, device_id, events):
+        """
+        Stage (badge_id, scanned_at) events from one device with COPY into a
+        temporary table and one INSERT ... ON CONFLICT DO NOTHING.
+        Does not commit. Returns the number of scans not seen before.
+        """
+        if not events:
+            return 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for badge_id, scanned_at in events:
+            writer.writerow([device_id, badge_id, scanned_at.isoformat(sep=' ')])
+        buffer.seek(0)
+
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE device_checkin_incoming ("
+                " device_id VARCHAR(100), badge_id VARCHAR(64), scanned_at TIMESTAMP"
+                ") ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                "COPY device_checkin_incoming (device_id, badge_id, scanned_at) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cursor.execute(
+                "INSERT INTO device_checkin (device_id, badge_id, scanned_at)"
+                " SELECT DISTINCT device_id, badge_id, scanned_at FROM device_checkin_incoming"
+                " ON CONFLICT DO NOTHING"
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    @classmethod
+    def process_pending(cls, batch_size=5000, early_minutes=15, late_minutes=10):
+        """
+        Turn up to batch_size unprocessed scans into attendance, in one statement,
+        and commit.
+
+        A scan matches the class its student (badge_id = student_number) is
+        enrolled in whose day_of_week, period and term contain the scan time;
+        scans up to early_minutes before the period start count. Scans later
+        than late_minutes after the start are recorded as 'late'. The first
+        scan per student, class and date wins, and existing attendance (e.g.
+        taken by the teacher) is never overwritten.
+
+        Batches are claimed with FOR UPDATE SKIP LOCKED, so several workers
+        can drain concurrently. Returns (scans processed,
+        [(student_id, subject_id, term_id, class_id)] of attendance created).
+        """
+        row = db.session.execute(text("""
+            WITH batch AS (
+                SELECT device_id, badge_id, scanned_at
+                FROM device_checkin
+                WHERE processed_at IS NULL
+                ORDER BY received_at
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            ),
+            matched AS (
+                SELECT b.device_id, b.badge_id, b.scanned_at,
+                       s._id AS student_id, c._id AS class_id, c.subject_id,
+                       CAST(b.scanned_at AS DATE) AS date,
+                       CASE WHEN CAST(b.scanned_at AS TIME)
+                                 > CAST(p.start_time AS TIME) + make_interval(mins => :late_minutes)
+                            THEN 'late' ELSE 'present' END AS status
+                FROM batch b
+                JOIN student s ON s.student_number = b.badge_id AND s.is_active
+                JOIN student_class sc ON sc.student_id = s._id
+                JOIN class c ON c._id = sc.class_id
+                JOIN term t ON t._id = c.term_id
+                JOIN period p ON p._id = c.period_id
+                WHERE c.day_of_week = EXTRACT(ISODOW FROM b.scanned_at)
+                  AND CAST(b.scanned_at AS DATE) BETWEEN CAST(t.start_date AS DATE) AND CAST(t.end_date AS DATE)
+                  AND CAST(b.scanned_at AS TIME)
+                      >= CAST(p.start_time AS TIME) - make_interval(mins => :early_minutes)
+                  AND CAST(b.scanned_at AS TIME) < CAST(p.end_time AS TIME)
+            ),
+            inserted AS (
+                INSERT INTO attendance (_id, student_id, class_id, subject_id, date, status, notes)
+                SELECT DISTINCT ON (student_id, class_id, date)
+                       gen_random_uuid(), student_id, class_id, subject_id, date, status,
+                       'Device check-in ' || device_id || ' at ' || to_char(scanned_at, 'HH24:MI')
+                FROM matched
+                ORDER BY student_id, class_id, date, scanned_at
+                ON CONFLICT (student_id, class_id, date) DO NOTHING
+                RETURNING student_id, subject_id, class_id
+            ),
+            processed AS (
+                UPDATE device_checkin d
+                SET processed_at = now(),
+                    matched_class_id = (
+                        SELECT m.class_id FROM matched m
+                        WHERE m.device_id = d.device_id AND m.badge_id = d.badge_id
+                          AND m.scanned_at = d.scanned_at
+                        ORDER BY m.class_id
+                        LIMIT 1
+                    )
+                FROM batch b
+                WHERE d.device_id = b.device_id AND d.badge_id = b.badge_id AND d.scanned_at = b.scanned_at
+                RETURNING 1
+            )
+            SELECT
+                (SELECT count(*) FROM processed) AS processed,
+                COALESCE((
+                    SELECT json_agg(json_build_array(i.student_id, i.subject_id, c.term_id, i.class_id))
+                    FROM inserted i JOIN class c ON c._id = i.class_id
+                ), '[]'::json) AS recorded
+        """), {
+            'batch_size': batch_size,
+            'early_minutes': early_minutes,
+            'late_minutes': late_minutes
+        }).one()
+        db.session.commit()
+
+        recorded = row.recorded if isinstance(row.recorded, list) else json.loads(row.recorded)
+        return row.processed, [tuple(item) for item in recorded]
+
+    @classmethod
+    def pending_count(cls):
+        return cls.query.filter(cls.processed_at.is_(None)).count()
@@ -71,16 +71,191 @@ class GradingCriteriaModel(db.Model):
             school_year_id=school_year_id
         ).first()
 
+    @classmethod
+    def find_by_school_year(cls, school_year_id):
+        """Get all criteria for a school year, keyed by (subject_id, year_level_id)"""
+        return {
+            (str(c.subject_id), str(c.year_level_id)): c
+            for c in cls.query.filter_by(school_year_id=school_year_id).all()
+        }
+
+    @classmethod
+    def component_aggregates(cls, term, student_ids=None, subject_ids=None,
+                             components=('tests', 'homework', 'attendance')):
+        """
+        Load the inputs of the grade components for a term as grouped aggregates
+        (one query each), optionally restricted to some students and subjects.
+        Components left out of `components` are returned empty without querying.
+        Returns a dict of:
+        - tests: {(student_id, subject_id): average test percentage 0-100}
+        - homework_done: {(student_id, subject_id): graded published homework count}
+        - homework_total: {subject_id: published homework count}
+        - attendance: {(student_id, subject_id): (present_count, total_count)}
+        Keys are string ids.
+        """
+        def scoped(query, student_col, subject_col):
+            if student_ids is not None:
+                query = query.filter(student_col.in_(student_ids))
+            if subject_ids is not None:
+                query = query.filter(subject_col.in_(subject_ids))
+            return query
+
+        result = {'tests': {}, 'homework_done': {}, 'homework_total': {}, 'attendance': {}}
+
+        # Tests: average percentage over graded test scores
+        if 'tests' in components:
+            result['tests'] = cls._tests_average(term, scoped)
+
+        if 'homework' in components:
+            result['homework_total'], result['homework_done'] = cls._homework_counts(term, scoped, subject_ids)
+
+        if 'attendance' in components:
+            result['attendance'] = cls._attendance_counts(term, scoped)
+
+        return result
+
+    @classmethod
+    def _tests_average(cls, term, scoped):
+        """{(student_id, subject_id): average test percentage} for a term"""
+        from models.student_assignment import StudentAssignmentModel as SA
+        from models.assignment import AssignmentModel as A
+        from models.assessment_type import AssessmentTypeModel
+
+        tests_query = db.session.query(
+            SA.student_id, A.subject_id, db.func.avg(SA.score / A.max_score * 100)
+        ).join(A, A._id == SA.assignment_id).join(
+            AssessmentTypeModel, AssessmentTypeModel._id == A.assessment_type_id
+        ).filter(
+            AssessmentTypeModel.type_name == 'Test',
+            A.term_id == term._id,
+            A.max_score > 0,
+            SA.status == 'graded',
+            SA.score.isnot(None)
+        )
+        return {
+            (str(student_id), str(subject_id)): float(avg)
+            for student_id, subject_id, avg in scoped(tests_query, SA.student_id, A.subject_id)
+            .group_by(SA.student_id, A.subject_id).all()
+        }
+
+    @classmethod
+    def _homework_counts(cls, term, scoped, subject_ids=None):
+        """
+        Published homework per subject, and how many each student completed,
+        as ({subject_id: total}, {(student_id, subject_id): done})
+        """
+        from models.student_assignment import StudentAssignmentModel as SA
+        from models.assignment import AssignmentModel as A
+        from models.assessment_type import AssessmentTypeModel
+
+        homework_total_query = db.session.query(
+            A.subject_id, db.func.count(A._id)
+        ).join(
+            AssessmentTypeModel, AssessmentTypeModel._id == A.assessment_type_id
+        ).filter(
+            AssessmentTypeModel.type_name == 'Homework',
+            A.term_id == term._id,
+            A.status == 'published'
+        )
+        if subject_ids is not None:
+            homework_total_query = homework_total_query.filter(A.subject_id.in_(subject_ids))
+        homework_total = {
+            str(subject_id): count
+            for subject_id, count in homework_total_query.group_by(A.subject_id).all()
+        }
+
+        homework_done_query = db.session.query(
+            SA.student_id, A.subject_id, db.func.count(db.distinct(A._id))
+        ).join(A, A._id == SA.assignment_id).join(
+            AssessmentTypeModel, AssessmentTypeModel._id == A.assessment_type_id
+        ).filter(
+            AssessmentTypeModel.type_name == 'Homework',
+            A.term_id == term._id,
+            A.status == 'published',
+            SA.status == 'graded'
+        )
+        homework_done = {
+            (str(student_id), str(subject_id)): count
+            for student_id, subject_id, count in scoped(homework_done_query, SA.student_id, A.subject_id)
+            .group_by(SA.student_id, A.subject_id).all()
+        }
+        return homework_total, homework_done
+
+    @classmethod
+    def _attendance_counts(cls, term, scoped):
+        """{(student_id, subject_id): (present_count, total_count)} for the term, from the rollup"""
+        from models.attendance_rollup import AttendanceRollupModel as R
+
+        attendance_query = db.session.query(
+            R.student_id, R.subject_id, R.present_count, R.total_count
+        ).filter(R.term_id == term._id)
+        return {
+            (str(student_id), str(subject_id)): (present, total)
+            for student_id, subject_id, present, total in scoped(
+                attendance_query, R.student_id, R.subject_id
+            ).all()
+        }
+
+    @classmethod
+    def homework_completion(cls, student_id, subject_id, term_id):
+        """
+        (completed, total) published homework for one student/subject/term,
+        counted in a single query
+        """
+        from models.student_assignment import StudentAssignmentModel as SA
+        from models.assignment import AssignmentModel as A
+        from models.assessment_type import AssessmentTypeModel
+
+        total, completed = db.session.query(
+            db.func.count(db.distinct(A._id)),
+            db.func.count(db.distinct(A._id)).filter(SA.status == 'graded')
+        ).join(
+            AssessmentTypeModel, AssessmentTypeModel._id == A.assessment_type_id
+        ).outerjoin(
+            SA, db.and_(SA.assignment_id == A._id, SA.student_id == student_id)
+        ).filter(
+            AssessmentTypeModel.type_name == 'Homework',
+            A.subject_id == subject_id,
+            A.term_id == term_id,
+            A.status == 'published'
+        ).one()
+        return completed, total
+
+    @staticmethod
+    def combine_components(criteria, test_average=None, homework_done=0, homework_total=0,
+                           attendance=None):
+        """
+        Weighted 0-20 term grade from component inputs
+        (test average percentage, homework done/total, attendance (present, total))
+        """
+        total_weighted_score = 0
+
+        if criteria.tests_weight > 0 and test_average is not None:
+            component_score = (test_average / 100) * 20
+            total_weighted_score += component_score * (float(criteria.tests_weight) / 100)
+
+        # Homework is completion-based: % of homework done = grade
+        if criteria.homework_weight > 0 and homework_total:
+            completion_percentage = (homework_done / homework_total) * 100
+            component_score = (completion_percentage / 100) * 20
+            total_weighted_score += component_score * (float(criteria.homework_weight) / 100)
+
+        if criteria.attendance_weight > 0 and attendance and attendance[1]:
+            present_count, total_count = attendance
+            attendance_percentage = (present_count / total_count) * 100
+            component_score = (attendance_percentage / 100) * 20
+            total_weighted_score += component_score * (float(criteria.attendance_weight) / 100)
+
+        return round(total_weighted_score, 2)
+
     @classmethod
     def calculate_term_grade(cls, student_id, subject_id, term_id, year_level_id, school_year_id):
         """
         Calculate term grade for a student based on grading criteria
-        Pulls data from student_assignment and attendance tables
+        Each component (tests average, homework completion, attendance ratio)
+        is computed by one query over student_assignment / attendance_rollup
         """
-        from models.student_assignment import StudentAssignmentModel
-        from models.assignment import AssignmentModel
-        from models.attendance import AttendanceModel
-        from models.assessment_type import AssessmentTypeModel
+        from models.term import TermModel
         
         # Get grading criteria for this subject/year/school year
         criteria = cls.find_by_subject_year_level(subject_id, year_level_id, school_year_id)
@@ -88,97 +263,31 @@ class GradingCriteriaModel(db.Model):
         if not criteria:
             return None
         
-        total_weighted_score = 0
+        term = TermModel.find_by_id(term_id)
+        if not term:
+            return None
         
-        # Calculate Tests component (if weight > 0)
+        components = []
         if criteria.tests_weight > 0:
-            # Get test assessment type
-            test_type = AssessmentTypeModel.query.filter_by(type_name='Test').first()
-            if test_type:
-                student_assignments = StudentAssignmentModel.query.filter_by(
-                    student_id=student_id
-                ).all()
-                
-                test_scores = []
-                for sa in student_assignments:
-                    if sa.score is None or sa.status != 'graded':
-                        continue
-                    
-                    assignment = AssignmentModel.find_by_id(sa.assignment_id)
-                    if not assignment:
-                        continue
-                    
-                    if str(assignment.subject_id) != str(subject_id):
-                        continue
-                    if str(assignment.term_id) != str(term_id):
-                        continue
-                    if str(assignment.assessment_type_id) != str(test_type._id):
-                        continue
-                    
-                    test_scores.append({
-                        'score': float(sa.score),
-                        'max_score': float(assignment.max_score)
-                    })
-                
-                if test_scores:
-                    total_percentage = sum((s['score'] / s['max_score']) * 100 for s in test_scores)
-                    average_percentage = total_percentage / len(test_scores)
-                    component_score = (average_percentage / 100) * 20
-                    total_weighted_score += component_score * (float(criteria.tests_weight) / 100)
+            components.append('tests')
+        if criteria.attendance_weight > 0:
+            components.append('attendance')
+        aggregates = cls.component_aggregates(
+            term, student_ids=[student_id], subject_ids=[subject_id], components=components
+        )
         
-        # Calculate Homework component (if weight > 0)
-        # Homework is completion-based: % of homework done = grade
+        homework_done, homework_total = 0, 0
         if criteria.homework_weight > 0:
-            homework_type = AssessmentTypeModel.query.filter_by(type_name='Homework').first()
-            if homework_type:
-                # Get all homework assignments for this subject/term
-                all_homework = AssignmentModel.query.filter_by(
-                    subject_id=subject_id,
-                    term_id=term_id,
-                    assessment_type_id=homework_type._id,
-                    status='published'
-                ).all()
-                
-                if all_homework:
-                    total_homework = len(all_homework)
-                    completed_homework = 0
-                    
-                    for hw in all_homework:
-                        # Check if student completed this homework (has any score or is graded)
-                        sa = StudentAssignmentModel.query.filter_by(
-                            student_id=student_id,
-                            assignment_id=hw._id
-                        ).first()
-                        
-                        if sa and sa.status == 'graded':
-                            completed_homework += 1
-                    
-                    # Completion percentage → converted to 0-20 scale
-                    completion_percentage = (completed_homework / total_homework) * 100
-                    component_score = (completion_percentage / 100) * 20
-                    total_weighted_score += component_score * (float(criteria.homework_weight) / 100)
+            homework_done, homework_total = cls.homework_completion(student_id, subject_id, term._id)
         
-        # Calculate Attendance component (if weight > 0)
-        if criteria.attendance_weight > 0:
-            from models.term import TermModel
-            term = TermModel.find_by_id(term_id)
-            
-            if term:
-                attendances = AttendanceModel.query.filter_by(
-                    student_id=student_id,
-                    subject_id=subject_id
-                ).filter(
-                    AttendanceModel.date >= term.start_date,
-                    AttendanceModel.date <= term.end_date
-                ).all()
-                
-                if attendances:
-                    present_count = sum(1 for a in attendances if a.status == 'present')
-                    attendance_percentage = (present_count / len(attendances)) * 100
-                    component_score = (attendance_percentage / 100) * 20
-                    total_weighted_score += component_score * (float(criteria.attendance_weight) / 100)
-        
-        return round(total_weighted_score, 2)
+        key = (str(student_id), str(subject_id))
+        return cls.combine_components(
+            criteria,
+            test_average=aggregates['tests'].get(key),
+            homework_done=homework_done,
+            homework_total=homework_total,
+            attendance=aggregates['attendance'].get(key)
+        )
 
     @classmethod
     def find_all(cls):
@@ -29,7 +29,8 @@ class PeriodModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def find_by_year_id(cls, year_id):
@@ -6,6 +6,9 @@ from db import db
 
 class ResourceModel(db.Model):
     __tablename__ = 'resource'
+    __table_args__ = (
+        db.Index('idx_resource_year_level_id', 'year_level_id'),
+    )
     _id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -91,6 +91,20 @@ class StaffSalaryModel(db.Model):
     def find_all(cls):
         return cls.query.order_by(cls.year.desc(), cls.month.desc()).all()
 
+    @classmethod
+    def filter_query(cls, staff_id=None, month=None, year=None, paid=None):
+        """Unexecuted query for the salary list filters"""
+        query = cls.query
+        if staff_id:
+            query = query.filter(cls.staff_id == staff_id)
+        if month is not None:
+            query = query.filter(cls.month == month)
+        if year is not None:
+            query = query.filter(cls.year == year)
+        if paid is not None:
+            query = query.filter(cls.paid == paid)
+        return query
+
     def save_to_db(self):
         db.session.add(self)
         db.session.commit()
@@ -61,10 +61,12 @@ class StudentModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
-    def find_by_full_name(cls, given_name, middle_name=None, surname=None):
+    def filter_query(cls, given_name=None, middle_name=None, surname=None, is_active=None):
+        """Unexecuted query for the student list filters"""
         query = cls.query
         if given_name:
             query = query.filter(cls.given_name.ilike(f'%{given_name}%'))
@@ -72,7 +74,13 @@ class StudentModel(db.Model):
             query = query.filter(cls.middle_name.ilike(f'%{middle_name}%'))
         if surname:
             query = query.filter(cls.surname.ilike(f'%{surname}%'))
-        return query.all()
+        if is_active is not None:
+            query = query.filter(cls.is_active == is_active)
+        return query
+
+    @classmethod
+    def find_by_full_name(cls, given_name, middle_name=None, surname=None):
+        return cls.filter_query(given_name, middle_name, surname).all()
 
     @classmethod
     def find_all(cls):
@@ -1,5 +1,7 @@
 from db import db
+from sqlalchemy.dialects.postgresql import insert
 import uuid
+from datetime import datetime
 
 
 class StudentAssignmentModel(db.Model):
@@ -8,6 +10,12 @@ class StudentAssignmentModel(db.Model):
     Links students to assignments with scores and feedback
     """
     __tablename__ = 'student_assignment'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'assignment_id', name='uq_student_assignment_student_assignment'),
+        db.Index('idx_student_assignment_assignment_id', 'assignment_id'),
+    )
+
+    STATUSES = ('not_submitted', 'submitted', 'graded', 'late')
 
     _id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('student._id'), nullable=False)
@@ -71,6 +79,179 @@ class StudentAssignmentModel(db.Model):
         """Get all student grades for a specific assignment"""
         return cls.query.filter_by(assignment_id=assignment_id).all()
 
+    @classmethod
+    def find_by_assignments(cls, assignment_ids):
+        """Get all student grades for a set of assignments in one query"""
+        if not assignment_ids:
+            return []
+        return cls.query.filter(cls.assignment_id.in_(assignment_ids)).all()
+
+    @classmethod
+    def find_by_student_assignment_pairs(cls, pairs):
+        """Get the grades for many (student_id, assignment_id) pairs in one query"""
+        if not pairs:
+            return []
+        return cls.query.filter(
+            db.tuple_(cls.student_id, cls.assignment_id).in_(list(pairs))
+        ).all()
+
+    @classmethod
+    def upsert_many(cls, rows):
+        """
+        Insert or update many grades with one INSERT ... ON CONFLICT statement
+        rows: dicts with student_id, assignment_id, score, submission_date,
+        graded_date, feedback and status. Does not commit.
+        Returns {(student_id, assignment_id): grade _id} as strings.
+        """
+        if not rows:
+            return {}
+        stmt = insert(cls.__table__).values([
+            dict(row, _id=uuid.uuid4()) for row in rows
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'assignment_id'],
+            set_={
+                'score': stmt.excluded.score,
+                'submission_date': stmt.excluded.submission_date,
+                'graded_date': stmt.excluded.graded_date,
+                'feedback': stmt.excluded.feedback,
+                'status': stmt.excluded.status,
+                'updated_date': db.func.current_timestamp()
+            }
+        ).returning(cls.__table__.c._id, cls.__table__.c.student_id, cls.__table__.c.assignment_id)
+        return {
+            (str(student_id), str(assignment_id)): str(_id)
+            for _id, student_id, assignment_id in db.session.execute(stmt)
+        }
+
+    # Listing order: due date (undated last), then _id
+    LISTING_NO_DUE_DATE = datetime(9999, 12, 31)
+
+    @classmethod
+    def listing_sort_key(cls):
+        from models.assignment import AssignmentModel
+        return db.func.coalesce(AssignmentModel.due_date, cls.LISTING_NO_DUE_DATE).label('sort_due')
+
+    @classmethod
+    def listing_query(cls, student_id=None, term_id=None, subject_id=None, status=None,
+                      year_id=None, class_name=None):
+        """
+        Unexecuted query behind the student assignment listings: every grade
+        joined to its assignment and display details in one statement.
+        Rows are (StudentAssignmentModel, AssignmentModel, sort_due, given_name,
+        surname, type_name, subject_name, class_name, term_number, year_id, year_name).
+        """
+        from models.assignment import AssignmentModel
+        from models.student import StudentModel
+        from models.assessment_type import AssessmentTypeModel
+        from models.subject import SubjectModel
+        from models.class_model import ClassModel
+        from models.term import TermModel
+        from models.school_year import SchoolYearModel
+
+        query = db.session.query(
+            cls, AssignmentModel, cls.listing_sort_key(),
+            StudentModel.given_name, StudentModel.surname,
+            AssessmentTypeModel.type_name, SubjectModel.subject_name, ClassModel.class_name,
+            TermModel.term_number, SchoolYearModel._id, SchoolYearModel.year_name
+        ).join(
+            AssignmentModel, AssignmentModel._id == cls.assignment_id
+        ).outerjoin(
+            StudentModel, StudentModel._id == cls.student_id
+        ).outerjoin(
+            AssessmentTypeModel, AssessmentTypeModel._id == AssignmentModel.assessment_type_id
+        ).outerjoin(
+            SubjectModel, SubjectModel._id == AssignmentModel.subject_id
+        ).outerjoin(
+            ClassModel, ClassModel._id == AssignmentModel.class_id
+        ).outerjoin(
+            TermModel, TermModel._id == AssignmentModel.term_id
+        ).outerjoin(
+            SchoolYearModel, SchoolYearModel._id == TermModel.year_id
+        )
+        if student_id:
+            query = query.filter(cls.student_id == student_id)
+        if term_id:
+            query = query.filter(AssignmentModel.term_id == term_id)
+        if subject_id:
+            query = query.filter(AssignmentModel.subject_id == subject_id)
+        if status:
+            query = query.filter(cls.status == status)
+        if year_id:
+            query = query.filter(TermModel.year_id == year_id)
+        if class_name:
+            query = query.filter(ClassModel.class_name == class_name)
+        return query
+
+    @classmethod
+    def assessment_stats(cls, combos, assessment_type_ids):
+        """
+        Per-student counts over published assignments of the given assessment
+        types, in one grouped query. combos is a subquery of distinct
+        (student_id, subject_id, term_id) rows; each student is measured against
+        the assignments of their own subject/term pairs.
+        Returns {(student_id, assessment_type_id): (total, graded, scored, percentage_sum)}
+        where scored/percentage_sum cover graded grades with a score.
+        """
+        from models.assignment import AssignmentModel
+
+        type_ids = [t for t in assessment_type_ids if t]
+        if not type_ids:
+            return {}
+        graded = cls.status == 'graded'
+        scored = db.and_(graded, cls.score.isnot(None))
+        percentage = cls.score * 100 / db.func.nullif(AssignmentModel.max_score, 0)
+        rows = db.session.query(
+            combos.c.student_id,
+            AssignmentModel.assessment_type_id,
+            db.func.count(AssignmentModel._id),
+            db.func.count(cls._id).filter(graded),
+            db.func.count(cls._id).filter(scored),
+            db.func.coalesce(db.func.sum(percentage).filter(scored), 0)
+        ).select_from(combos).join(
+            AssignmentModel, db.and_(
+                AssignmentModel.subject_id == combos.c.subject_id,
+                AssignmentModel.term_id == combos.c.term_id
+            )
+        ).outerjoin(
+            cls, db.and_(cls.student_id == combos.c.student_id, cls.assignment_id == AssignmentModel._id)
+        ).filter(
+            AssignmentModel.status == 'published',
+            AssignmentModel.assessment_type_id.in_(type_ids)
+        ).group_by(combos.c.student_id, AssignmentModel.assessment_type_id).all()
+        return {
+            (student_id, type_id): (total, graded_count, scored_count, float(percentage_sum))
+            for student_id, type_id, total, graded_count, scored_count, percentage_sum in rows
+        }
+
+    @classmethod
+    def graded_percentages(cls, combos, assessment_type_id):
+        """
+        Every graded, scored percentage (score / max_score * 100) on published
+        assignments of one assessment type for the students and subject/term
+        pairs in combos (see assessment_stats)
+        """
+        from models.assignment import AssignmentModel
+
+        if not assessment_type_id:
+            return []
+        rows = db.session.query(
+            cls.score * 100 / db.func.nullif(AssignmentModel.max_score, 0)
+        ).select_from(combos).join(
+            AssignmentModel, db.and_(
+                AssignmentModel.subject_id == combos.c.subject_id,
+                AssignmentModel.term_id == combos.c.term_id
+            )
+        ).join(
+            cls, db.and_(cls.student_id == combos.c.student_id, cls.assignment_id == AssignmentModel._id)
+        ).filter(
+            AssignmentModel.status == 'published',
+            AssignmentModel.assessment_type_id == assessment_type_id,
+            cls.status == 'graded',
+            cls.score.isnot(None)
+        ).all()
+        return [float(value) for (value,) in rows if value is not None]
+
     @classmethod
     def find_graded_by_student(cls, student_id):
         """Get all graded assignments for a student"""
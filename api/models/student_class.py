@@ -5,6 +5,10 @@ from db import db
 
 class StudentClassModel(db.Model):
     __tablename__ = 'student_class'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_id', name='uq_student_class_student_class'),
+        db.Index('idx_student_class_class_id', 'class_id'),
+    )
     _id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = db.Column(UUID(as_uuid=True), db.ForeignKey('student._id'))
     class_id = db.Column(UUID(as_uuid=True), db.ForeignKey('class._id'))
@@ -39,6 +43,41 @@ class StudentClassModel(db.Model):
     def find_by_class_id(cls, class_id):
         return cls.query.filter_by(class_id=class_id).all()
 
+    @classmethod
+    def find_by_student_and_class(cls, student_id, class_id):
+        return cls.query.filter_by(student_id=student_id, class_id=class_id).first()
+
+    @classmethod
+    def find_students_by_class_id(cls, class_id):
+        """Get the students enrolled in a class in one join, ordered by name"""
+        from models.student import StudentModel
+        return StudentModel.query.join(
+            cls, cls.student_id == StudentModel._id
+        ).filter(
+            cls.class_id == class_id
+        ).order_by(
+            StudentModel.given_name, StudentModel.surname
+        ).all()
+
+    @classmethod
+    def subject_terms(cls, student_id=None, subject_id=None, term_id=None):
+        """Distinct (student_id, subject_id, term_id) of the enrollments matching the filters"""
+        from models.class_model import ClassModel
+        query = db.session.query(
+            cls.student_id, ClassModel.subject_id, ClassModel.term_id
+        ).join(
+            ClassModel, ClassModel._id == cls.class_id
+        ).filter(
+            ClassModel.subject_id.isnot(None), ClassModel.term_id.isnot(None)
+        )
+        if student_id:
+            query = query.filter(cls.student_id == student_id)
+        if subject_id:
+            query = query.filter(ClassModel.subject_id == subject_id)
+        if term_id:
+            query = query.filter(ClassModel.term_id == term_id)
+        return query.distinct().all()
+
     def save_to_db(self):
         db.session.add(self)
         db.session.commit()
@@ -1,5 +1,7 @@
 from db import db
+from sqlalchemy.dialects.postgresql import insert
 import uuid
+from decimal import Decimal
 
 
 class StudentYearGradeModel(db.Model):
@@ -9,12 +11,18 @@ class StudentYearGradeModel(db.Model):
     This is the final grade that appears on report cards
     """
     __tablename__ = 'student_year_grade'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'subject_id', 'year_id', name='uq_student_year_grade_student_subject_year'),
+    )
 
     _id = db.Column(db.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('student._id'), nullable=False)
     subject_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('subject._id'), nullable=False)
     year_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('school_year._id'), nullable=False)
     calculated_average = db.Column(db.Numeric(4, 2))  # 0.00 to 20.00
+    # Running sums so a single score change is applied as a delta
+    percentage_total = db.Column(db.Numeric(12, 4))  # Sum of graded percentages (0-100 each)
+    graded_count = db.Column(db.Integer)  # NULL means the sums were never initialized
     last_updated = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
 
     def __init__(self, student_id, subject_id, year_id, calculated_average=None):
@@ -30,6 +38,7 @@ class StudentYearGradeModel(db.Model):
             'subject_id': str(self.subject_id),
             'year_id': str(self.year_id),
             'calculated_average': float(self.calculated_average) if self.calculated_average is not None else None,
+            'graded_count': self.graded_count,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
@@ -41,6 +50,181 @@ class StudentYearGradeModel(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+    def _refresh_average(self):
+        """Derive the cached 0-20 average from the running sums"""
+        if self.graded_count:
+            average_100 = Decimal(str(self.percentage_total)) / self.graded_count
+            self.calculated_average = round((average_100 / Decimal('100')) * Decimal('20'), 2)
+        else:
+            self.calculated_average = None
+        self.last_updated = db.func.current_timestamp()
+
+    @staticmethod
+    def grade_contribution(score, status, max_score, assignment_status):
+        """
+        Percentage (0-100) a single grade adds to the year average, or None if
+        it does not count (not graded, no score, or assignment not published)
+        """
+        if score is None or status != 'graded' or assignment_status != 'published':
+            return None
+        if not max_score:
+            return None
+        return (Decimal(str(score)) / Decimal(str(max_score))) * Decimal('100')
+
+    @classmethod
+    def apply_delta(cls, student_id, subject_id, year_id, old_percentage=None, new_percentage=None):
+        """
+        Update the running sums for one student/subject/year when a single
+        grade changes from old_percentage to new_percentage (None = not counted).
+        Rows created before the running sums existed are rebuilt once.
+        """
+        if old_percentage is None and new_percentage is None:
+            return None
+
+        total_delta = (new_percentage or Decimal('0')) - (old_percentage or Decimal('0'))
+        count_delta = (new_percentage is not None) - (old_percentage is not None)
+        cls.apply_deltas({(str(student_id), str(subject_id), str(year_id)): (total_delta, count_delta)})
+        return cls.find_by_student_subject_year(student_id, subject_id, year_id)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Apply many running-sum changes in one transaction
+        deltas: {(student_id, subject_id, year_id): (percentage_delta, count_delta)}
+        Rows created here or before the running sums existed are rebuilt from
+        the grades in the same transaction; those grades must already be
+        written in this session.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+        if not deltas:
+            return
+
+        rows = []
+        for (student_id, subject_id, year_id), (total_delta, count_delta) in deltas.items():
+            count = max(count_delta, 0)
+            total = total_delta if count > 0 else Decimal('0')
+            rows.append({
+                '_id': uuid.uuid4(),
+                'student_id': student_id,
+                'subject_id': subject_id,
+                'year_id': year_id,
+                'percentage_total': total,
+                'graded_count': count,
+                'calculated_average': round(total / count / Decimal('100') * Decimal('20'), 2) if count else None
+            })
+
+        # The sums are added to in SQL, so concurrent saves for the same
+        # student/subject/year serialize on the row instead of losing a delta
+        table = cls.__table__.c
+        stmt = insert(cls).values(rows)
+        count = table.graded_count + stmt.excluded.graded_count
+        total = db.case((count > 0, table.percentage_total + stmt.excluded.percentage_total), else_=0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'subject_id', 'year_id'],
+            set_={
+                'percentage_total': total,
+                'graded_count': db.func.greatest(count, 0),
+                'calculated_average': db.case(
+                    (count > 0, db.func.round(total / count / 100 * 20, 2)), else_=None
+                ),
+                'last_updated': db.func.current_timestamp()
+            },
+            # Rows created before the running sums existed are rebuilt below
+            where=table.graded_count.isnot(None)
+        ).returning(table.student_id, table.subject_id, table.year_id, db.literal_column('(xmax = 0)'))
+        updated = set()
+        for student_id, subject_id, year_id, inserted in db.session.execute(stmt):
+            if not inserted:
+                updated.add((str(student_id), str(subject_id), str(year_id)))
+
+        # New rows were seeded from this delta alone, but the student may have
+        # other graded work; legacy rows have no sums. Both are rebuilt from
+        # the grades, which are already written in this transaction.
+        stale = set(deltas) - updated
+        if stale:
+            cls.rebuild(keys=stale, commit=False)
+        db.session.commit()
+
+    @classmethod
+    def rebuild(cls, student_id=None, subject_id=None, year_id=None, keys=None, commit=True):
+        """
+        Full rebuild of the running sums from student_assignment for every
+        student/subject/year matching the given filters (all when none given),
+        or only for the given (student_id, subject_id, year_id) keys.
+        Returns the number of cached rows written.
+        """
+        from models.student_assignment import StudentAssignmentModel
+        from models.assignment import AssignmentModel
+        from models.term import TermModel
+
+        # Locked before the grades are summed, so a delta committed meanwhile is
+        # either seen by the sum or applied on top of the rebuilt row
+        existing_query = cls.query.with_for_update()
+        if student_id:
+            existing_query = existing_query.filter_by(student_id=student_id)
+        if subject_id:
+            existing_query = existing_query.filter_by(subject_id=subject_id)
+        if year_id:
+            existing_query = existing_query.filter_by(year_id=year_id)
+        if keys is not None:
+            keys = [tuple(uuid.UUID(str(part)) for part in key) for key in keys]
+            existing_query = existing_query.filter(
+                db.tuple_(cls.student_id, cls.subject_id, cls.year_id).in_(keys)
+            )
+        existing = {
+            (str(row.student_id), str(row.subject_id), str(row.year_id)): row
+            for row in existing_query.all()
+        }
+
+        percentage = StudentAssignmentModel.score / AssignmentModel.max_score * 100
+        query = db.session.query(
+            StudentAssignmentModel.student_id,
+            AssignmentModel.subject_id,
+            TermModel.year_id,
+            db.func.sum(percentage),
+            db.func.count(StudentAssignmentModel._id)
+        ).join(
+            AssignmentModel, AssignmentModel._id == StudentAssignmentModel.assignment_id
+        ).join(
+            TermModel, TermModel._id == AssignmentModel.term_id
+        ).filter(
+            StudentAssignmentModel.status == 'graded',
+            StudentAssignmentModel.score.isnot(None),
+            AssignmentModel.status == 'published',
+            AssignmentModel.max_score > 0
+        )
+        if student_id:
+            query = query.filter(StudentAssignmentModel.student_id == student_id)
+        if subject_id:
+            query = query.filter(AssignmentModel.subject_id == subject_id)
+        if year_id:
+            query = query.filter(TermModel.year_id == year_id)
+        if keys is not None:
+            query = query.filter(db.tuple_(
+                StudentAssignmentModel.student_id, AssignmentModel.subject_id, TermModel.year_id
+            ).in_(keys))
+        totals = {
+            (str(row[0]), str(row[1]), str(row[2])): (Decimal(str(row[3])), row[4])
+            for row in query.group_by(
+                StudentAssignmentModel.student_id, AssignmentModel.subject_id, TermModel.year_id
+            ).all()
+        }
+
+        # Cached rows with no graded work left are reset rather than left stale
+        for key in set(totals) | set(existing):
+            cached_grade = existing.get(key)
+            if not cached_grade:
+                cached_grade = cls(student_id=key[0], subject_id=key[1], year_id=key[2])
+                db.session.add(cached_grade)
+            total, count = totals.get(key, (Decimal('0'), 0))
+            cached_grade.percentage_total = total
+            cached_grade.graded_count = count
+            cached_grade._refresh_average()
+
+        if commit:
+            db.session.commit()
+        return len(set(totals) | set(existing))
+
     @classmethod
     def find_by_id(cls, _id):
         return cls.query.filter_by(_id=_id).first()
@@ -54,6 +238,17 @@ class StudentYearGradeModel(db.Model):
             year_id=year_id
         ).first()
 
+    @classmethod
+    def find_by_students_subject_year(cls, student_ids, subject_id, year_id):
+        """Get cached grades for many students in a subject and school year in one query"""
+        if not student_ids:
+            return []
+        return cls.query.filter(
+            cls.student_id.in_(student_ids),
+            cls.subject_id == subject_id,
+            cls.year_id == year_id
+        ).all()
+
     @classmethod
     def find_by_student(cls, student_id):
         """Get all cached year grades for a student"""
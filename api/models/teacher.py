@@ -70,7 +70,8 @@ class TeacherModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def find_by_given_name(cls, given_name):
@@ -96,6 +97,22 @@ class TeacherModel(db.Model):
     def find_all(cls):
         return cls.query.all()
 
+    @classmethod
+    def filter_query(cls, given_name=None, surname=None, department_id=None):
+        """Unexecuted query for the teacher list filters"""
+        query = cls.query
+        if given_name:
+            query = query.filter(cls.given_name.ilike(f'%{given_name}%'))
+        if surname:
+            query = query.filter(cls.surname.ilike(f'%{surname}%'))
+        if department_id:
+            from models.teacher_department import TeacherDepartmentModel
+            query = query.filter(cls._id.in_(
+                db.session.query(TeacherDepartmentModel.teacher_id)
+                .filter(TeacherDepartmentModel.department_id == department_id)
+            ))
+        return query
+
     @classmethod
     def find_by_department_id(cls, department_id):
         """Find teachers by department using junction table"""
@@ -37,6 +37,20 @@ class TeacherDepartmentModel(db.Model):
     def find_by_department_id(cls, department_id):
         return cls.query.filter_by(department_id=department_id).all()
 
+    @classmethod
+    def teacher_ids_by_department(cls, department_ids):
+        """{department_id: [teacher_id]} for the given departments, in one query"""
+        department_ids = [d for d in set(department_ids) if d]
+        grouped = {department_id: [] for department_id in department_ids}
+        if not department_ids:
+            return grouped
+        rows = db.session.query(cls.department_id, cls.teacher_id).filter(
+            cls.department_id.in_(department_ids)
+        ).order_by(cls.teacher_id).all()
+        for department_id, teacher_id in rows:
+            grouped[department_id].append(teacher_id)
+        return grouped
+
     @classmethod
     def find_by_teacher_and_department(cls, teacher_id, department_id):
         return cls.query.filter_by(teacher_id=teacher_id, department_id=department_id).first()
@@ -28,12 +28,17 @@ class TermModel(db.Model):
 
     @classmethod
     def find_by_id(cls, _id):
-        return cls.query.filter_by(_id=_id).first()
+        from services.identity_map import identity_map
+        return identity_map.find_by_id(cls, _id)
 
     @classmethod
     def find_by_year_id(cls, year_id):
         return cls.query.filter_by(year_id=year_id).first()
 
+    @classmethod
+    def list_by_year_id(cls, year_id):
+        return cls.query.filter_by(year_id=year_id).all()
+
     def save_to_db(self):
         db.session.add(self)
         db.session.commit()
@@ -1,10 +1,13 @@
 from db import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, insert
 import uuid
 from datetime import datetime
 
 class TermGradeModel(db.Model):
     __tablename__ = 'term_grade'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'subject_id', 'term_id', name='uq_term_grade_student_subject_term'),
+    )
 
     _id = db.Column('_id', UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = db.Column(UUID(as_uuid=True), db.ForeignKey('student._id'), nullable=False)
@@ -97,6 +100,42 @@ class TermGradeModel(db.Model):
             term_id=term_id
         ).first()
 
+    @classmethod
+    def find_final_grades(cls, student_ids, subject_ids, term_id):
+        """{(student_id, subject_id): final_grade} for many students and subjects in one term, in one query"""
+        student_ids = list(student_ids)
+        subject_ids = list(subject_ids)
+        if not student_ids or not subject_ids:
+            return {}
+        rows = db.session.query(cls.student_id, cls.subject_id, cls.final_grade).filter(
+            cls.term_id == term_id,
+            cls.student_id.in_(student_ids),
+            cls.subject_id.in_(subject_ids)
+        ).all()
+        return {(student_id, subject_id): final_grade for student_id, subject_id, final_grade in rows}
+
+    @classmethod
+    def final_grades_for_classes(cls, class_ids, term_id):
+        """
+        [(student_id, final_grade)] for every enrollment in the given classes
+        that has a term grade in the class subject for term_id, in one query
+        """
+        from models.class_model import ClassModel
+        from models.student_class import StudentClassModel
+
+        class_ids = list(class_ids)
+        if not class_ids:
+            return []
+        return db.session.query(StudentClassModel.student_id, cls.final_grade).join(
+            ClassModel, ClassModel._id == StudentClassModel.class_id
+        ).join(
+            cls, db.and_(
+                cls.student_id == StudentClassModel.student_id,
+                cls.subject_id == ClassModel.subject_id,
+                cls.term_id == term_id
+            )
+        ).filter(StudentClassModel.class_id.in_(class_ids)).all()
+
     @classmethod
     def find_by_class_subject_term(cls, class_id, subject_id, term_id):
         return cls.query.filter_by(
@@ -196,3 +235,101 @@ class TermGradeModel(db.Model):
             new_grade.save_to_db()
             return new_grade
 
+    @classmethod
+    def calculate_and_save_batch(cls, term_id, pairs, created_by=None):
+        """
+        Calculate and upsert term grades for many students of one term at once.
+        pairs: iterable of (student_id, subject_id, class_id) tuples.
+        Component inputs are loaded as grouped aggregates and every row is
+        written with a single INSERT ... ON CONFLICT; manual overrides are kept.
+        Returns the saved rows as JSON dicts.
+        """
+        from models.grading_criteria import GradingCriteriaModel
+        from models.term import TermModel
+        from models.student_class import StudentClassModel
+        from models.class_model import ClassModel
+
+        term = TermModel.find_by_id(term_id)
+        if not term or not term.year_id:
+            return []
+
+        # Deduplicate on the natural key; the first class_id given wins
+        targets = {}
+        for student_id, subject_id, class_id in pairs:
+            targets.setdefault((str(student_id), str(subject_id)), class_id)
+        if not targets:
+            return []
+
+        student_ids = list({student_id for student_id, _ in targets})
+        subject_ids = list({subject_id for _, subject_id in targets})
+
+        # Year level per student, derived from their class enrollments (one query)
+        year_levels = {}
+        enrollment_rows = db.session.query(
+            StudentClassModel.student_id, ClassModel.year_level_id
+        ).join(
+            ClassModel, ClassModel._id == StudentClassModel.class_id
+        ).filter(StudentClassModel.student_id.in_(student_ids)).all()
+        for student_id, year_level_id in enrollment_rows:
+            if year_level_id:
+                year_levels.setdefault(str(student_id), str(year_level_id))
+
+        criteria_map = GradingCriteriaModel.find_by_school_year(term.year_id)
+        components = GradingCriteriaModel.component_aggregates(
+            term, student_ids=student_ids, subject_ids=subject_ids
+        )
+
+        now = datetime.utcnow()
+        rows = []
+        for (student_id, subject_id), class_id in targets.items():
+            criteria = criteria_map.get((subject_id, year_levels.get(student_id)))
+            if not criteria:
+                continue
+
+            calculated_grade = GradingCriteriaModel.combine_components(
+                criteria,
+                test_average=components['tests'].get((student_id, subject_id)),
+                homework_done=components['homework_done'].get((student_id, subject_id), 0),
+                homework_total=components['homework_total'].get(subject_id, 0),
+                attendance=components['attendance'].get((student_id, subject_id))
+            )
+            total_weight = float(criteria.tests_weight) + float(criteria.homework_weight) + float(criteria.attendance_weight)
+
+            rows.append({
+                '_id': uuid.uuid4(),
+                'student_id': student_id,
+                'subject_id': subject_id,
+                'term_id': term._id,
+                'class_id': class_id,
+                'calculated_grade': calculated_grade,
+                'final_grade': calculated_grade,
+                'component_count': 3,  # Always 3 components (tests, homework, attendance)
+                'total_weight_entered': total_weight,
+                'is_complete': total_weight >= 100,
+                'is_finalized': False,
+                'created_by': created_by,
+                'created_date': now,
+                'updated_date': now
+            })
+
+        if not rows:
+            return []
+
+        stmt = insert(cls).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'subject_id', 'term_id'],
+            set_={
+                'calculated_grade': stmt.excluded.calculated_grade,
+                'component_count': stmt.excluded.component_count,
+                'total_weight_entered': stmt.excluded.total_weight_entered,
+                'is_complete': stmt.excluded.is_complete,
+                # Use manual override if exists, otherwise use calculated
+                'final_grade': db.func.coalesce(cls.__table__.c.manual_override, stmt.excluded.calculated_grade),
+                'updated_date': stmt.excluded.updated_date
+            }
+        ).returning(cls)
+
+        # Serialize before committing so the returned rows are not reloaded one by one
+        saved = [grade.json() for grade in db.session.scalars(stmt, execution_options={'populate_existing': True})]
+        db.session.commit()
+        return saved
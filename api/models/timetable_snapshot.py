@@ -0,0 +1,137 @@
+import uuid
+from db import db
+from sqlalchemy.dialects.postgresql import JSONB, insert
+
+
+class TimetableSnapshotModel(db.Model):
+    """
+    Timetable Snapshot Model - Materialized timetable grid of one year level in one term
+    Rebuilt by ClassModelResource after every class write; triggers in
+    sql/migrations/0008_timetable_snapshot.sql drop snapshots whose classes,
+    subjects, teachers, periods or classrooms change by any other path, and
+    they are rebuilt on the next read. Builds and those triggers take the same
+    per-(year level, term) advisory lock (sql/migrations/0014), so a grid is
+    never stored from rows that a committed change has since replaced.
+    """
+    __tablename__ = 'timetable_snapshot'
+
+    year_level_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('year_level._id', ondelete='CASCADE'), primary_key=True)
+    term_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('term._id', ondelete='CASCADE'), primary_key=True)
+    # Class entries as served by /class/timetable, ordered by period start
+    timetable = db.Column(JSONB, nullable=False)
+    built_at = db.Column(db.TIMESTAMP, nullable=False, server_default=db.func.now())
+
+    @classmethod
+    def _lock(cls, year_level_id, term_ids):
+        """Take the advisory lock of each (year_level_id, term_id) until the transaction ends"""
+        # Same key and order as the triggers of 0014, so lockers never deadlock
+        for key in sorted(f"{year_level_id}{term_id}" for term_id in term_ids):
+            db.session.execute(
+                db.text("SELECT pg_advisory_xact_lock(hashtext('timetable_snapshot'), hashtext(:key))"),
+                {'key': key}
+            )
+
+    @classmethod
+    def _build(cls, year_level_id, term_ids):
+        """Timetable entries of the given terms, {term_id: [class entry]}, from one joined query"""
+        from models.class_model import ClassModel
+        from models.subject import SubjectModel
+        from models.teacher import TeacherModel
+        from models.period import PeriodModel
+        from models.classroom import ClassroomModel
+
+        built = {uuid.UUID(str(term_id)): [] for term_id in term_ids}
+        if not built:
+            return built
+        rows = db.session.query(
+            ClassModel, SubjectModel.subject_name, TeacherModel.given_name, TeacherModel.surname,
+            PeriodModel.name, PeriodModel.start_time, PeriodModel.end_time, ClassroomModel.room_name
+        ).outerjoin(
+            SubjectModel, SubjectModel._id == ClassModel.subject_id
+        ).outerjoin(
+            TeacherModel, TeacherModel._id == ClassModel.teacher_id
+        ).outerjoin(
+            PeriodModel, PeriodModel._id == ClassModel.period_id
+        ).outerjoin(
+            ClassroomModel, ClassroomModel._id == ClassModel.classroom_id
+        ).filter(
+            ClassModel.year_level_id == year_level_id,
+            ClassModel.term_id.in_(list(built))
+        ).all()
+
+        for class_item, subject_name, given_name, surname, period_name, start_time, end_time, room_name in rows:
+            class_data = class_item.json()
+            class_data['subject_name'] = subject_name
+            class_data['teacher_name'] = f"{given_name} {surname}" if given_name is not None else None
+            class_data['period_name'] = period_name
+            class_data['day_of_week'] = class_item.day_of_week  # Get day_of_week from class, not period
+            class_data['period_start'] = start_time.isoformat() if start_time else None
+            class_data['period_end'] = end_time.isoformat() if end_time else None
+            class_data['classroom_name'] = room_name
+            built[class_item.term_id].append(class_data)
+
+        for entries in built.values():
+            entries.sort(key=lambda x: (x['period_start'] or '', x['day_of_week'] or 0, x['class_name']))
+        return built
+
+    @classmethod
+    def _store(cls, year_level_id, built, overwrite):
+        if not built:
+            return
+        statement = insert(cls).values([
+            {'year_level_id': year_level_id, 'term_id': term_id, 'timetable': entries}
+            for term_id, entries in built.items()
+        ])
+        if overwrite:
+            statement = statement.on_conflict_do_update(
+                index_elements=['year_level_id', 'term_id'],
+                set_={'timetable': statement.excluded.timetable, 'built_at': db.func.now()}
+            )
+        else:
+            # A concurrent rebuild already stored a fresher grid
+            statement = statement.on_conflict_do_nothing()
+        db.session.execute(statement)
+
+    @classmethod
+    def find_or_build(cls, year_level_id, term_ids):
+        """
+        Timetable entries of a year level in each of term_ids, {term_id: [class entry]}.
+        Missing snapshots are built with one query and stored (commits).
+        """
+        term_ids = {uuid.UUID(str(term_id)) for term_id in term_ids}
+        if not term_ids:
+            return {}
+        found = cls._find(year_level_id, term_ids)
+        missing = term_ids - set(found)
+        if missing:
+            # Writes to these grids' rows wait for the lock, or have committed
+            # once we hold it; another reader may have stored them meanwhile
+            cls._lock(year_level_id, missing)
+            found.update(cls._find(year_level_id, missing))
+            built = cls._build(year_level_id, missing - set(found))
+            cls._store(year_level_id, built, overwrite=False)
+            db.session.commit()
+            found.update(built)
+        return found
+
+    @classmethod
+    def _find(cls, year_level_id, term_ids):
+        return {
+            snapshot.term_id: snapshot.timetable
+            for snapshot in cls.query.filter(
+                cls.year_level_id == year_level_id, cls.term_id.in_(list(term_ids))
+            ).all()
+        }
+
+    @classmethod
+    def rebuild(cls, keys):
+        """Rebuild the snapshots of the given (year_level_id, term_id) pairs and commit"""
+        by_year_level = {}
+        for year_level_id, term_id in keys:
+            if year_level_id and term_id:
+                by_year_level.setdefault(str(year_level_id), set()).add(str(term_id))
+        for year_level_id, term_ids in sorted(by_year_level.items()):
+            cls._lock(year_level_id, term_ids)
+            built = cls._build(year_level_id, term_ids)
+            cls._store(year_level_id, built, overwrite=True)
+        db.session.commit()
@@ -8,7 +8,10 @@ from models.term import TermModel
 from models.teacher import TeacherModel
 from models.student_class import StudentClassModel
 from models.student_assignment import StudentAssignmentModel
+from models.student_year_grade import StudentYearGradeModel
 from utils.auth_middleware import require_role, require_any_role
+from utils.pagination import paginate, parse_uuid_arg, PaginationError
+from services.identity_map import identity_map
 from flask import g
 import json
 from datetime import datetime
@@ -55,6 +58,44 @@ def create_student_assignments_for_class(assignment_id, class_name, subject_id,
         return 0
 
 
+def enhance_assignments(assignments):
+    """
+    Assignment json with assessment type, subject, class and term names.
+    Each related table is resolved with one IN query for the whole list.
+    """
+    identity_map.prefetch(AssessmentTypeModel, {a.assessment_type_id for a in assignments})
+    identity_map.prefetch(SubjectModel, {a.subject_id for a in assignments})
+    identity_map.prefetch(ClassModel, {a.class_id for a in assignments})
+    identity_map.prefetch(TermModel, {a.term_id for a in assignments})
+    
+    enhanced_assignments = []
+    for assignment in assignments:
+        assignment_data = assignment.json()
+        
+        # Add assessment type
+        assessment_type = AssessmentTypeModel.find_by_id(assignment.assessment_type_id)
+        if assessment_type:
+            assignment_data['assessment_type_name'] = assessment_type.type_name
+        
+        # Add subject
+        subject = SubjectModel.find_by_id(assignment.subject_id)
+        if subject:
+            assignment_data['subject_name'] = subject.subject_name
+        
+        # Add class
+        class_obj = ClassModel.find_by_id(assignment.class_id)
+        if class_obj:
+            assignment_data['class_name'] = class_obj.class_name
+        
+        # Add term
+        term = TermModel.find_by_id(assignment.term_id)
+        if term:
+            assignment_data['term_number'] = term.term_number
+        
+        enhanced_assignments.append(assignment_data)
+    return enhanced_assignments
+
+
 class AssignmentResource(Resource):
     """
     Assignment Resource - Manage assignments for classes
@@ -65,7 +106,7 @@ class AssignmentResource(Resource):
         """
         GET /assignment - Get all assignments (with filters)
         GET /assignment/<assignment_id> - Get specific assignment
-        Query params: class_id, term_id, subject_id, status, teacher_id
+        Query params: class_id, term_id, subject_id, status, teacher_id, limit, cursor
         """
         if assignment_id:
             # Get specific assignment
@@ -74,87 +115,30 @@ class AssignmentResource(Resource):
                 return {'message': 'Assignment not found'}, 404
             
             # Enhance assignment data with related information
-            assignment_data = assignment.json()
-            
-            # Add assessment type info
-            assessment_type = AssessmentTypeModel.find_by_id(assignment.assessment_type_id)
-            if assessment_type:
-                assignment_data['assessment_type_name'] = assessment_type.type_name
-            
-            # Add subject info
-            subject = SubjectModel.find_by_id(assignment.subject_id)
-            if subject:
-                assignment_data['subject_name'] = subject.subject_name
-            
-            # Add class info
-            class_obj = ClassModel.find_by_id(assignment.class_id)
-            if class_obj:
-                assignment_data['class_name'] = class_obj.class_name
-            
-            # Add term info
-            term = TermModel.find_by_id(assignment.term_id)
-            if term:
-                assignment_data['term_number'] = term.term_number
+            assignment_data = enhance_assignments([assignment])[0]
             
             return {'assignment': assignment_data}, 200
         
-        # Get all assignments with optional filters
-        class_id = request.args.get('class_id')
-        term_id = request.args.get('term_id')
-        subject_id = request.args.get('subject_id')
-        status = request.args.get('status')
-        teacher_id = request.args.get('teacher_id')
-        
-        # Start with all assignments
-        if class_id and term_id:
-            assignments = AssignmentModel.find_by_class_and_term(class_id, term_id)
-        elif class_id:
-            assignments = AssignmentModel.find_by_class(class_id)
-        elif term_id:
-            assignments = AssignmentModel.find_by_term(term_id)
-        elif teacher_id:
-            assignments = AssignmentModel.find_by_teacher(teacher_id)
-        elif status:
-            assignments = AssignmentModel.find_by_status(status)
-        else:
-            assignments = AssignmentModel.find_all()
-        
-        # Apply additional filters
-        if subject_id:
-            assignments = [a for a in assignments if str(a.subject_id) == subject_id]
-        if status and not request.args.get('status'):  # If status wasn't the primary filter
-            assignments = [a for a in assignments if a.status == status]
+        # Get assignments with optional filters, newest first
+        try:
+            query = AssignmentModel.filter_query(
+                class_id=parse_uuid_arg('class_id'),
+                term_id=parse_uuid_arg('term_id'),
+                subject_id=parse_uuid_arg('subject_id'),
+                status=request.args.get('status'),
+                teacher_id=parse_uuid_arg('teacher_id')
+            )
+            page = paginate(query, [AssignmentModel.created_date, AssignmentModel._id], descending=True)
+        except PaginationError as e:
+            return {'message': str(e)}, 400
         
         # Enhance each assignment with related info
-        enhanced_assignments = []
-        for assignment in assignments:
-            assignment_data = assignment.json()
-            
-            # Add assessment type
-            assessment_type = AssessmentTypeModel.find_by_id(assignment.assessment_type_id)
-            if assessment_type:
-                assignment_data['assessment_type_name'] = assessment_type.type_name
-            
-            # Add subject
-            subject = SubjectModel.find_by_id(assignment.subject_id)
-            if subject:
-                assignment_data['subject_name'] = subject.subject_name
-            
-            # Add class
-            class_obj = ClassModel.find_by_id(assignment.class_id)
-            if class_obj:
-                assignment_data['class_name'] = class_obj.class_name
-            
-            # Add term
-            term = TermModel.find_by_id(assignment.term_id)
-            if term:
-                assignment_data['term_number'] = term.term_number
-            
-            enhanced_assignments.append(assignment_data)
+        enhanced_assignments = enhance_assignments(page.items)
         
         return {
             'assignments': enhanced_assignments,
-            'count': len(enhanced_assignments)
+            'count': len(enhanced_assignments),
+            'pagination': page.meta()
         }, 200
 
     @require_any_role(['admin', 'teacher'])
@@ -278,6 +262,7 @@ class AssignmentResource(Resource):
         try:
             # Track if status is changing to 'published'
             old_status = assignment.status
+            old_max_score = assignment.max_score
             status_changed_to_published = False
             
             # Update fields
@@ -302,6 +287,13 @@ class AssignmentResource(Resource):
             
             assignment.save_to_db()
             
+            # Publishing, unpublishing or rescaling changes every grade's contribution
+            # to the cached year averages, so rebuild them for this subject and year
+            if old_status != assignment.status or str(old_max_score) != str(assignment.max_score):
+                term = TermModel.find_by_id(assignment.term_id)
+                if term and term.year_id:
+                    StudentYearGradeModel.rebuild(subject_id=assignment.subject_id, year_id=term.year_id)
+            
             # Auto-create student assignments if newly published
             students_created = 0
             if status_changed_to_published:
@@ -375,6 +367,7 @@ class TeacherAssignmentResource(Resource):
     def get(self):
         """
         GET /assignment/teacher - Get all assignments for authenticated teacher or admin
+        Query params: class_id, term_id, subject_id, status, teacher_id (admin only), limit, cursor
         """
         username = g.username if hasattr(g, 'username') else None
         user_role = g.role if hasattr(g, 'role') else None
@@ -382,45 +375,34 @@ class TeacherAssignmentResource(Resource):
         if not username:
             return {'message': 'Authentication required'}, 401
         
-        # If admin, return all assignments
-        if user_role == 'admin':
-            assignments = AssignmentModel.find_all()
-        else:
-            # If teacher, return only their assignments
-            teacher = TeacherModel.find_by_username(username)
-            if not teacher:
-                return {'message': 'Teacher not found'}, 404
-            assignments = AssignmentModel.find_by_teacher(teacher._id)
+        try:
+            # If admin, return all assignments
+            if user_role == 'admin':
+                teacher_id = parse_uuid_arg('teacher_id')
+            else:
+                # If teacher, return only their assignments
+                teacher = TeacherModel.find_by_username(username)
+                if not teacher:
+                    return {'message': 'Teacher not found'}, 404
+                teacher_id = teacher._id
+            
+            query = AssignmentModel.filter_query(
+                class_id=parse_uuid_arg('class_id'),
+                term_id=parse_uuid_arg('term_id'),
+                subject_id=parse_uuid_arg('subject_id'),
+                status=request.args.get('status'),
+                teacher_id=teacher_id
+            )
+            page = paginate(query, [AssignmentModel.created_date, AssignmentModel._id], descending=True)
+        except PaginationError as e:
+            return {'message': str(e)}, 400
         
         # Enhance each assignment with related info
-        enhanced_assignments = []
-        for assignment in assignments:
-            assignment_data = assignment.json()
-            
-            # Add assessment type
-            assessment_type = AssessmentTypeModel.find_by_id(assignment.assessment_type_id)
-            if assessment_type:
-                assignment_data['assessment_type_name'] = assessment_type.type_name
-            
-            # Add subject
-            subject = SubjectModel.find_by_id(assignment.subject_id)
-            if subject:
-                assignment_data['subject_name'] = subject.subject_name
-            
-            # Add class
-            class_obj = ClassModel.find_by_id(assignment.class_id)
-            if class_obj:
-                assignment_data['class_name'] = class_obj.class_name
-            
-            # Add term
-            term = TermModel.find_by_id(assignment.term_id)
-            if term:
-                assignment_data['term_number'] = term.term_number
-            
-            enhanced_assignments.append(assignment_data)
+        enhanced_assignments = enhance_assignments(page.items)
         
         return {
             'assignments': enhanced_assignments,
-            'count': len(enhanced_assignments)
+            'count': len(enhanced_assignments),
+            'pagination': page.meta()
         }, 200
 
@@ -4,12 +4,19 @@ from models.attendance import AttendanceModel
 from models.student import StudentModel
 from models.class_model import ClassModel
 from models.teacher import TeacherModel
-from models.student_class import StudentClassModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import paginate, parse_uuid_arg, PaginationError
+from services.grade_recompute_service import grade_recompute_service
+from services.identity_map import identity_map
+from db import db
 import json
+import uuid
 import logging
 from datetime import datetime, date
 
+# Upper bound on class x date rosters returned by one roster request
+ROSTER_MAX_COMBINATIONS = 100
+
 class AttendanceResource(Resource):
     """
     Attendance Resource - Manage student attendance
@@ -21,6 +28,8 @@ class AttendanceResource(Resource):
         GET /attendance/<attendance_id> - Get specific attendance record
         GET /attendance?student_id=X - Get attendance for student
         GET /attendance?class_id=X&date=YYYY-MM-DD - Get attendance for class on date
+        GET /attendance?class_id=X&subject_id=Y&term_id=Z[&year_id=W] - Class attendance view
+        Student, class and date range listings are paginated with limit and cursor
         """
         if attendance_id:
             # Get specific record
@@ -51,19 +60,25 @@ class AttendanceResource(Resource):
             try:
                 start_date = datetime.fromisoformat(start_date_str).date()
                 end_date = datetime.fromisoformat(end_date_str).date()
-                
-                records = AttendanceModel.find_by_date_range(
-                    start_date, end_date, 
-                    student_id=student_id, 
-                    class_id=class_id
-                )
-                
-                return {
-                    'attendance_records': [r.json() for r in records],
-                    'count': len(records)
-                }, 200
             except ValueError as e:
                 return {'message': f'Invalid date format: {str(e)}'}, 400
+            
+            try:
+                query = AttendanceModel.filter_query(
+                    student_id=parse_uuid_arg('student_id'),
+                    class_id=parse_uuid_arg('class_id'),
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                page = paginate(query, [AttendanceModel.date, AttendanceModel._id], descending=True)
+            except PaginationError as e:
+                return {'message': str(e)}, 400
+            
+            return {
+                'attendance_records': [r.json() for r in page.items],
+                'count': len(page.items),
+                'pagination': page.meta()
+            }, 200
         
         # Specific class and date
         if class_id and date_str:
@@ -112,35 +127,33 @@ class AttendanceResource(Resource):
                     student_id = str(student._id)
                     logging.info(f"[Attendance] Using student_id from DB: {student_id}")
             
-            # Get optional filters
-            subject_id = request.args.get('subject_id')
-            term_id = request.args.get('term_id')
-            year_id = request.args.get('year_id')
-            
-            records = AttendanceModel.find_by_student_id(student_id)
+            # Optional subject/term/year filters are applied in SQL through the class
+            try:
+                query = AttendanceModel.filter_query(
+                    student_id=student_id,
+                    subject_id=parse_uuid_arg('subject_id'),
+                    term_id=parse_uuid_arg('term_id'),
+                    year_id=parse_uuid_arg('year_id')
+                )
+                page = paginate(query, [AttendanceModel.date, AttendanceModel._id], descending=True)
+            except PaginationError as e:
+                return {'message': str(e)}, 400
             
-            # Enhance with class info and apply filters
+            # Enhance with class info
+            from models.subject import SubjectModel
+            identity_map.prefetch(ClassModel, {r.class_id for r in page.items})
+            identity_map.prefetch(
+                SubjectModel,
+                {c.subject_id for c in (ClassModel.find_by_id(r.class_id) for r in page.items) if c}
+            )
             enhanced_records = []
-            for record in records:
+            for record in page.items:
                 record_data = record.json()
                 class_obj = ClassModel.find_by_id(record.class_id)
                 if class_obj:
                     record_data['class_name'] = class_obj.class_name
                     
-                    # Apply filters based on class properties
-                    if subject_id and str(class_obj.subject_id) != subject_id:
-                        continue
-                    if term_id and str(class_obj.term_id) != term_id:
-                        continue
-                    if year_id:
-                        # Get term to check year
-                        from models.term import TermModel
-                        term = TermModel.find_by_id(class_obj.term_id)
-                        if not term or str(term.year_id) != year_id:
-                            continue
-                    
                     # Add additional class info for display
-                    from models.subject import SubjectModel
                     subject = SubjectModel.find_by_id(class_obj.subject_id)
                     if subject:
                         record_data['subject_name'] = subject.subject_name
@@ -149,87 +162,42 @@ class AttendanceResource(Resource):
             
             return {
                 'attendance_records': enhanced_records,
-                'count': len(enhanced_records)
+                'count': len(enhanced_records),
+                'pagination': page.meta()
             }, 200
         
         # Class attendance (for admin/teacher viewing all students in a class)
         if class_id:
-            # Get filters
-            subject_id = request.args.get('subject_id')
-            term_id = request.args.get('term_id')
-            year_id = request.args.get('year_id')
-            
-            # Find ALL classes that match the filters (subject, term, year)
-            # This handles cases where there are multiple class instances with the same name
-            from models.term import TermModel
-            
-            matching_classes = []
-            if subject_id and term_id:
-                # Find all classes with this subject and term
-                all_classes = ClassModel.query.filter_by(subject_id=subject_id, term_id=term_id).all()
+            # Covers every class instance with the same name, subject and term
+            # (students may be enrolled in any of them); answered by one join
+            try:
+                class_uuid = parse_uuid_arg('class_id')
+                subject_id = parse_uuid_arg('subject_id')
+                term_id = parse_uuid_arg('term_id')
+                year_id = parse_uuid_arg('year_id')
+                if not (subject_id and term_id):
+                    return {'attendance_records': [], 'count': 0}, 200
                 
-                # Also get the class name from the provided class_id to match
-                target_class = ClassModel.find_by_id(class_id)
-                if target_class:
-                    target_class_name = target_class.class_name
-                    
-                    # Filter to classes with the same name
-                    matching_classes = [c for c in all_classes if c.class_name == target_class_name]
-            
-            if not matching_classes:
-                return {'attendance_records': [], 'count': 0}, 200
-            
-            # Get all students enrolled in ANY of these matching classes
-            from models.student_class import StudentClassModel
-            student_ids = set()
-            for cls in matching_classes:
-                student_classes = StudentClassModel.query.filter_by(class_id=cls._id).all()
-                for sc in student_classes:
-                    student_ids.add(sc.student_id)
-            
-            student_ids = list(student_ids)
+                query = AttendanceModel.class_view_query(class_uuid, subject_id, term_id, year_id=year_id)
+                page = paginate(
+                    query, [AttendanceModel.date, AttendanceModel._id],
+                    descending=True, row_entity=lambda row: row[0]
+                )
+            except PaginationError as e:
+                return {'message': str(e)}, 400
             
-            # Get attendance records for all these students
             enhanced_records = []
-            for student_id in student_ids:
-                # Get all attendance for this student
-                student_records = AttendanceModel.find_by_student_id(student_id)
-                
-                for record in student_records:
-                    # Get the class for this attendance record
-                    record_class = ClassModel.find_by_id(record.class_id)
-                    if not record_class:
-                        continue
-                    
-                    # Apply filters - must match subject, term, year
-                    if subject_id and str(record_class.subject_id) != subject_id:
-                        continue
-                    
-                    if term_id and str(record_class.term_id) != term_id:
-                        continue
-                    
-                    if year_id:
-                        from models.term import TermModel
-                        term = TermModel.find_by_id(record_class.term_id)
-                        if not term or str(term.year_id) != year_id:
-                            continue
-                    
-                    # Build record data
-                    record_data = record.json()
-                    
-                    # Add student name
-                    student = StudentModel.find_by_id(record.student_id)
-                    if student:
-                        record_data['student_name'] = f"{student.given_name} {student.surname}"
-                    
-                    # Add class name
-                    record_data['class_name'] = record_class.class_name
-                    
-                    enhanced_records.append(record_data)
+            for record, given_name, surname, class_name in page.items:
+                record_data = record.json()
+                if given_name is not None:
+                    record_data['student_name'] = f"{given_name} {surname}"
+                record_data['class_name'] = class_name
+                enhanced_records.append(record_data)
             
             return {
                 'attendance_records': enhanced_records,
-                'count': len(enhanced_records)
+                'count': len(enhanced_records),
+                'pagination': page.meta()
             }, 200
         
         return {'message': 'Please provide student_id, class_id, or date filters'}, 400
@@ -276,73 +244,69 @@ class AttendanceResource(Resource):
             if teacher:
                 created_by = teacher._id
         
-        created_records = []
-        updated_records = []
         errors = []
         
+        # Validate the roster: one entry per student, students checked with one IN query
+        entries = {}
+        for attendance_item in data['attendance']:
+            student_id = attendance_item.get('student_id')
+            if not student_id:
+                errors.append('Missing student_id in attendance item')
+                continue
+            try:
+                student_uuid = uuid.UUID(str(student_id))
+            except ValueError:
+                errors.append(f'Student {student_id} not found')
+                continue
+            # A student listed twice keeps the last entry
+            entries[student_uuid] = {
+                'student_id': student_uuid,
+                'status': attendance_item.get('status', 'present'),
+                'notes': attendance_item.get('notes')
+            }
+        
+        known_students = {
+            row[0] for row in db.session.query(StudentModel._id).filter(StudentModel._id.in_(list(entries)))
+        } if entries else set()
+        for student_uuid in list(entries):
+            if student_uuid not in known_students:
+                errors.append(f'Student {student_uuid} not found')
+                del entries[student_uuid]
+        
+        # Read before the commit expires class_obj
+        class_id, subject_id, term_id = class_obj._id, class_obj.subject_id, class_obj.term_id
+        
         try:
-            for attendance_item in data['attendance']:
-                student_id = attendance_item.get('student_id')
-                status = attendance_item.get('status', 'present')
-                notes = attendance_item.get('notes')
-                
-                if not student_id:
-                    errors.append('Missing student_id in attendance item')
-                    continue
-                
-                # Validate student exists
-                student = StudentModel.find_by_id(student_id)
-                if not student:
-                    errors.append(f'Student {student_id} not found')
-                    continue
-                
-                # Check if record already exists
-                existing = AttendanceModel.find_by_student_class_date(
-                    student_id, data['class_id'], attendance_date
-                )
-                
-                if existing:
-                    # Update existing record
-                    existing.status = status
-                    existing.subject_id = class_obj.subject_id  # Ensure subject_id is set
-                    if notes:
-                        existing.notes = notes
-                    existing.updated_date = datetime.now()
-                    existing.save_to_db()
-                    updated_records.append(existing.json())
+            # Whole roster in one statement and one transaction
+            written = AttendanceModel.upsert_roster(
+                class_id, subject_id, attendance_date,
+                list(entries.values()), created_by=created_by
+            )
+            db.session.commit()
+            
+            created_ids = {_id for _id, created in written if created}
+            created_records = []
+            updated_records = []
+            for record in AttendanceModel.find_by_ids([_id for _id, _ in written]):
+                if record._id in created_ids:
+                    created_records.append(record.json())
                 else:
-                    # Create new record
-                    new_attendance = AttendanceModel(
-                        student_id=student_id,
-                        class_id=data['class_id'],
-                        date=attendance_date,
-                        status=status,
-                        subject_id=class_obj.subject_id,  # Link to subject for grading
-                        notes=notes,
-                        created_by=created_by
-                    )
-                    new_attendance.save_to_db()
-                    created_records.append(new_attendance.json())
+                    updated_records.append(record.json())
             
             # Recalculate term grades for affected students
             affected_students = set()
-            for record in created_records + updated_records:
-                rec_student_id = record.get('student_id')
-                if rec_student_id and class_obj.subject_id and class_obj.term_id:
-                    affected_students.add((rec_student_id, str(class_obj.subject_id), str(class_obj.term_id)))
+            if subject_id and term_id:
+                for student_uuid in entries:
+                    affected_students.add((str(student_uuid), str(subject_id), str(term_id)))
             
-            # Recalculate term grades
-            for std_id, subj_id, trm_id in affected_students:
-                try:
-                    from models.term_grade import TermGradeModel
-                    TermGradeModel.calculate_and_save(
-                        student_id=std_id,
-                        subject_id=subj_id,
-                        term_id=trm_id,
-                        class_id=data['class_id']
-                    )
-                except Exception as e:
-                    logging.error(f"Error recalculating term grade after attendance: {e}")
+            # Queue term grade recomputation (coalesced in the background)
+            try:
+                grade_recompute_service.enqueue_many(
+                    (std_id, subj_id, trm_id, data['class_id'])
+                    for std_id, subj_id, trm_id in affected_students
+                )
+            except Exception as e:
+                logging.error(f"Error queueing term grade recalculation after attendance: {e}")
             
             response = {
                 'success': True,
@@ -354,6 +318,7 @@ class AttendanceResource(Resource):
             return Response(json.dumps(response), 201, mimetype='application/json')
         
         except Exception as e:
+            db.session.rollback()
             response = {
                 'success': False,
                 'message': f'Error saving attendance: {str(e)}'
@@ -391,57 +356,158 @@ class AttendanceRosterResource(Resource):
     """
     
     @require_any_role(['admin', 'teacher'])
-    def get(self, class_id):
+    def get(self, class_id=None):
         """
         GET /attendance/roster/<class_id>?date=YYYY-MM-DD
         Returns list of students with their attendance status for that date
+        GET /attendance/roster?class_ids=X,Y&dates=YYYY-MM-DD,YYYY-MM-DD
+        Returns one roster per class and date (e.g. a week view) in one response
         """
-        class_obj = ClassModel.find_by_id(class_id)
-        if not class_obj:
+        class_ids_arg = class_id or request.args.get('class_ids', '')
+        try:
+            class_ids = list(dict.fromkeys(uuid.UUID(c.strip()) for c in class_ids_arg.split(',') if c.strip()))
+        except ValueError:
+            if class_id:
+                return {'message': 'Class not found'}, 404
+            return {'message': 'Invalid class_ids format'}, 400
+        if not class_ids:
+            return {'message': 'class_ids parameter is required'}, 400
+        
+        identity_map.prefetch(ClassModel, class_ids)
+        classes = {c_id: ClassModel.find_by_id(c_id) for c_id in class_ids}
+        if not all(classes.values()):
             return {'message': 'Class not found'}, 404
         
-        date_str = request.args.get('date')
-        if not date_str:
+        dates_arg = request.args.get('dates') or request.args.get('date')
+        if not dates_arg:
             return {'message': 'Date parameter is required'}, 400
         
         try:
-            attendance_date = datetime.fromisoformat(date_str).date()
+            dates = sorted({datetime.fromisoformat(d.strip()).date() for d in dates_arg.split(',') if d.strip()})
         except ValueError:
             return {'message': 'Invalid date format. Use YYYY-MM-DD'}, 400
         
-        # Get students enrolled in this class
-        enrollments = StudentClassModel.find_by_class_id(class_id)
-        student_ids = [e.student_id for e in enrollments]
-        
-        # Get existing attendance records for this date
-        attendance_records = AttendanceModel.find_by_class_and_date(class_id, attendance_date)
-        attendance_map = {str(r.student_id): r for r in attendance_records}
+        if len(class_ids) * len(dates) > ROSTER_MAX_COMBINATIONS:
+            return {'message': f'At most {ROSTER_MAX_COMBINATIONS} class/date rosters per request'}, 400
         
-        # Build roster
-        roster = []
-        for student_id in student_ids:
-            student = StudentModel.find_by_id(student_id)
-            if not student:
-                continue
-            
-            attendance_record = attendance_map.get(str(student_id))
-            
-            roster.append({
-                'student_id': str(student._id),
-                'student_name': f"{student.given_name} {student.surname}",
-                'status': attendance_record.status if attendance_record else 'present',
-                'notes': attendance_record.notes if attendance_record else None,
-                'attendance_id': str(attendance_record._id) if attendance_record else None
+        # Enrollments x dates x students x attendance, sorted by name in SQL
+        rosters = {(c_id, d): [] for c_id in class_ids for d in dates}
+        rows = AttendanceModel.roster_rows(class_ids, dates)
+        for row_class_id, row_date, student_id, given_name, surname, status, notes, attendance_id in rows:
+            rosters[(row_class_id, row_date)].append({
+                'student_id': str(student_id),
+                'student_name': f"{given_name} {surname}",
+                'status': status if attendance_id else 'present',
+                'notes': notes if attendance_id else None,
+                'attendance_id': str(attendance_id) if attendance_id else None
             })
         
-        # Sort by student name
-        roster.sort(key=lambda x: x['student_name'])
+        results = []
+        for (roster_class_id, roster_date), roster in rosters.items():
+            results.append({
+                'class_id': str(roster_class_id),
+                'class_name': classes[roster_class_id].class_name,
+                'date': roster_date.isoformat(),
+                'roster': roster,
+                'student_count': len(roster)
+            })
         
+        if class_id and len(results) == 1:
+            return results[0], 200
         return {
-            'class_id': str(class_id),
-            'class_name': class_obj.class_name,
-            'date': date_str,
-            'roster': roster,
-            'student_count': len(roster)
+            'rosters': results,
+            'count': len(results)
         }, 200
 
+
+class AttendanceRollupRebuildResource(Resource):
+    """
+    Attendance Rollup Rebuild Resource - Repair the per student/subject/term attendance counts
+    """
+
+    @require_any_role(['admin'])
+    def post(self):
+        """
+        POST /attendance/rollup/rebuild - Recompute attendance_rollup from raw attendance
+        Body (optional): {"term_id": "uuid"} to rebuild a single term
+        """
+        from models.attendance_rollup import AttendanceRollupModel
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            rebuilt = AttendanceRollupModel.rebuild(term_id=data.get('term_id'))
+            response = {
+                'success': True,
+                'message': f'Rebuilt {rebuilt} attendance rollup rows',
+                'rebuilt': rebuilt
+            }
+            return Response(json.dumps(response), 200, mimetype='application/json')
+        
+        except Exception as e:
+            db.session.rollback()
+            response = {
+                'success': False,
+                'message': f'Error rebuilding attendance rollup: {str(e)}'
+            }
+            return Response(json.dumps(response), 500, mimetype='application/json')
+
+
+class AttendancePresenceResource(Resource):
+    """
+    Attendance Presence Resource - Daily/weekly attendance counts per class or student
+    """
+
+    @require_any_role(['admin', 'teacher', 'student', 'secretary'])
+    def get(self):
+        """
+        GET /attendance/presence?class_id=X&period=day|week[&start_date=YYYY-MM-DD&end_date=YYYY-MM-DD]
+        GET /attendance/presence?student_id=X&period=day|week[&start_date=...&end_date=...]
+        Served from TimescaleDB continuous aggregates when enabled, from attendance otherwise
+        """
+        period = request.args.get('period', 'week')
+        if period not in ('day', 'week'):
+            return {'message': 'period must be day or week'}, 400
+        
+        try:
+            class_id = parse_uuid_arg('class_id')
+            student_id = parse_uuid_arg('student_id')
+        except PaginationError as e:
+            return {'message': str(e)}, 400
+        if bool(class_id) == bool(student_id):
+            return {'message': 'Provide exactly one of class_id or student_id'}, 400
+        
+        try:
+            start_date = datetime.fromisoformat(request.args['start_date']).date() if request.args.get('start_date') else None
+            end_date = datetime.fromisoformat(request.args['end_date']).date() if request.args.get('end_date') else None
+        except ValueError as e:
+            return {'message': f'Invalid date format: {str(e)}'}, 400
+        
+        user_role = g.role if hasattr(g, 'role') else None
+        if user_role == 'student':
+            username = g.username if hasattr(g, 'username') else None
+            student = StudentModel.find_by_username(username) if username else None
+            if not student or not student_id or student._id != student_id:
+                return {'message': 'Access denied'}, 403
+        
+        scope = 'class' if class_id else 'student'
+        rows = AttendanceModel.presence_summary(
+            scope, period, class_id or student_id, start_date=start_date, end_date=end_date
+        )
+        buckets = []
+        for bucket, present, absent, late, excused, total in rows:
+            buckets.append({
+                'bucket': bucket.isoformat(),
+                'present_count': int(present),
+                'absent_count': int(absent),
+                'late_count': int(late),
+                'excused_count': int(excused),
+                'total_count': int(total),
+                'presence_rate': round(int(present) / int(total), 4) if total else None
+            })
+        
+        return {
+            f'{scope}_id': str(class_id or student_id),
+            'period': period,
+            'buckets': buckets,
+            'count': len(buckets)
+        }, 200
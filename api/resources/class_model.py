@@ -7,9 +7,41 @@ from models.period import PeriodModel
 from models.term import TermModel
 from models.school_year import SchoolYearModel
 from models.classroom import ClassroomModel
+from models.timetable_snapshot import TimetableSnapshotModel
 from utils.auth_middleware import require_role
+from utils.pagination import paginate, parse_uuid_arg, PaginationError
+from db import db
 
 import json
+import logging
+
+
+def rebuild_timetables(keys):
+    """Rebuild the timetable grids of the (year_level_id, term_id) pairs a class write touched"""
+    try:
+        TimetableSnapshotModel.rebuild(keys)
+    except Exception as e:
+        # The write's triggers already dropped the stale grids; the next read rebuilds them
+        db.session.rollback()
+        logging.error(f"[Timetable] Rebuilding grids {keys} failed: {e}")
+
+
+SLOT_CONFLICT_MESSAGES = {
+    'year_level': 'This period and day is already assigned to another class in this year level',
+    'teacher': 'This teacher is already assigned to another class in this term at the same time',
+    'classroom': 'This classroom is already booked for another class in this term at the same time'
+}
+
+
+def slot_conflict(term_id, period_id, day_of_week, year_level_id, teacher_id=None, classroom_id=None,
+                  exclude_class_id=None):
+    """Message for the first resource already booked in the term's slot, None when it is free"""
+    kind = ClassModel.slot_clash(
+        term_id, day_of_week, period_id,
+        year_level_id=year_level_id, teacher_id=teacher_id, classroom_id=classroom_id,
+        exclude_class_id=exclude_class_id
+    )
+    return SLOT_CONFLICT_MESSAGES[kind] if kind else None
 
 
 class ClassModelResource(Resource):
@@ -88,26 +120,16 @@ class ClassModelResource(Resource):
                 }
                 return Response(json.dumps(response), 400)
         
-        # Check for conflicts only if period_id and day_of_week are provided
+        # Check for conflicts only if period_id and day_of_week are provided:
+        # year level, teacher and classroom must all be free in this term's slot
         if period_id and day_of_week:
-            # Check year level conflict: same year_level + period + day
-            existing_class = ClassModel.find_by_year_level_period_and_day(year_level_id, period_id, day_of_week)
-            if existing_class:
+            conflict = slot_conflict(term_id, period_id, day_of_week, year_level_id, teacher_id, classroom_id)
+            if conflict:
                 response = {
                     'success': False,
-                    'message': 'This period and day is already assigned to another class in this year level'
+                    'message': conflict
                 }
                 return Response(json.dumps(response), 400)
-            
-            # Check teacher conflict: same teacher + term + period + day
-            if teacher_id:
-                has_conflict = ClassModel.find_teacher_conflicts(teacher_id, term_id, period_id, day_of_week)
-                if has_conflict:
-                    response = {
-                        'success': False,
-                        'message': 'This teacher is already assigned to another class in this term at the same time'
-                    }
-                    return Response(json.dumps(response), 400)
 
         # Convert empty strings to None for optional fields
         cleaned_data = data.copy()
@@ -117,6 +139,7 @@ class ClassModelResource(Resource):
         
         new_class = ClassModel(**cleaned_data)
         new_class.save_to_db()
+        rebuild_timetables([(new_class.year_level_id, new_class.term_id)])
 
         response = {
             'success': True,
@@ -167,11 +190,28 @@ class ClassModelResource(Resource):
             }
             return Response(json.dumps(response), 200)
         else:
-            # Get all classes
-            classes = ClassModel.query.all()
+            # Get classes matching the filters, one page at a time
+            try:
+                query = ClassModel.filter_query(
+                    term_id=parse_uuid_arg('term_id'),
+                    subject_id=parse_uuid_arg('subject_id'),
+                    teacher_id=parse_uuid_arg('teacher_id'),
+                    year_level_id=parse_uuid_arg('year_level_id'),
+                    classroom_id=parse_uuid_arg('classroom_id'),
+                    period_id=parse_uuid_arg('period_id'),
+                    day_of_week=request.args.get('day_of_week', type=int),
+                    class_name=request.args.get('class_name')
+                )
+                page = paginate(query, [ClassModel.class_name, ClassModel._id])
+            except PaginationError as e:
+                response = {
+                    'success': False,
+                    'message': str(e)
+                }
+                return Response(json.dumps(response), 400)
             classes_list = []
             
-            for class_item in classes:
+            for class_item in page.items:
                 class_data = class_item.json()
                 
                 # Enhance with related data
@@ -202,7 +242,8 @@ class ClassModelResource(Resource):
             
             response = {
                 'success': True,
-                'message': classes_list
+                'message': classes_list,
+                'pagination': page.meta()
             }
             return Response(json.dumps(response), 200)
 
@@ -232,28 +273,24 @@ class ClassModelResource(Resource):
         check_day_of_week = data.get('day_of_week', class_id.day_of_week)
         check_term_id = data.get('term_id', class_id.term_id)
         check_teacher_id = data.get('teacher_id', class_id.teacher_id)
+        check_classroom_id = data.get('classroom_id', class_id.classroom_id)
         
-        # Check for year level conflict if period or day is being changed
-        if (data.get('period_id') or data.get('day_of_week') or data.get('year_level_id')):
-            existing_class = ClassModel.find_by_year_level_period_and_day(check_year_level_id, check_period_id, check_day_of_week)
-            if existing_class and str(existing_class._id) != data['_id']:
-                response = {
-                    'success': False,
-                    'message': 'This period and day is already assigned to another class in this year level'
-                }
-                return Response(json.dumps(response), 400)
-        
-        # Check for teacher conflict if teacher, term, period, or day is being changed
-        if check_teacher_id and check_term_id and check_period_id and check_day_of_week:
-            has_conflict = ClassModel.find_teacher_conflicts(check_teacher_id, check_term_id, check_period_id, check_day_of_week, exclude_class_id=data['_id'])
-            if has_conflict:
+        # Check year level, teacher and classroom conflicts in the resulting slot
+        if check_term_id and check_period_id and check_day_of_week:
+            conflict = slot_conflict(
+                check_term_id, check_period_id, check_day_of_week, check_year_level_id,
+                check_teacher_id, check_classroom_id, exclude_class_id=data['_id']
+            )
+            if conflict:
                 response = {
                     'success': False,
-                    'message': 'This teacher is already assigned to another class in this term at the same time'
+                    'message': conflict
                 }
                 return Response(json.dumps(response), 400)
 
+        old_grid = (class_id.year_level_id, class_id.term_id)
         class_id.update_entry(data)
+        rebuild_timetables({old_grid, (class_id.year_level_id, class_id.term_id)})
 
         response = {
             'success': True,
@@ -273,7 +310,9 @@ class ClassModelResource(Resource):
             }
             return Response(json.dumps(response), 404)
 
+        old_grid = (class_id.year_level_id, class_id.term_id)
         class_id.delete_by_id(id)
+        rebuild_timetables([old_grid])
 
         response = {
                 'success': True,
@@ -3,12 +3,46 @@ from flask_restful import Resource
 from models.class_model import ClassModel
 from models.year_level import YearLevelModel
 from models.period import PeriodModel
-from models.teacher import TeacherModel
+from models.term import TermModel
+from models.timetable_snapshot import TimetableSnapshotModel
 from models.subject import SubjectModel
 from models.classroom import ClassroomModel
-from models.term import TermModel
-from models.school_year import SchoolYearModel
+from models.teacher_department import TeacherDepartmentModel
+from models.teacher import TeacherModel
+from utils.pagination import parse_uuid_arg, PaginationError
+from utils.http_cache import json_response_with_etag
+from services.timetable_conflicts import TimetableOccupancy, RESOURCE_KINDS
+from services.timetable_solver import TimetableSolver
+from utils.auth_middleware import require_role
+from sqlalchemy.exc import IntegrityError
+from db import db
 import json
+import os
+import time
+import uuid
+
+# Default and upper bound for the generator's search time
+TIMETABLE_SOLVER_SECONDS = float(os.getenv('TIMETABLE_SOLVER_SECONDS', '5'))
+TIMETABLE_SOLVER_MAX_SECONDS = 30.0
+GRADE_NAMES = ['', '1st', '2nd', '3rd', '4th', '5th', '6th', '7th', '8th', '9th']
+
+
+def default_class_name(year_level):
+    """Class name the timetable editor gives a year level's classes (e.g. '7th Grade 7')"""
+    order = year_level.level_order
+    grade_name = GRADE_NAMES[order] if 0 < order < len(GRADE_NAMES) else f'{order}th'
+    return f'{grade_name} {year_level.level_name}'
+
+
+class TimetableInputError(Exception):
+    pass
+
+
+def _parse_id(value, field):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise TimetableInputError(f'Invalid {field} format')
 
 
 class ClassTimetableResource(Resource):
@@ -16,8 +50,15 @@ class ClassTimetableResource(Resource):
 
     def get(self, year_level_id):
         # Get optional filters from query parameters
-        term_id = request.args.get('term_id')
-        year_id = request.args.get('year_id')  # School year filter
+        try:
+            term_id = parse_uuid_arg('term_id')
+            year_id = parse_uuid_arg('year_id')  # School year filter
+        except PaginationError as e:
+            response = {
+                'success': False,
+                'message': str(e)
+            }
+            return Response(json.dumps(response), 400)
         
         # Verify year level exists
         year_level = YearLevelModel.find_by_id(year_level_id)
@@ -28,54 +69,38 @@ class ClassTimetableResource(Resource):
             }
             return Response(json.dumps(response), 404)
 
-        # Get all classes for this year level
-        classes = ClassModel.find_by_year_level(year_level_id)
-        
-        # Filter by term if specified
+        # Terms whose grids make up the timetable
+        term = TermModel.find_by_id(term_id) if term_id else None
         if term_id:
-            classes = [cls for cls in classes if str(cls.term_id) == term_id]
-        
-        # Filter by school year if specified (through term.year_id)
-        if year_id:
-            filtered_classes = []
-            for cls in classes:
-                term = TermModel.find_by_id(cls.term_id)
-                if term and str(term.year_id) == year_id:
-                    filtered_classes.append(cls)
-            classes = filtered_classes
-        
-        # Get periods to build the full grid structure
-        # If year_id is provided, only get periods for that year
-        if year_id:
-            all_periods = PeriodModel.find_by_year_id(year_id)
+            term_ids = [term_id] if term and (not year_id or term.year_id == year_id) else []
+        elif year_id:
+            term_ids = [t._id for t in TermModel.list_by_year_id(year_id)]
         else:
-            # Get all periods if no year filter
-            all_periods = PeriodModel.query.all()
+            term_ids = [
+                row.term_id for row in
+                db.session.query(ClassModel.term_id).filter(ClassModel.year_level_id == year_level_id).distinct()
+            ]
         
-        # Build timetable with enhanced data
-        timetable = []
-        for class_item in classes:
-            class_data = class_item.json()
-            
-            # Enhance with related data
-            subject = SubjectModel.find_by_id(class_item.subject_id)
-            teacher = TeacherModel.find_by_id(class_item.teacher_id)
-            period = PeriodModel.find_by_id(class_item.period_id)
-            classroom = ClassroomModel.find_by_id(class_item.classroom_id)
-            
-            class_data['subject_name'] = subject.subject_name if subject else None
-            class_data['teacher_name'] = f"{teacher.given_name} {teacher.surname}" if teacher else None
-            class_data['period_name'] = period.name if period else None
-            class_data['day_of_week'] = class_item.day_of_week  # Get day_of_week from class, not period
-            class_data['period_start'] = period.start_time.isoformat() if period else None
-            class_data['period_end'] = period.end_time.isoformat() if period else None
-            class_data['classroom_name'] = classroom.room_name if classroom else None
-            
-            timetable.append(class_data)
+        # Precomputed per-term grids (built on first read, rebuilt on class writes)
+        grids = TimetableSnapshotModel.find_or_build(year_level._id, term_ids)
+        timetable = [entry for grid in grids.values() for entry in grid]
         
         # Sort by period start time if available
         timetable.sort(key=lambda x: x.get('period_start', '') if x.get('period_start') else '')
         
+        # Get periods to build the full grid structure: those of the school year
+        # when one is given (directly or through the term), otherwise those of
+        # the school years of the terms served
+        grid_year_id = year_id or (term.year_id if term else None)
+        if grid_year_id:
+            all_periods = PeriodModel.find_by_year_id(grid_year_id)
+        elif term_ids:
+            all_periods = PeriodModel.query.filter(PeriodModel.year_id.in_(
+                db.session.query(TermModel.year_id).filter(TermModel._id.in_(term_ids))
+            )).all()
+        else:
+            all_periods = []
+        
         # Build list of all periods for the grid
         all_periods_data = []
         for period in all_periods:
@@ -94,55 +119,299 @@ class ClassTimetableResource(Resource):
                 'all_periods': all_periods_data  # Include all periods for grid structure
             }
         }
-        return Response(json.dumps(response), 200)
+        return json_response_with_etag(response)
 
 
 class ClassConflictsResource(Resource):
-    """Check for conflicts in a year level's timetable"""
+    """Check for double-booked year levels, teachers and classrooms"""
 
-    def get(self, year_level_id):
-        # Verify year level exists
-        year_level = YearLevelModel.find_by_id(year_level_id)
-        if not year_level:
+    def get(self, year_level_id=None):
+        """
+        GET /class/conflicts - Every conflict in the school
+        GET /class/conflicts/<year_level_id> - Conflicts involving a year level's classes
+        Query params: term_id
+        """
+        try:
+            term_id = parse_uuid_arg('term_id')
+        except PaginationError as e:
             response = {
                 'success': False,
-                'message': 'Year level not found'
+                'message': str(e)
             }
-            return Response(json.dumps(response), 404)
+            return Response(json.dumps(response), 400)
+        
+        year_level = None
+        if year_level_id:
+            # Verify year level exists
+            year_level = YearLevelModel.find_by_id(year_level_id)
+            if not year_level:
+                response = {
+                    'success': False,
+                    'message': 'Year level not found'
+                }
+                return Response(json.dumps(response), 404)
 
-        # Get all classes for this year level
-        classes = ClassModel.find_by_year_level(year_level_id)
+        # Occupancy of every scheduled class (of the term), built in one pass
+        occupancy = TimetableOccupancy.load([term_id] if term_id else None)
+        conflicts = occupancy.conflicts()
         
-        # Check for conflicts (same period assigned to multiple classes)
-        conflicts = []
-        period_map = {}
+        if year_level:
+            conflicts = [
+                conflict for conflict in conflicts
+                if any(c['year_level_id'] == str(year_level._id) for c in conflict['classes'])
+            ]
         
-        for class_item in classes:
-            period_id = str(class_item.period_id)
-            if period_id in period_map:
-                # Conflict found - two classes in same period
-                conflicts.append({
-                    'period_id': period_id,
-                    'class_1': {
-                        '_id': str(period_map[period_id]._id),
-                        'class_name': period_map[period_id].class_name
-                    },
-                    'class_2': {
-                        '_id': str(class_item._id),
-                        'class_name': class_item.class_name
-                    }
-                })
-            else:
-                period_map[period_id] = class_item
+        counts = {kind: 0 for kind, _ in RESOURCE_KINDS}
+        for conflict in conflicts:
+            counts[conflict['type']] += 1
         
-        response = {
-            'success': True,
-            'message': {
+        message = {
+            'conflicts': conflicts,
+            'conflict_counts': counts,
+            'has_conflicts': len(conflicts) > 0
+        }
+        if year_level:
+            message = {
                 'year_level_id': year_level_id,
                 'year_level_name': year_level.level_name,
-                'conflicts': conflicts,
-                'has_conflicts': len(conflicts) > 0
+                **message
             }
+        response = {
+            'success': True,
+            'message': message
         }
         return Response(json.dumps(response), 200)
 
+
+class TimetableGenerateResource(Resource):
+    """Generate a conflict-free timetable for a term"""
+
+    @require_role('admin')
+    def post(self):
+        """
+        POST /class/timetable/generate
+        {
+            "term_id": "<uuid>",
+            "year_levels": [{
+                "year_level_id": "<uuid>",
+                "class_name": "optional, defaults to the timetable editor's name",
+                "subjects": [{
+                    "subject_id": "<uuid>",
+                    "weekly_hours": 4,
+                    "teacher_id": "optional; otherwise a teacher of the subject's department",
+                    "classroom_type_id": "optional; the class needs a classroom of this type"
+                }]
+            }],
+            "days": [1, 2, 3, 4, 5],
+            "period_ids": ["optional; defaults to the periods of the term's school year"],
+            "replace": false,
+            "dry_run": false,
+            "time_limit_seconds": 5
+        }
+        Existing classes of the term stay in place and are worked around; with
+        replace, those of the listed year levels are deleted first. The result is
+        written with one bulk insert (201), or only returned with dry_run (200).
+        """
+        data = request.get_json(silent=True) or {}
+        try:
+            problem = self._load_problem(data)
+        except TimetableInputError as e:
+            response = {
+                'success': False,
+                'message': str(e)
+            }
+            return Response(json.dumps(response), 400)
+        term, courses, class_names = problem['term'], problem['courses'], problem['class_names']
+        replace = problem['replace']
+
+        # Classes that stay in place keep their slots
+        occupied = [
+            (row.day_of_week, row.period_id, row.year_level_id, row.teacher_id, row.classroom_id)
+            for row in ClassModel.occupancy_rows([term._id])
+            if not (replace and row.year_level_id in class_names)
+        ]
+
+        started = time.monotonic()
+        solver = TimetableSolver(
+            problem['days'], problem['period_ids'], courses, problem['rooms_by_type'],
+            occupied=occupied, time_limit_seconds=problem['time_limit_seconds']
+        )
+        solved = solver.solve()
+        elapsed_ms = round((time.monotonic() - started) * 1000)
+
+        if not solved:
+            response = {
+                'success': False,
+                'message': 'No conflict-free timetable found within the time limit',
+                'unplaced': [
+                    {
+                        'year_level_id': str(item['course']['year_level_id']),
+                        'subject_id': str(item['course']['subject_id']),
+                        'hours_unplaced': item['hours_unplaced']
+                    }
+                    for item in solver.unplaced()
+                ],
+                'elapsed_ms': elapsed_ms
+            }
+            return Response(json.dumps(response), 422)
+
+        rows = [
+            {
+                '_id': uuid.uuid4(),
+                'term_id': term._id,
+                'year_level_id': placement['course']['year_level_id'],
+                'class_name': class_names[placement['course']['year_level_id']],
+                'subject_id': placement['course']['subject_id'],
+                'teacher_id': placement['teacher_id'],
+                'period_id': placement['period_id'],
+                'day_of_week': placement['day_of_week'],
+                'classroom_id': placement['classroom_id']
+            }
+            for placement in solver.placements()
+        ]
+
+        if not problem['dry_run']:
+            try:
+                if replace:
+                    ClassModel.delete_for_year_levels(term._id, class_names)
+                ClassModel.insert_many(rows)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                response = {
+                    'success': False,
+                    'message': 'Existing classes have enrollments, attendance or assignments and cannot be replaced'
+                }
+                return Response(json.dumps(response), 409)
+            from resources.class_model import rebuild_timetables
+            rebuild_timetables({(year_level_id, term._id) for year_level_id in class_names})
+
+        response = {
+            'success': True,
+            'message': {
+                'term_id': str(term._id),
+                'dry_run': problem['dry_run'],
+                'created': 0 if problem['dry_run'] else len(rows),
+                'classes': [
+                    {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in row.items()}
+                    for row in rows
+                ],
+                'unstaffed': [
+                    {'year_level_id': str(c['year_level_id']), 'subject_id': str(c['subject_id'])}
+                    for c in courses if c['teacher_ids'] == [None]
+                ],
+                'search_nodes': solver.nodes,
+                'elapsed_ms': elapsed_ms
+            }
+        }
+        return Response(json.dumps(response), 200 if problem['dry_run'] else 201)
+
+    @staticmethod
+    def _load_problem(data):
+        """Validate the request and load subjects, teachers, classrooms and periods in a few queries"""
+        if not isinstance(data, dict):
+            raise TimetableInputError('Request body must be a JSON object')
+        if not data.get('term_id'):
+            raise TimetableInputError('term_id is required')
+        term = TermModel.find_by_id(_parse_id(data['term_id'], 'term_id'))
+        if not term:
+            raise TimetableInputError('Term does not exist in the database')
+
+        days = data.get('days') or [1, 2, 3, 4, 5]
+        if (not isinstance(days, list)
+                or not all(isinstance(day, int) and not isinstance(day, bool) and 1 <= day <= 7 for day in days)
+                or len(set(days)) != len(days)):
+            raise TimetableInputError('days must be distinct integers from 1 (Monday) to 7')
+
+        if data.get('period_ids'):
+            if not isinstance(data['period_ids'], list):
+                raise TimetableInputError('period_ids must be a list')
+            period_ids = [_parse_id(period_id, 'period_id') for period_id in data['period_ids']]
+            periods = PeriodModel.query.filter(PeriodModel._id.in_(period_ids)).all()
+            if len(periods) != len(set(period_ids)):
+                raise TimetableInputError('Period does not exist in the database')
+        else:
+            periods = PeriodModel.find_by_year_id(term.year_id)
+        if not periods:
+            raise TimetableInputError('No periods to schedule into')
+        periods.sort(key=lambda period: period.start_time)
+
+        try:
+            time_limit_seconds = float(data.get('time_limit_seconds', TIMETABLE_SOLVER_SECONDS))
+        except (TypeError, ValueError):
+            raise TimetableInputError('time_limit_seconds must be a number')
+        time_limit_seconds = min(max(time_limit_seconds, 0.1), TIMETABLE_SOLVER_MAX_SECONDS)
+
+        year_levels = data.get('year_levels')
+        if not isinstance(year_levels, list) or not year_levels:
+            raise TimetableInputError('year_levels is required')
+
+        requested = []
+        class_names = {}
+        for entry in year_levels:
+            if not isinstance(entry, dict):
+                raise TimetableInputError('Each year_levels entry must be an object')
+            year_level = YearLevelModel.find_by_id(_parse_id(entry.get('year_level_id'), 'year_level_id'))
+            if not year_level:
+                raise TimetableInputError('Year level not found')
+            if year_level._id in class_names:
+                raise TimetableInputError('Each year level can only be listed once')
+            class_names[year_level._id] = entry.get('class_name') or default_class_name(year_level)
+            entry_subjects = entry.get('subjects') or []
+            if not isinstance(entry_subjects, list) or not all(isinstance(subject, dict) for subject in entry_subjects):
+                raise TimetableInputError('subjects must be a list of objects')
+            for subject in entry_subjects:
+                hours = subject.get('weekly_hours')
+                if not isinstance(hours, int) or isinstance(hours, bool) or hours < 1:
+                    raise TimetableInputError('weekly_hours must be a positive integer')
+                requested.append((
+                    year_level._id,
+                    _parse_id(subject.get('subject_id'), 'subject_id'),
+                    hours,
+                    _parse_id(subject['teacher_id'], 'teacher_id') if subject.get('teacher_id') else None,
+                    _parse_id(subject['classroom_type_id'], 'classroom_type_id') if subject.get('classroom_type_id') else None
+                ))
+
+        # Subjects, department teachers and classrooms for every course at once
+        subjects = {
+            subject._id: subject
+            for subject in SubjectModel.query.filter(SubjectModel._id.in_({r[1] for r in requested})).all()
+        }
+        if len(subjects) != len({r[1] for r in requested}):
+            raise TimetableInputError('Subject id does not exist in the database')
+        teachers_by_department = TeacherDepartmentModel.teacher_ids_by_department(
+            subject.department_id for subject in subjects.values()
+        )
+        fixed_teacher_ids = {r[3] for r in requested if r[3]}
+        if fixed_teacher_ids and TeacherModel.query.filter(TeacherModel._id.in_(fixed_teacher_ids)).count() != len(fixed_teacher_ids):
+            raise TimetableInputError('Teacher id does not exist in the database')
+        rooms_by_type = ClassroomModel.ids_by_room_type(r[4] for r in requested)
+        if not all(rooms_by_type.values()):
+            raise TimetableInputError('No classrooms of the requested classroom type')
+
+        courses = []
+        for year_level_id, subject_id, hours, teacher_id, room_type_id in requested:
+            if teacher_id:
+                teacher_ids = [teacher_id]
+            else:
+                # Unstaffed (None) when the department has no teachers, like classes created without one
+                teacher_ids = teachers_by_department.get(subjects[subject_id].department_id) or [None]
+            courses.append({
+                'year_level_id': year_level_id,
+                'subject_id': subject_id,
+                'hours': hours,
+                'teacher_ids': teacher_ids,
+                'room_type_id': room_type_id
+            })
+
+        return {
+            'term': term,
+            'days': days,
+            'period_ids': [period._id for period in periods],
+            'courses': courses,
+            'class_names': class_names,
+            'rooms_by_type': rooms_by_type,
+            'replace': bool(data.get('replace')),
+            'dry_run': bool(data.get('dry_run')),
+            'time_limit_seconds': time_limit_seconds
+        }
@@ -0,0 +1,88 @@
+from flask_restful import Resource
+from flask import Response, request, g
+from models.device_checkin import DeviceCheckinModel
+from utils.auth_middleware import require_any_role
+from services.device_checkin_service import device_checkin_service
+from db import db
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import json
+import logging
+import os
+
+# Upper bound on events per request; devices should split larger flushes
+DEVICE_CHECKIN_MAX_EVENTS = int(os.getenv('DEVICE_CHECKIN_MAX_EVENTS', '50000'))
+# Timestamps with an offset are converted to the school's wall-clock time (periods are stored naive)
+SCHOOL_TIMEZONE = ZoneInfo(os.getenv('SCHOOL_TIMEZONE', 'UTC'))
+MAX_REPORTED_ERRORS = 20
+
+
+class DeviceCheckinResource(Resource):
+    """
+    Device Check-in Resource - Bulk ingestion of badge/RFID scans from monitoring devices
+    """
+
+    @require_any_role(['device'])
+    def post(self):
+        """
+        POST /monitoring_data/checkins - NDJSON body, one scan per line:
+        {"badge_id": "<student_number>", "scanned_at": "2025-03-10T07:58:12"}
+        Headers: MONITORING_DEVICE_KEY, MONITORING_DEVICE_ID
+        Scans are staged and deduplicated, then matched to classes in the background (202)
+        """
+        device_id = getattr(g, 'device_id', None) or request.headers.get('MONITORING_DEVICE_ID') or 'admin'
+
+        events = []
+        errors = []
+        invalid = 0
+        received = 0
+        for line_number, raw_line in enumerate(request.stream, start=1):
+            line = raw_line.strip()
+            if not line:
+                continue
+            received += 1
+            if received > DEVICE_CHECKIN_MAX_EVENTS:
+                response = {
+                    'success': False,
+                    'message': f'At most {DEVICE_CHECKIN_MAX_EVENTS} events per request'
+                }
+                return Response(json.dumps(response), 413, mimetype='application/json')
+            try:
+                event = json.loads(line)
+                badge_id = str(event['badge_id']).strip()
+                if not badge_id or len(badge_id) > 64:
+                    raise ValueError('badge_id must be 1-64 characters')
+                scanned_at = datetime.fromisoformat(event['scanned_at'])
+                if scanned_at.tzinfo is not None:
+                    scanned_at = scanned_at.astimezone(SCHOOL_TIMEZONE).replace(tzinfo=None)
+                events.append((badge_id, scanned_at))
+            except (ValueError, KeyError, TypeError) as e:
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_number, 'error': str(e)})
+
+        try:
+            stored = DeviceCheckinModel.ingest(device_id, events)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"[DeviceCheckin] Ingestion failed for device {device_id}: {e}")
+            response = {
+                'success': False,
+                'message': f'Error storing check-ins: {str(e)}'
+            }
+            return Response(json.dumps(response), 500, mimetype='application/json')
+
+        if stored:
+            device_checkin_service.notify()
+
+        response = {
+            'success': True,
+            'device_id': device_id,
+            'received': received,
+            'accepted': stored,
+            'duplicates': len(events) - stored,
+            'invalid': invalid,
+            'errors': errors
+        }
+        return Response(json.dumps(response), 202, mimetype='application/json')
@@ -8,12 +8,12 @@ from models.class_model import ClassModel
 from models.subject import SubjectModel
 from models.score_range import ScoreRangeModel
 from models.teacher import TeacherModel
-from models.assessment_type import AssessmentTypeModel
 from utils.auth_middleware import require_role, require_any_role
+from services.grade_recompute_service import grade_recompute_service
 from flask import g
 import json
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 
 class GradeResource(Resource):
@@ -127,6 +127,11 @@ class GradeResource(Resource):
             )
             
             if existing_grade:
+                # Contribution to the year average before this change
+                old_percentage = StudentYearGradeModel.grade_contribution(
+                    existing_grade.score, existing_grade.status, assignment.max_score, assignment.status
+                )
+                
                 # Update existing grade
                 if 'score' in data:
                     existing_grade.score = data['score']
@@ -141,10 +146,10 @@ class GradeResource(Resource):
                 
                 existing_grade.save_to_db()
                 
-                # Recalculate year grade
-                self._recalculate_year_grade(data['student_id'], assignment.subject_id)
+                # Apply the change to the cached year grade
+                self._update_year_grade(data['student_id'], assignment, old_percentage, existing_grade)
                 
-                # Recalculate term grade
+                # Queue term grade recomputation (coalesced in the background)
                 self._recalculate_term_grade(data['student_id'], assignment.subject_id, assignment.term_id, assignment.class_id)
                 
                 response = {
@@ -178,10 +183,10 @@ class GradeResource(Resource):
                 )
                 new_grade.save_to_db()
                 
-                # Recalculate year grade
-                self._recalculate_year_grade(data['student_id'], assignment.subject_id)
+                # Apply the change to the cached year grade
+                self._update_year_grade(data['student_id'], assignment, None, new_grade)
                 
-                # Recalculate term grade
+                # Queue term grade recomputation (coalesced in the background)
                 self._recalculate_term_grade(data['student_id'], assignment.subject_id, assignment.term_id, assignment.class_id)
                 
                 response = {
@@ -224,13 +229,16 @@ class GradeResource(Resource):
         try:
             student_id = grade.student_id
             subject_id = assignment.subject_id
+            old_percentage = StudentYearGradeModel.grade_contribution(
+                grade.score, grade.status, assignment.max_score, assignment.status
+            )
             
             grade.delete_from_db()
             
-            # Recalculate year grade
-            self._recalculate_year_grade(student_id, subject_id)
+            # Remove the grade from the cached year grade
+            self._update_year_grade(student_id, assignment, old_percentage, None)
             
-            # Recalculate term grade
+            # Queue term grade recomputation (coalesced in the background)
             self._recalculate_term_grade(student_id, subject_id, assignment.term_id, assignment.class_id)
             
             response = {
@@ -246,94 +254,267 @@ class GradeResource(Resource):
             }
             return Response(json.dumps(response), 500, mimetype='application/json')
 
-    def _recalculate_year_grade(self, student_id, subject_id):
+    def _update_year_grade(self, student_id, assignment, old_percentage, grade):
         """
-        Recalculate and cache the student's year grade (0-20 scale)
-        Aggregates all graded assignments for this student in this subject across all terms in the current year
+        Apply a single grade change to the student's cached year grade (0-20 scale)
+        old_percentage is the grade's previous contribution (None if it did not count);
+        grade is the saved grade, or None when it was deleted
         """
         try:
             from models.term import TermModel
-            from models.school_year import SchoolYearModel
-            
-            # Get all assignments for this student's subject across all their classes
-            all_grades = StudentAssignmentModel.find_by_student(student_id)
             
-            # Filter to only grades for this subject and get the year
-            subject_assignments = []
-            year_id = None
-            
-            for grade_record in all_grades:
-                assignment = AssignmentModel.find_by_id(grade_record.assignment_id)
-                if assignment and str(assignment.subject_id) == str(subject_id) and assignment.status == 'published':
-                    # Get the year from the term
-                    if not year_id:
-                        term = TermModel.find_by_id(assignment.term_id)
-                        if term:
-                            year_id = term.year_id
-                    
-                    subject_assignments.append((assignment, grade_record))
-            
-            if not subject_assignments or not year_id:
+            term = TermModel.find_by_id(assignment.term_id)
+            if not term or not term.year_id:
                 return
             
-            # Calculate simple average on 0-100 scale first
-            total_percentage = Decimal('0.00')
-            count = 0
-            
-            for assignment, grade_record in subject_assignments:
-                if grade_record.score is not None and grade_record.status == 'graded':
-                    # Calculate percentage (0-100)
-                    percentage = (Decimal(str(grade_record.score)) / Decimal(str(assignment.max_score))) * Decimal('100')
-                    total_percentage += percentage
-                    count += 1
-            
-            # Calculate final average
-            if count > 0:
-                # Simple average on 0-100 scale
-                average_100 = total_percentage / count
-                
-                # Convert to 0-20 scale
-                average_20 = (average_100 / Decimal('100')) * Decimal('20')
-                average_20 = round(average_20, 2)
-                
-                # Update or create cached year grade
-                cached_grade = StudentYearGradeModel.find_by_student_subject_year(
-                    student_id, subject_id, year_id
+            new_percentage = None
+            if grade is not None:
+                new_percentage = StudentYearGradeModel.grade_contribution(
+                    grade.score, grade.status, assignment.max_score, assignment.status
                 )
-                
-                if cached_grade:
-                    cached_grade.calculated_average = average_20
-                    cached_grade.save_to_db()
-                else:
-                    new_cached_grade = StudentYearGradeModel(
-                        student_id=student_id,
-                        subject_id=subject_id,
-                        year_id=year_id,
-                        calculated_average=average_20
-                    )
-                    new_cached_grade.save_to_db()
+            
+            StudentYearGradeModel.apply_delta(
+                student_id, assignment.subject_id, term.year_id,
+                old_percentage=old_percentage, new_percentage=new_percentage
+            )
         
         except Exception as e:
-            print(f"Error recalculating year grade: {e}")
+            print(f"Error updating year grade: {e}")
 
     def _recalculate_term_grade(self, student_id, subject_id, term_id, class_id=None):
         """
-        Recalculate and save the student's term grade automatically
-        Uses grading_criteria to pull from student_assignment and attendance
+        Mark the student's term grade as stale; the recompute queue deduplicates
+        repeated saves and recalculates from grading_criteria in batches
         """
         try:
-            from models.term_grade import TermGradeModel
+            grade_recompute_service.enqueue(student_id, subject_id, term_id, class_id)
+        
+        except Exception as e:
+            print(f"Error queueing term grade recalculation: {e}")
+
+
+class GradeBatchResource(Resource):
+    """
+    Grade Batch Resource - Save many gradebook cells in one request
+    """
+
+    @require_any_role(['admin', 'teacher'])
+    def post(self):
+        """
+        POST /grade/batch - Create or update many student grades at once
+        Body: {
+            "grades": [
+                {"student_id": "uuid", "assignment_id": "uuid", "score": 15, "status": "graded", "feedback": "..."}
+            ]
+        }
+        Returns a per-cell result; valid cells are saved in one transaction
+        """
+        from db import db
+        from models.term import TermModel
+        from uuid import UUID
+        
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('grades'), list):
+            return {'message': 'grades array is required'}, 400
+        
+        entries = data['grades']
+        results = [None] * len(entries)
+        
+        def fail(index, entry, message):
+            results[index] = {
+                'index': index,
+                'student_id': entry.get('student_id') if isinstance(entry, dict) else None,
+                'assignment_id': entry.get('assignment_id') if isinstance(entry, dict) else None,
+                'success': False,
+                'message': message
+            }
+        
+        def cell_error(entry, assignment):
+            """Why the entry's score or status can't be stored (None when fine); normalizes score"""
+            if 'status' in entry and entry['status'] not in StudentAssignmentModel.STATUSES:
+                return f"status must be one of {', '.join(StudentAssignmentModel.STATUSES)}"
+            if entry.get('score') is None:
+                return None
+            score = entry['score']
+            try:
+                if isinstance(score, bool):
+                    raise InvalidOperation()
+                score = Decimal(str(score))
+                if not score.is_finite():
+                    raise InvalidOperation()
+            except (InvalidOperation, ValueError):
+                return 'score must be a number'
+            # Without a max_score, the column's precision (Numeric(5, 2)) is the bound
+            max_score = Decimal(str(assignment.max_score)) if assignment.max_score is not None else Decimal('999.99')
+            if score < 0 or score > max_score:
+                return f'score must be between 0 and {max_score}'
+            entry['score'] = score
+            return None
+        
+        # Shape validation
+        valid = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get('student_id') or not entry.get('assignment_id'):
+                fail(index, entry, 'student_id and assignment_id are required')
+                continue
+            try:
+                UUID(str(entry['student_id']))
+                UUID(str(entry['assignment_id']))
+            except ValueError:
+                fail(index, entry, 'Invalid student_id or assignment_id')
+                continue
+            valid.append((index, entry))
+        
+        # Set-based reference validation (one query per table)
+        student_ids = {str(e['student_id']) for _, e in valid}
+        assignment_ids = {str(e['assignment_id']) for _, e in valid}
+        known_students = {
+            str(row[0]) for row in db.session.query(StudentModel._id).filter(StudentModel._id.in_(student_ids)).all()
+        } if student_ids else set()
+        assignments = {
+            str(a._id): a for a in AssignmentModel.query.filter(AssignmentModel._id.in_(assignment_ids)).all()
+        } if assignment_ids else {}
+        
+        # Teachers can only grade assignments they created (admin can grade any)
+        teacher = None
+        username = g.username if hasattr(g, 'username') else None
+        user_role = g.role if hasattr(g, 'role') else None
+        if user_role == 'teacher':
+            teacher = TeacherModel.find_by_username(username) if username else None
+        
+        accepted = []
+        for index, entry in valid:
+            assignment = assignments.get(str(entry['assignment_id']))
+            if str(entry['student_id']) not in known_students:
+                fail(index, entry, 'Student not found')
+            elif not assignment:
+                fail(index, entry, 'Assignment not found')
+            elif teacher and assignment.created_by and str(assignment.created_by) != str(teacher._id):
+                fail(index, entry, 'You can only grade your own assignments')
+            else:
+                error = cell_error(entry, assignment)
+                if error:
+                    fail(index, entry, error)
+                else:
+                    accepted.append((index, entry))
+        
+        if not accepted:
+            response = {
+                'success': False,
+                'message': 'No valid grades to save',
+                'saved': 0,
+                'failed': len(entries),
+                'results': results
+            }
+            return Response(json.dumps(response), 400, mimetype='application/json')
+        
+        try:
+            # Current state of every touched cell (one query)
+            cell_keys = {(str(e['student_id']), str(e['assignment_id'])) for _, e in accepted}
+            existing = {
+                (str(grade.student_id), str(grade.assignment_id)): grade
+                for grade in StudentAssignmentModel.find_by_student_assignment_pairs(cell_keys)
+            }
             
-            # Calculate and save term grade from grading criteria
-            TermGradeModel.calculate_and_save(
-                student_id=student_id,
-                subject_id=subject_id,
-                term_id=term_id,
-                class_id=class_id
-            )
+            # Merge entries over the stored values; later entries for the same cell win
+            cells = {}
+            for index, entry in accepted:
+                key = (str(entry['student_id']), str(entry['assignment_id']))
+                if key not in cells:
+                    grade = existing.get(key)
+                    cells[key] = {
+                        'student_id': key[0],
+                        'assignment_id': key[1],
+                        'score': grade.score if grade else None,
+                        'submission_date': grade.submission_date if grade else None,
+                        'graded_date': grade.graded_date if grade else None,
+                        'feedback': grade.feedback if grade else None,
+                        'status': grade.status if grade else 'not_submitted'
+                    }
+                cell = cells[key]
+                if 'score' in entry:
+                    cell['score'] = entry['score']
+                if 'feedback' in entry:
+                    cell['feedback'] = entry['feedback']
+                if 'status' in entry:
+                    cell['status'] = entry['status']
+                if entry.get('submission_date'):
+                    try:
+                        cell['submission_date'] = datetime.fromisoformat(entry['submission_date'].replace('Z', '+00:00'))
+                    except (ValueError, AttributeError):
+                        pass
+                # Set graded_date if score was provided and status is graded
+                if 'score' in entry and entry.get('status') == 'graded':
+                    cell['graded_date'] = datetime.now()
+            
+            grade_ids = StudentAssignmentModel.upsert_many(list(cells.values()))
+            
+            # Year grade deltas, aggregated per student/subject/year
+            term_years = {
+                str(term._id): term.year_id
+                for term in TermModel.query.filter(
+                    TermModel._id.in_({str(a.term_id) for a in assignments.values()})
+                ).all()
+            }
+            deltas = {}
+            recompute = set()
+            for key, cell in cells.items():
+                assignment = assignments[key[1]]
+                grade = existing.get(key)
+                old_percentage = StudentYearGradeModel.grade_contribution(
+                    grade.score, grade.status, assignment.max_score, assignment.status
+                ) if grade else None
+                new_percentage = StudentYearGradeModel.grade_contribution(
+                    cell['score'], cell['status'], assignment.max_score, assignment.status
+                )
+                year_id = term_years.get(str(assignment.term_id))
+                if year_id and (old_percentage is not None or new_percentage is not None):
+                    delta_key = (key[0], str(assignment.subject_id), str(year_id))
+                    total_delta, count_delta = deltas.get(delta_key, (Decimal('0'), 0))
+                    deltas[delta_key] = (
+                        total_delta + (new_percentage or Decimal('0')) - (old_percentage or Decimal('0')),
+                        count_delta + (new_percentage is not None) - (old_percentage is not None)
+                    )
+                recompute.add((key[0], str(assignment.subject_id), str(assignment.term_id), str(assignment.class_id)))
+            
+            # Grades and year sums commit together
+            StudentYearGradeModel.apply_deltas(deltas)
+            db.session.commit()
         
         except Exception as e:
-            print(f"Error recalculating term grade: {e}")
+            db.session.rollback()
+            response = {
+                'success': False,
+                'message': f'Error saving grades: {str(e)}'
+            }
+            return Response(json.dumps(response), 500, mimetype='application/json')
+        
+        # One term grade recompute per affected student/subject/term
+        try:
+            grade_recompute_service.enqueue_many(recompute)
+        except Exception as e:
+            print(f"Error queueing term grade recalculation: {e}")
+        
+        for index, entry in accepted:
+            key = (str(entry['student_id']), str(entry['assignment_id']))
+            results[index] = {
+                'index': index,
+                'student_id': key[0],
+                'assignment_id': key[1],
+                'success': True,
+                'grade_id': grade_ids.get(key)
+            }
+        
+        saved = len(accepted)
+        response = {
+            'success': saved == len(entries),
+            'message': f'Grades saved: {saved} saved, {len(entries) - saved} failed',
+            'saved': saved,
+            'failed': len(entries) - saved,
+            'results': results
+        }
+        return Response(json.dumps(response), 200, mimetype='application/json')
 
 
 class GradebookResource(Resource):
@@ -353,36 +534,47 @@ class GradebookResource(Resource):
         
         term_id = request.args.get('term_id')
         
-        # Get assignments for this class
-        if term_id:
-            assignments = AssignmentModel.find_by_class_and_term(class_id, term_id)
-        else:
-            assignments = AssignmentModel.find_by_class(class_id)
+        # Published assignments with their assessment types (one query)
+        assignment_rows = AssignmentModel.find_published_with_types(class_id, term_id)
+        assignments = [assignment for assignment, _ in assignment_rows]
         
-        # Only show published assignments
-        assignments = [a for a in assignments if a.status == 'published']
-        
-        # Get students enrolled in this class
+        # Students enrolled in this class (one query)
         from models.student_class import StudentClassModel
-        enrollments = StudentClassModel.find_by_class_id(class_id)
-        student_ids = [e.student_id for e in enrollments]
+        students = StudentClassModel.find_students_by_class_id(class_id)
+        
+        # All scores for these assignments (one query), pivoted in memory
+        grades_by_cell = {}
+        for grade in StudentAssignmentModel.find_by_assignments([a._id for a in assignments]):
+            grades_by_cell[(str(grade.student_id), str(grade.assignment_id))] = grade
+        
+        # Cached year averages (0-20 scale) for the whole roster (one query)
+        from models.term import TermModel
+        year_id = None
+        if assignments:
+            first_term = TermModel.find_by_id(assignments[0].term_id)
+            if first_term:
+                year_id = first_term.year_id
         
-        students = [StudentModel.find_by_id(sid) for sid in student_ids]
-        students = [s for s in students if s]  # Remove None values
+        year_averages = {}
+        if year_id and class_obj.subject_id:
+            cached_grades = StudentYearGradeModel.find_by_students_subject_year(
+                [s._id for s in students], class_obj.subject_id, year_id
+            )
+            for cached_grade in cached_grades:
+                year_averages[str(cached_grade.student_id)] = float(cached_grade.calculated_average) if cached_grade.calculated_average else None
         
         # Build gradebook grid
         gradebook = []
         for student in students:
+            student_key = str(student._id)
             student_row = {
-                'student_id': str(student._id),
+                'student_id': student_key,
                 'student_name': f"{student.given_name} {student.surname}",
                 'grades': []
             }
             
             for assignment in assignments:
-                grade = StudentAssignmentModel.find_by_student_and_assignment(
-                    student._id, assignment._id
-                )
+                grade = grades_by_cell.get((student_key, str(assignment._id)))
                 
                 if grade:
                     grade_data = {
@@ -401,34 +593,12 @@ class GradebookResource(Resource):
                 
                 student_row['grades'].append(grade_data)
             
-            # Get cached year average if available (0-20 scale)
-            from models.term import TermModel
-            year_id = None
-            if assignments and len(assignments) > 0:
-                first_term = TermModel.find_by_id(assignments[0].term_id)
-                if first_term:
-                    year_id = first_term.year_id
-            
-            class_obj = ClassModel.find_by_id(class_id)
-            if class_obj and year_id:
-                cached_grade = StudentYearGradeModel.find_by_student_subject_year(
-                    student._id, class_obj.subject_id, year_id
-                )
-                if cached_grade:
-                    student_row['year_average'] = float(cached_grade.calculated_average) if cached_grade.calculated_average else None
-                else:
-                    student_row['year_average'] = None
-            else:
-                student_row['year_average'] = None
-            
+            student_row['year_average'] = year_averages.get(student_key)
             gradebook.append(student_row)
         
         # Build assignment headers
         assignment_headers = []
-        for assignment in assignments:
-            # Get assessment type to check if scored
-            assessment_type = AssessmentTypeModel.find_by_id(assignment.assessment_type_id)
-            
+        for assignment, assessment_type in assignment_rows:
             assignment_headers.append({
                 '_id': str(assignment._id),
                 'title': assignment.title,
@@ -447,3 +617,36 @@ class GradebookResource(Resource):
             'assignment_count': len(assignments)
         }, 200
 
+
+class YearGradeRebuildResource(Resource):
+    """
+    Year Grade Rebuild Resource - Explicit full rebuild of cached year grades
+    """
+
+    @require_any_role(['admin'])
+    def post(self):
+        """
+        POST /grade/year/rebuild - Rebuild cached year grades from scratch
+        Body (all optional): {"student_id": "uuid", "subject_id": "uuid", "year_id": "uuid"}
+        """
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            rebuilt = StudentYearGradeModel.rebuild(
+                student_id=data.get('student_id'),
+                subject_id=data.get('subject_id'),
+                year_id=data.get('year_id')
+            )
+            response = {
+                'success': True,
+                'message': f'Rebuilt {rebuilt} cached year grades',
+                'rebuilt': rebuilt
+            }
+            return Response(json.dumps(response), 200, mimetype='application/json')
+        
+        except Exception as e:
+            response = {
+                'success': False,
+                'message': f'Error rebuilding year grades: {str(e)}'
+            }
+            return Response(json.dumps(response), 500, mimetype='application/json')
@@ -2,6 +2,7 @@ from flask_restful import Resource
 from flask import Response, request
 from models.staff_salary import StaffSalaryModel
 from models.staff import StaffModel
+from utils.pagination import paginate, parse_bool_arg, parse_uuid_arg, PaginationError
 from utils.auth_middleware import require_role, require_any_role
 import json
 from datetime import datetime
@@ -18,7 +19,7 @@ class StaffSalaryResource(Resource):
         """
         GET /staff_salary - Get all salary records (with filters)
         GET /staff_salary/<salary_id> - Get specific salary record
-        Query params: staff_id, month, year, paid (true/false), role
+        Query params: staff_id, month, year, paid (true/false), role, limit, cursor
         """
         if salary_id:
             salary = StaffSalaryModel.find_by_id(salary_id)
@@ -26,41 +27,37 @@ class StaffSalaryResource(Resource):
                 return {'message': 'Salary record not found'}, 404
             return {'salary': salary.json_with_staff()}, 200
 
-        # Get all salary records with optional filters
-        staff_id = request.args.get('staff_id')
+        # Get salary records with optional filters
         month = request.args.get('month', type=int)
         year = request.args.get('year', type=int)
-        paid = request.args.get('paid')  # Can be 'true' or 'false'
+        try:
+            staff_id = parse_uuid_arg('staff_id')
+        except PaginationError as e:
+            return {'message': str(e)}, 400
 
         if staff_id and month and year:
             salary = StaffSalaryModel.find_by_staff_and_month(staff_id, month, year)
             if salary:
                 return {'salary': salary.json_with_staff()}, 200
             return {'salary': None}, 200
-        elif staff_id and paid:
-            # Apply paid filter when both staff_id and paid are present
-            is_paid = paid.lower() == 'true'
-            records = [r for r in StaffSalaryModel.find_by_staff_id(staff_id) if r.paid == is_paid]
-            enhanced_records = [r.json_with_staff() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        elif staff_id:
-            records = StaffSalaryModel.find_by_staff_id(staff_id)
-            enhanced_records = [r.json_with_staff() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        elif month and year:
-            records = StaffSalaryModel.find_by_month_year(month, year)
-            enhanced_records = [r.json_with_staff() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        elif paid:
-            is_paid = paid.lower() == 'true'
-            records = StaffSalaryModel.find_unpaid() if not is_paid else StaffSalaryModel.find_all()
-            records = [r for r in records if r.paid == is_paid]
-            enhanced_records = [r.json_with_staff() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        else:
-            records = StaffSalaryModel.find_all()
-            enhanced_records = [r.json_with_staff() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
+
+        query = StaffSalaryModel.filter_query(
+            staff_id=staff_id, month=month, year=year, paid=parse_bool_arg('paid')
+        )
+        try:
+            page = paginate(
+                query,
+                [StaffSalaryModel.year, StaffSalaryModel.month, StaffSalaryModel._id],
+                descending=True
+            )
+        except PaginationError as e:
+            return {'message': str(e)}, 400
+        enhanced_records = [r.json_with_staff() for r in page.items]
+        return {
+            'salary_records': enhanced_records,
+            'count': len(enhanced_records),
+            'pagination': page.meta()
+        }, 200
 
     @require_any_role(['admin', 'financial'])
     def post(self):
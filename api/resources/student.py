@@ -4,6 +4,7 @@ from models.student import StudentModel
 from db import db
 import json
 from utils.auth_middleware import require_role, require_any_role
+from utils.pagination import paginate, parse_bool_arg, PaginationError
 import os
 import logging
 import uuid
@@ -219,22 +220,23 @@ class StudentResource(Resource):
             }
             return Response(json.dumps(response), 200)
         else:
-            # Get all students or search by name
-            given_name = request.args.get('given_name')
-            middle_name = request.args.get('middle_name')
-            surname = request.args.get('surname')
-            
-            if given_name or middle_name or surname:
-                # Search by full name
-                students = StudentModel.find_by_full_name(given_name, middle_name, surname)
-            else:
-                # Get all students
-                students = StudentModel.find_all()
+            # Get students (optionally searched by name), one page at a time
+            query = StudentModel.filter_query(
+                given_name=request.args.get('given_name'),
+                middle_name=request.args.get('middle_name'),
+                surname=request.args.get('surname'),
+                is_active=parse_bool_arg('is_active')
+            )
+            try:
+                page = paginate(query, [StudentModel.surname, StudentModel.given_name, StudentModel._id])
+            except PaginationError as e:
+                return Response(json.dumps({'success': False, 'message': str(e)}), 400)
             
-            students_list = [student.json_with_year_levels() for student in students]
+            students_list = [student.json_with_year_levels() for student in page.items]
             response = {
                 'success': True,
-                'message': students_list
+                'message': students_list,
+                'pagination': page.meta()
             }
             return Response(json.dumps(response), 200)
 
@@ -31,6 +31,9 @@ class StudentClassResource(Resource):
         if not ClassModel.find_by_id(class_id):
             return {'message': 'Student Class not found'}, 400
 
+        if StudentClassModel.find_by_student_and_class(student_id, class_id):
+            return {'message': 'Student is already enrolled in this class'}, 409
+
         new_student_class = StudentClassModel(student_id, class_id, score)
         new_student_class.save_to_db()
 
@@ -3,6 +3,7 @@ from flask import Response, request, g
 from models.student_mensality import StudentMensalityModel
 from models.student import StudentModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import paginate, parse_bool_arg, parse_uuid_arg, PaginationError
 import json
 from datetime import datetime, date
 from decimal import Decimal
@@ -18,7 +19,7 @@ class StudentMensalityResource(Resource):
         """
         GET /mensality - Get all mensality records (with filters)
         GET /mensality/<mensality_id> - Get specific mensality record
-        Query params: student_id, month, year, paid (true/false)
+        Query params: student_id, month, year, paid (true/false), limit, cursor
         """
         if mensality_id:
             mensality = StudentMensalityModel.find_by_id(mensality_id)
@@ -26,53 +27,38 @@ class StudentMensalityResource(Resource):
                 return {'message': 'Mensality record not found'}, 404
             return {'mensality': mensality.json_with_student()}, 200
 
-        # Get all mensality records with optional filters
-        student_id_str = request.args.get('student_id')
+        # Get mensality records with optional filters
         month = request.args.get('month', type=int)
         year = request.args.get('year', type=int)
-        paid = request.args.get('paid')  # Can be 'true' or 'false'
+        try:
+            student_id = parse_uuid_arg('student_id')
+        except PaginationError as e:
+            return {'message': str(e)}, 400
 
-        # Build query incrementally based on provided filters
-        # Start with base query
-        query = StudentMensalityModel.query
-        
-        # Apply filters
-        if student_id_str:
-            # Convert string to UUID for database query (frontend sends string)
-            try:
-                from uuid import UUID
-                student_id_uuid = UUID(student_id_str)
-                query = query.filter_by(student_id=student_id_uuid)
-            except (ValueError, TypeError):
-                return {'message': 'Invalid student_id format'}, 400
-        if month is not None:
-            query = query.filter_by(month=month)
-        if year is not None:
-            query = query.filter_by(year=year)
-        if paid is not None:
-            # Convert string 'true'/'false' to boolean
-            is_paid = paid.lower() == 'true'
-            query = query.filter_by(paid=is_paid)
-        
-        # Execute query and order results
-        records = query.order_by(StudentMensalityModel.year.desc(), StudentMensalityModel.month.desc()).all()
-        
-        # Debug logging (can be removed later)
-        from flask import current_app
-        # Log the actual SQL query being executed
-        current_app.logger.debug(f"Mensality query - month={month}, year={year}, paid={paid}, student_id={student_id_str}, found {len(records)} records")
-        # Note: Cannot use literal_binds=True with UUID types, so we skip SQL compilation
-        current_app.logger.debug(f"Table name: {StudentMensalityModel.__tablename__}")
+        query = StudentMensalityModel.filter_query(
+            student_id=student_id, month=month, year=year, paid=parse_bool_arg('paid')
+        )
         
         # Special case: if student_id, month, and year are all provided, return single record format
-        if student_id_str and month is not None and year is not None:
-            if records:
-                return {'mensality': records[0].json_with_student()}, 200
-            return {'mensality': None}, 200
+        if student_id and month is not None and year is not None:
+            record = query.first()
+            return {'mensality': record.json_with_student() if record else None}, 200
         
-        # Otherwise return list format
-        enhanced_records = [r.json_with_student() for r in records]
-        return {'mensality_records': enhanced_records, 'count': len(enhanced_records)}, 200
+        # Otherwise return one page in list format, newest month first
+        try:
+            page = paginate(
+                query,
+                [StudentMensalityModel.year, StudentMensalityModel.month, StudentMensalityModel._id],
+                descending=True
+            )
+        except PaginationError as e:
+            return {'message': str(e)}, 400
+        enhanced_records = [r.json_with_student() for r in page.items]
+        return {
+            'mensality_records': enhanced_records,
+            'count': len(enhanced_records),
+            'pagination': page.meta()
+        }, 200
 
     @require_any_role(['admin', 'financial'])
     def post(self):
@@ -5,15 +5,16 @@ from models.class_model import ClassModel
 from models.student_class import StudentClassModel
 from models.assignment import AssignmentModel
 from models.student_assignment import StudentAssignmentModel
-from models.attendance import AttendanceModel
+from models.assignment_score_distribution import AssignmentScoreDistributionModel
+from models.attendance_rollup import AttendanceRollupModel
 from models.assessment_type import AssessmentTypeModel
 from models.subject import SubjectModel
 from models.term import TermModel
 from models.school_year import SchoolYearModel
 from models.term_grade import TermGradeModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import parse_uuid_arg, PaginationError
 import json
-from collections import defaultdict
 from decimal import Decimal
 
 
@@ -28,7 +29,7 @@ class StudentOverviewResource(Resource):
         GET /student/overview?year_id=&term_id=&subject_id=&class_name=
         Returns:
         - Student's own metrics (homework completion, attendance, test average, term grade)
-        - Class test scores (for distribution visualization)
+        - Class test scores (for distribution visualization), from precomputed per-assignment snapshots
         - Student's position in class distribution
         """
         try:
@@ -57,48 +58,25 @@ class StudentOverviewResource(Resource):
                 return {'message': 'Invalid access. Student role required or student_id parameter needed for admin/secretary.'}, 403
             
             # Get filters
-            year_id = request.args.get('year_id')
-            term_id = request.args.get('term_id')
-            subject_id = request.args.get('subject_id')
+            try:
+                year_id = parse_uuid_arg('year_id')
+                term_id = parse_uuid_arg('term_id')
+                subject_id = parse_uuid_arg('subject_id')
+            except PaginationError as e:
+                return {'message': str(e)}, 400
             class_name = request.args.get('class_name')
             
-            # Get student's classes
-            student_enrollments = StudentClassModel.find_by_student_id(student_id)
-            
-            if not student_enrollments:
-                return {
-                    'success': True,
-                    'student_metrics': {
-                        'homework_completion_ratio': 0,
-                        'attendance_ratio': 0,
-                        'test_average': 0,
-                        'term_grade_average': None
-                    },
-                    'class_test_scores': [],
-                    'student_test_scores': [],
-                    'student_position': None
-                }, 200
-            
-            # Filter classes based on filters
-            filtered_classes = []
-            for enrollment in student_enrollments:
-                class_obj = ClassModel.find_by_id(enrollment.class_id)
-                if not class_obj:
-                    continue
-                
-                # Apply filters
-                if year_id:
-                    term = TermModel.find_by_id(class_obj.term_id)
-                    if not term or str(term.year_id) != str(year_id):
-                        continue
-                if term_id and str(class_obj.term_id) != str(term_id):
-                    continue
-                if subject_id and str(class_obj.subject_id) != str(subject_id):
-                    continue
-                if class_name and class_obj.class_name != class_name:
-                    continue
-                
-                filtered_classes.append(class_obj)
+            # Student's classes, filtered in SQL
+            class_query = ClassModel.filter_query(
+                term_id=term_id, subject_id=subject_id, class_name=class_name
+            ).join(
+                StudentClassModel, StudentClassModel.class_id == ClassModel._id
+            ).filter(StudentClassModel.student_id == student._id)
+            if year_id:
+                class_query = class_query.join(TermModel, TermModel._id == ClassModel.term_id).filter(
+                    TermModel.year_id == year_id
+                )
+            filtered_classes = class_query.all()
             
             if not filtered_classes:
                 return {
@@ -113,121 +91,86 @@ class StudentOverviewResource(Resource):
                     'student_test_scores': [],
                     'student_position': None
                 }, 200
+            class_ids = [c._id for c in filtered_classes]
             
             # Get homework and test assessment types
-            homework_type = AssessmentTypeModel.query.filter_by(type_name='Homework').first()
-            test_type = AssessmentTypeModel.query.filter_by(type_name='Test').first()
+            homework_type = AssessmentTypeModel.find_by_name('Homework')
+            test_type = AssessmentTypeModel.find_by_name('Test')
             
             homework_type_id = homework_type._id if homework_type else None
             test_type_id = test_type._id if test_type else None
             
-            # Calculate student's own metrics
-            homework_assignments_seen = set()
-            test_assignments_seen = set()
-            attendance_records_seen = set()
+            # The classes' homework and tests, and the student's own grades for them (two queries)
+            assignments = AssignmentModel.query.filter(
+                AssignmentModel.class_id.in_(class_ids),
+                AssignmentModel.assessment_type_id.in_([t for t in (homework_type_id, test_type_id) if t])
+            ).all()
+            own_grades = {
+                sa.assignment_id: sa for sa in StudentAssignmentModel.query.filter(
+                    StudentAssignmentModel.student_id == student._id,
+                    StudentAssignmentModel.assignment_id.in_([a._id for a in assignments])
+                ).all()
+            } if assignments else {}
             
+            # Calculate student's own metrics
             total_homework = 0
             completed_homework = 0
             total_tests = 0
             test_scores_sum = Decimal('0.00')
             test_scores_count = 0
             student_test_scores = []  # Individual test scores for this student
-            
-            # Attendance tracking
-            subject_attendance = defaultdict(lambda: {'present': 0, 'total': 0})
-            
-            # Process each class
-            for class_obj in filtered_classes:
-                # Get assignments for this class
-                assignments = AssignmentModel.find_by_class(class_obj._id)
+            own_test_percentages = {}  # assignment_id -> this student's percentage
+            test_assignment_ids = []
+            
+            for assignment in assignments:
+                sa = own_grades.get(assignment._id)
+                # Homework assignments
+                if homework_type_id and assignment.assessment_type_id == homework_type_id:
+                    total_homework += 1
+                    if sa and sa.status == 'graded':
+                        completed_homework += 1
                 
-                for assignment in assignments:
-                    # Homework assignments
-                    if homework_type_id and str(assignment.assessment_type_id) == str(homework_type_id):
-                        assignment_key = (str(assignment._id), str(class_obj.subject_id), str(class_obj.term_id))
-                        if assignment_key not in homework_assignments_seen:
-                            homework_assignments_seen.add(assignment_key)
-                            total_homework += 1
-                            
-                            # Check if student completed it
-                            sa = StudentAssignmentModel.find_by_student_and_assignment(student_id, assignment._id)
-                            if sa and sa.status == 'graded':
-                                completed_homework += 1
-                    
-                    # Test assignments
-                    if test_type_id and str(assignment.assessment_type_id) == str(test_type_id):
-                        assignment_key = (str(assignment._id), str(class_obj.subject_id), str(class_obj.term_id))
-                        if assignment_key not in test_assignments_seen:
-                            test_assignments_seen.add(assignment_key)
-                            total_tests += 1
-                            
-                            # Get student's test score
-                            sa = StudentAssignmentModel.find_by_student_and_assignment(student_id, assignment._id)
-                            if sa and sa.score is not None and sa.status == 'graded':
-                                percentage = float((Decimal(str(sa.score)) / Decimal(str(assignment.max_score))) * 100)
-                                test_scores_sum += Decimal(str(percentage))
-                                test_scores_count += 1
-                                student_test_scores.append(percentage)
-                
-                # Get attendance for this class/subject
-                all_attendance = AttendanceModel.find_by_student_id(student_id)
-                for record in all_attendance:
-                    # Filter by subject and check if it's for this class/term
-                    if record.subject_id and str(record.subject_id) == str(class_obj.subject_id):
-                        record_key = (str(record._id), str(class_obj.subject_id), str(class_obj.term_id))
-                        if record_key not in attendance_records_seen:
-                            attendance_records_seen.add(record_key)
-                            subject_attendance[class_obj.subject_id]['total'] += 1
-                            if record.status == 'present':
-                                subject_attendance[class_obj.subject_id]['present'] += 1
+                # Test assignments
+                if test_type_id and assignment.assessment_type_id == test_type_id:
+                    total_tests += 1
+                    test_assignment_ids.append(assignment._id)
+                    if sa and sa.score is not None and sa.status == 'graded':
+                        percentage = float((Decimal(str(sa.score)) / Decimal(str(assignment.max_score))) * 100)
+                        test_scores_sum += Decimal(str(percentage))
+                        test_scores_count += 1
+                        student_test_scores.append(percentage)
+                        own_test_percentages[assignment._id] = percentage
+            
+            # Attendance tracking, from the rollup (one query for all classes, once per subject/term)
+            attendance_counts = AttendanceRollupModel.find_counts(
+                [student_id],
+                {(c.subject_id, c.term_id) for c in filtered_classes if c.subject_id and c.term_id}
+            )
+            total_present = 0
+            total_attendance = 0
+            for pair_key in {(str(c.subject_id), str(c.term_id)) for c in filtered_classes}:
+                present, total = attendance_counts.get((str(student_id),) + pair_key, (0, 0))
+                total_present += present
+                total_attendance += total
             
             # Calculate student metrics
             homework_completion_ratio = (completed_homework / total_homework * 100) if total_homework > 0 else 0
             test_average = float(test_scores_sum / Decimal(str(test_scores_count))) if test_scores_count > 0 else 0
-            
-            # Calculate attendance ratio (average across all subjects)
-            total_present = sum(att['present'] for att in subject_attendance.values())
-            total_attendance = sum(att['total'] for att in subject_attendance.values())
             attendance_ratio = (total_present / total_attendance * 100) if total_attendance > 0 else 0
             
-            # Get term grade average (if term_id is provided)
-            term_grade_average = None
-            if term_id:
-                term_grades = []
-                for class_obj in filtered_classes:
-                    term_grade = TermGradeModel.find_by_student_subject_term(
-                        student_id, str(class_obj.subject_id), term_id
-                    )
-                    if term_grade and term_grade.final_grade is not None:
-                        term_grades.append(float(term_grade.final_grade))
-                
-                if term_grades:
-                    term_grade_average = sum(term_grades) / len(term_grades)
-            
-            # Get class test scores (all students in the same classes)
+            # Class test scores from the precomputed per-assignment snapshots,
+            # without this student's own score
             class_test_scores = []
-            all_student_ids = set()
-            
-            for class_obj in filtered_classes:
-                enrollments = StudentClassModel.find_by_class_id(class_obj._id)
-                for enrollment in enrollments:
-                    all_student_ids.add(enrollment.student_id)
-            
-            # Get test scores for all students in these classes
-            for other_student_id in all_student_ids:
-                if str(other_student_id) == student_id:
-                    continue  # Skip the current student
-                
-                for class_obj in filtered_classes:
-                    assignments = AssignmentModel.find_by_class(class_obj._id)
-                    for assignment in assignments:
-                        if test_type_id and str(assignment.assessment_type_id) == str(test_type_id):
-                            sa = StudentAssignmentModel.find_by_student_and_assignment(
-                                str(other_student_id), assignment._id
-                            )
-                            if sa and sa.score is not None and sa.status == 'graded':
-                                percentage = float((Decimal(str(sa.score)) / Decimal(str(assignment.max_score))) * 100)
-                                class_test_scores.append(percentage)
+            test_distributions = []
+            for distribution in AssignmentScoreDistributionModel.find_by_assignments(test_assignment_ids):
+                scores = list(distribution.scores or [])
+                own = own_test_percentages.get(distribution.assignment_id)
+                if own is not None and scores:
+                    closest = min(range(len(scores)), key=lambda i: abs(scores[i] - own))
+                    if abs(scores[closest] - own) < 1e-6:
+                        scores.pop(closest)
+                class_test_scores.extend(scores)
+                test_distributions.append(distribution.json())
             
             # Calculate student's position in class test score distribution
             student_position = None
@@ -244,27 +187,20 @@ class StudentOverviewResource(Resource):
                     'student_average': student_avg
                 }
             
-            # Get class term grades (all students in the same classes)
+            # Term grades of everyone in these classes (if term_id is provided), in one query
+            term_grade_average = None
             class_term_grades = []
             student_term_grades_list = []
-            
-            # Get term grades for all students in these classes (if term_id is provided)
             if term_id:
-                for class_obj in filtered_classes:
-                    # Get all students in this class
-                    enrollments = StudentClassModel.find_by_class_id(class_obj._id)
-                    for enrollment in enrollments:
-                        other_student_id = enrollment.student_id
-                        # Get term grade for this student/subject/term
-                        term_grade = TermGradeModel.find_by_student_subject_term(
-                            str(other_student_id), str(class_obj.subject_id), term_id
-                        )
-                        if term_grade and term_grade.final_grade is not None:
-                            grade_value = float(term_grade.final_grade)
-                            if str(other_student_id) == student_id:
-                                student_term_grades_list.append(grade_value)
-                            else:
-                                class_term_grades.append(grade_value)
+                for other_student_id, grade in TermGradeModel.final_grades_for_classes(class_ids, term_id):
+                    if grade is None:
+                        continue
+                    if other_student_id == student._id:
+                        student_term_grades_list.append(float(grade))
+                    else:
+                        class_term_grades.append(float(grade))
+                if student_term_grades_list:
+                    term_grade_average = sum(student_term_grades_list) / len(student_term_grades_list)
             
             # Calculate student's position in class term grade distribution (0-20 scale)
             term_grade_position = None
@@ -294,7 +230,8 @@ class StudentOverviewResource(Resource):
                 'student_position': student_position,
                 'class_term_grades': class_term_grades,
                 'student_term_grades': student_term_grades_list,
-                'term_grade_position': term_grade_position
+                'term_grade_position': term_grade_position,
+                'test_distributions': test_distributions
             }
             
             return response, 200
@@ -1,4 +1,4 @@
-from flask import request, Response
+from flask import Response
 from flask_restful import Resource
 from models.student_class import StudentClassModel
 from models.student import StudentModel
@@ -6,13 +6,11 @@ from models.class_model import ClassModel
 from models.term import TermModel
 from models.school_year import SchoolYearModel
 from models.period import PeriodModel
-from models.teacher import TeacherModel
-from models.subject import SubjectModel
-from models.classroom import ClassroomModel
-from models.year_level import YearLevelModel
 import json
 import logging
 from utils.auth_middleware import require_role, require_any_role
+from utils.pagination import parse_uuid_arg, PaginationError
+from db import db
 
 
 class StudentScheduleResource(Resource):
@@ -21,8 +19,15 @@ class StudentScheduleResource(Resource):
     @require_any_role(['admin', 'student', 'secretary'])
     def get(self, student_id=None):
         # Get query parameters for filtering
-        term_id = request.args.get('term_id')
-        year_id = request.args.get('year_id')
+        try:
+            term_id = parse_uuid_arg('term_id')
+            year_id = parse_uuid_arg('year_id')
+        except PaginationError as e:
+            response = {
+                'success': False,
+                'message': str(e)
+            }
+            return Response(json.dumps(response), 400)
         
         # If no student_id provided, try to get from authenticated user
         if not student_id:
@@ -46,13 +51,6 @@ class StudentScheduleResource(Resource):
             if student:
                 student_id = str(student._id)
             else:
-                # Check if any students exist in the database
-                all_students = StudentModel.find_all()
-                logging.info(f"Total students in DB: {len(all_students)}")
-                if all_students:
-                    for s in all_students[:5]:  # Log first 5 students
-                        logging.info(f"Student in DB: email={s.email}, username={s.username}, name={s.given_name} {s.surname}")
-                
                 search_terms = []
                 if email:
                     search_terms.append(f"email: {email}")
@@ -75,125 +73,58 @@ class StudentScheduleResource(Resource):
             }
             return Response(json.dumps(response), 404)
 
-        # Get all student class enrollments to find which class names the student is enrolled in
-        student_classes = StudentClassModel.find_by_student_id(student_id)
+        # Every class sharing a name with one the student is enrolled in (the
+        # class group across terms), joined to its term, year and details
+        enrolled_class_names = db.session.query(ClassModel.class_name).join(
+            StudentClassModel, StudentClassModel.class_id == ClassModel._id
+        ).filter(StudentClassModel.student_id == student._id)
+        criteria = [ClassModel.class_name.in_(enrolled_class_names.scalar_subquery())]
+        if term_id:
+            criteria.append(TermModel._id == term_id)
+        if year_id:
+            criteria.append(SchoolYearModel._id == year_id)
         
-        if not student_classes:
-            response = {
-                'success': True,
-                'message': {
-                    'student_id': student_id,
-                    'student_name': f"{student.given_name} {student.surname}",
-                    'timetable': [],
-                    'available_terms': [],
-                    'available_years': []
-                }
-            }
-            return Response(json.dumps(response), 200)
-
-        # Get unique class names the student is enrolled in
-        enrolled_class_names = set()
-        for sc in student_classes:
-            class_obj = ClassModel.find_by_id(sc.class_id)
-            if class_obj:
-                enrolled_class_names.add(class_obj.class_name)
-        
-        if not enrolled_class_names:
-            response = {
-                'success': True,
-                'message': {
-                    'student_id': student_id,
-                    'student_name': f"{student.given_name} {student.surname}",
-                    'timetable': [],
-                    'available_terms': [],
-                    'available_years': []
-                }
-            }
-            return Response(json.dumps(response), 200)
-        
-        # For each enrolled class name, get ALL classes with that name across all terms
+        # Build class data and the available terms and years in one pass
         all_classes = []
         available_terms_map = {}
         available_years_map = {}
         
-        for class_name in enrolled_class_names:
-            # Get all classes with this name
-            classes_with_name = ClassModel.list_by_class_name(class_name)
+        for (class_obj, term, year, subject_name, teacher_given_name, teacher_surname,
+             period_name, period_start, period_end, room_name, level_name, level_order) in ClassModel.schedule_query(*criteria):
+            # Store available terms and years for filter dropdowns
+            available_terms_map[str(term._id)] = {
+                '_id': str(term._id),
+                'term_number': term.term_number,
+                'year_id': str(term.year_id),
+                'year_name': year.year_name,
+                'start_date': term.start_date.isoformat() if term.start_date else None,
+                'end_date': term.end_date.isoformat() if term.end_date else None
+            }
+            available_years_map[str(year._id)] = {
+                '_id': str(year._id),
+                'year_name': year.year_name,
+                'start_date': year.start_date.isoformat() if year.start_date else None,
+                'end_date': year.end_date.isoformat() if year.end_date else None
+            }
             
-            for class_obj in classes_with_name:
-                if not class_obj:
-                    continue
-                
-                # Get term info
-                term = TermModel.find_by_id(class_obj.term_id)
-                if not term:
-                    continue
-                
-                # If filtering by term, skip if doesn't match
-                if term_id and str(term._id) != term_id:
-                    continue
-                
-                # Get year info
-                year = SchoolYearModel.find_by_id(term.year_id)
-                if not year:
-                    continue
-                
-                # If filtering by year, skip if doesn't match
-                if year_id and str(year._id) != year_id:
-                    continue
-                
-                # Store available terms and years for filter dropdowns
-                available_terms_map[str(term._id)] = {
-                    '_id': str(term._id),
-                    'term_number': term.term_number,
-                    'year_id': str(term.year_id),
-                    'year_name': year.year_name if year else None,
-                    'start_date': term.start_date.isoformat() if term.start_date else None,
-                    'end_date': term.end_date.isoformat() if term.end_date else None
-                }
-                available_years_map[str(year._id)] = {
-                    '_id': str(year._id),
-                    'year_name': year.year_name,
-                    'start_date': year.start_date.isoformat() if year.start_date else None,
-                    'end_date': year.end_date.isoformat() if year.end_date else None
-                }
-                
-                # Enhance class data
-                class_data = class_obj.json()
-                class_data['subject_name'] = None
-                class_data['teacher_name'] = None
-                class_data['period_name'] = None
-                class_data['day_of_week'] = class_obj.day_of_week
-                class_data['period_start'] = None
-                class_data['period_end'] = None
-                class_data['classroom_name'] = None
-                class_data['term_number'] = term.term_number
-                class_data['year_name'] = year.year_name if year else None
-                
-                # Get related entities
-                subject = SubjectModel.find_by_id(class_obj.subject_id) if class_obj.subject_id else None
-                teacher = TeacherModel.find_by_id(class_obj.teacher_id) if class_obj.teacher_id else None
-                period = PeriodModel.find_by_id(class_obj.period_id) if class_obj.period_id else None
-                classroom = ClassroomModel.find_by_id(class_obj.classroom_id) if class_obj.classroom_id else None
-                
-                if subject:
-                    class_data['subject_name'] = subject.subject_name
-                if teacher:
-                    class_data['teacher_name'] = f"{teacher.given_name} {teacher.surname}"
-                if period:
-                    class_data['period_name'] = period.name
-                    class_data['period_start'] = period.start_time.isoformat() if period.start_time else None
-                    class_data['period_end'] = period.end_time.isoformat() if period.end_time else None
-                if classroom:
-                    class_data['classroom_name'] = classroom.room_name
-                
-                # Get year level info
-                year_level = YearLevelModel.find_by_id(class_obj.year_level_id)
-                if year_level:
-                    class_data['year_level_name'] = year_level.level_name
-                    class_data['year_level_order'] = year_level.level_order
-                
-                all_classes.append(class_data)
+            # Enhance class data
+            class_data = class_obj.json()
+            class_data['subject_name'] = subject_name
+            class_data['teacher_name'] = f"{teacher_given_name} {teacher_surname}" if teacher_given_name is not None else None
+            class_data['period_name'] = period_name
+            class_data['day_of_week'] = class_obj.day_of_week
+            class_data['period_start'] = period_start.isoformat() if period_start else None
+            class_data['period_end'] = period_end.isoformat() if period_end else None
+            class_data['classroom_name'] = room_name
+            class_data['term_number'] = term.term_number
+            class_data['year_name'] = year.year_name
+            
+            # Add year level info
+            if level_name is not None:
+                class_data['year_level_name'] = level_name
+                class_data['year_level_order'] = level_order
+            
+            all_classes.append(class_data)
         
         # Sort by period start time if available
         all_classes.sort(key=lambda x: x.get('period_start', '') if x.get('period_start') else '')
@@ -3,6 +3,7 @@ from flask_restful import Resource
 from models.teacher import TeacherModel
 from models.department import DepartmentModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import paginate, parse_uuid_arg, PaginationError
 from db import db
 import json
 import os
@@ -213,16 +214,26 @@ class TeacherResource(Resource):
             }
             return Response(json.dumps(response), 200)
         else:
-            # Get all teachers with department information
-            professors = TeacherModel.find_all()
+            # Get teachers with department information, one page at a time
+            try:
+                query = TeacherModel.filter_query(
+                    given_name=request.args.get('given_name'),
+                    surname=request.args.get('surname'),
+                    department_id=parse_uuid_arg('department_id')
+                )
+                page = paginate(query, [TeacherModel.surname, TeacherModel.given_name, TeacherModel._id])
+            except PaginationError as e:
+                return {'message': str(e)}, 400
+            
             professors_list = []
-            for professor in professors:
+            for professor in page.items:
                 professor_data = professor.json_with_departments()
                 professors_list.append(professor_data)
             
             response = {
                 'success': True,
-                'message': professors_list
+                'message': professors_list,
+                'pagination': page.meta()
             }
             return Response(json.dumps(response), 200)
 
@@ -2,6 +2,7 @@ from flask_restful import Resource
 from flask import Response, request, g
 from models.teacher_salary import TeacherSalaryModel
 from models.teacher import TeacherModel
+from utils.pagination import paginate, parse_bool_arg, parse_uuid_arg, PaginationError
 from utils.auth_middleware import require_any_role
 import json
 from datetime import datetime, date
@@ -18,7 +19,7 @@ class TeacherSalaryResource(Resource):
         """
         GET /teacher_salary - Get all salary records (with filters)
         GET /teacher_salary/<salary_id> - Get specific salary record
-        Query params: teacher_id, month, year, paid (true/false)
+        Query params: teacher_id, month, year, paid (true/false), limit, cursor
         """
         if salary_id:
             salary = TeacherSalaryModel.find_by_id(salary_id)
@@ -26,38 +27,37 @@ class TeacherSalaryResource(Resource):
                 return {'message': 'Salary record not found'}, 404
             return {'salary': salary.json_with_teacher()}, 200
 
-        # Get all salary records with optional filters
-        teacher_id = request.args.get('teacher_id')
+        # Get salary records with optional filters
         month = request.args.get('month', type=int)
         year = request.args.get('year', type=int)
-        paid = request.args.get('paid')  # Can be 'true' or 'false'
+        try:
+            teacher_id = parse_uuid_arg('teacher_id')
+        except PaginationError as e:
+            return {'message': str(e)}, 400
 
         if teacher_id and month and year:
             salary = TeacherSalaryModel.find_by_teacher_and_month(teacher_id, month, year)
             if salary:
                 return {'salary': salary.json_with_teacher()}, 200
             return {'salary': None}, 200
-        elif teacher_id:
-            records = TeacherSalaryModel.find_by_teacher_id(teacher_id)
-            enhanced_records = [r.json_with_teacher() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        elif month and year:
-            records = TeacherSalaryModel.find_by_month_year(month, year)
-            enhanced_records = [r.json_with_teacher() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        elif paid:
-            is_paid = paid.lower() == 'true'
-            if teacher_id:
-                records = [r for r in TeacherSalaryModel.find_by_teacher_id(teacher_id) if r.paid == is_paid]
-            else:
-                records = TeacherSalaryModel.find_unpaid() if not is_paid else TeacherSalaryModel.find_all()
-                records = [r for r in records if r.paid == is_paid]
-            enhanced_records = [r.json_with_teacher() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
-        else:
-            records = TeacherSalaryModel.find_all()
-            enhanced_records = [r.json_with_teacher() for r in records]
-            return {'salary_records': enhanced_records, 'count': len(enhanced_records)}, 200
+
+        query = TeacherSalaryModel.filter_query(
+            teacher_id=teacher_id, month=month, year=year, paid=parse_bool_arg('paid')
+        )
+        try:
+            page = paginate(
+                query,
+                [TeacherSalaryModel.year, TeacherSalaryModel.month, TeacherSalaryModel._id],
+                descending=True
+            )
+        except PaginationError as e:
+            return {'message': str(e)}, 400
+        enhanced_records = [r.json_with_teacher() for r in page.items]
+        return {
+            'salary_records': enhanced_records,
+            'count': len(enhanced_records),
+            'pagination': page.meta()
+        }, 200
 
     @require_any_role(['admin', 'financial'])
     def post(self):
@@ -1,16 +1,23 @@
-from flask import request, Response, g
+from flask import Response, g
 from flask_restful import Resource
 from models.class_model import ClassModel
 from models.teacher import TeacherModel
 from models.term import TermModel
 from models.school_year import SchoolYearModel
 from models.period import PeriodModel
-from models.subject import SubjectModel
-from models.classroom import ClassroomModel
-from models.year_level import YearLevelModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import parse_uuid_arg, PaginationError
+from services.result_cache import named_cache
 import json
 import logging
+import uuid
+
+# Payloads keyed by (teacher_id, term_id, year_id), teacher_id None for the
+# admin view. Class writes only drop the entries of the teachers whose
+# classes changed (and the admin view); writes to the other tables drop all.
+teacher_schedule_cache = named_cache('teacher_schedule', (
+    'term', 'school_year', 'subject', 'professor', 'period', 'classroom', 'year_level'
+), default_ttl_seconds=60, scoped_by=('class', 'teacher_id'))
 
 
 class TeacherScheduleResource(Resource):
@@ -19,9 +26,16 @@ class TeacherScheduleResource(Resource):
     @require_any_role(['admin', 'teacher', 'student', 'secretary'])
     def get(self, teacher_id=None):
         # Get query parameters for filtering
-        term_id = request.args.get('term_id')
-        year_id = request.args.get('year_id')
-        teacher_id_param = request.args.get('teacher_id')  # Allow teacher_id as query parameter for admin
+        try:
+            term_id = parse_uuid_arg('term_id')
+            year_id = parse_uuid_arg('year_id')
+            teacher_id_param = parse_uuid_arg('teacher_id')  # Allow teacher_id as query parameter for admin
+        except PaginationError as e:
+            response = {
+                'success': False,
+                'message': str(e)
+            }
+            return Response(json.dumps(response), 400)
         user_role = getattr(g, 'role', None)
         
         # Use teacher_id from query parameter if provided (for admin filtering)
@@ -52,13 +66,6 @@ class TeacherScheduleResource(Resource):
                 # For admins/secretaries, return all classes (no teacher_id filter)
                 teacher_id = None
             else:
-                # Check if any teachers exist in the database
-                all_teachers = TeacherModel.find_all()
-                logging.info(f"Total teachers in DB: {len(all_teachers)}")
-                if all_teachers:
-                    for t in all_teachers[:5]:  # Log first 5 teachers
-                        logging.info(f"Teacher in DB: email={t.email_address}, username={t.username}, name={t.given_name} {t.surname}")
-                
                 search_terms = []
                 if email:
                     search_terms.append(f"email: {email}")
@@ -73,12 +80,17 @@ class TeacherScheduleResource(Resource):
                 return Response(json.dumps(response), 404)
         
         # If admin/secretary and no teacher_id, get all classes
+        criteria = []
         if user_role in ['admin', 'secretary'] and not teacher_id:
-            teacher_classes = ClassModel.query.all()
+            teacher_id = None
             teacher_name = "All Teachers (Admin View)"
         else:
             # Verify teacher exists
-            teacher = TeacherModel.find_by_id(teacher_id)
+            try:
+                teacher_id = uuid.UUID(str(teacher_id))
+            except ValueError:
+                teacher_id = None
+            teacher = TeacherModel.find_by_id(teacher_id) if teacher_id else None
             if not teacher:
                 response = {
                     'success': False,
@@ -87,52 +99,33 @@ class TeacherScheduleResource(Resource):
                 return Response(json.dumps(response), 404)
             
             teacher_name = f"{teacher.given_name} {teacher.surname}"
-            # Get all classes where this teacher is assigned
-            teacher_classes = ClassModel.list_by_teacher_id(teacher_id)
+            # Only the classes where this teacher is assigned
+            criteria.append(ClassModel.teacher_id == teacher_id)
         
-        if not teacher_classes:
-            response = {
-                'success': True,
-                'message': {
-                    'teacher_id': teacher_id if teacher_id else None,
-                    'teacher_name': teacher_name,
-                    'timetable': [],
-                    'available_terms': [],
-                    'available_years': []
-                }
-            }
-            return Response(json.dumps(response), 200)
-
-        # Build list of class data with enhanced information
+        cache_key = (teacher_id, term_id, year_id)
+        cached = teacher_schedule_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, 200)
+        generation = teacher_schedule_cache.generation()
+        
+        if term_id:
+            criteria.append(TermModel._id == term_id)
+        if year_id:
+            criteria.append(SchoolYearModel._id == year_id)
+        
+        # Build class data and the available terms and years in one pass
         all_classes = []
         available_terms_map = {}
         available_years_map = {}
         
-        for class_obj in teacher_classes:
-            # Get term info
-            term = TermModel.find_by_id(class_obj.term_id)
-            if not term:
-                continue
-            
-            # If filtering by term, skip if doesn't match
-            if term_id and str(term._id) != term_id:
-                continue
-            
-            # Get year info
-            year = SchoolYearModel.find_by_id(term.year_id)
-            if not year:
-                continue
-            
-            # If filtering by year, skip if doesn't match
-            if year_id and str(year._id) != year_id:
-                continue
-            
+        for (class_obj, term, year, subject_name, teacher_given_name, teacher_surname,
+             period_name, period_start, period_end, room_name, level_name, level_order) in ClassModel.schedule_query(*criteria):
             # Store available terms and years for filter dropdowns
             available_terms_map[str(term._id)] = {
                 '_id': str(term._id),
                 'term_number': term.term_number,
                 'year_id': str(term.year_id),
-                'year_name': year.year_name if year else None,
+                'year_name': year.year_name,
                 'start_date': term.start_date.isoformat() if term.start_date else None,
                 'end_date': term.end_date.isoformat() if term.end_date else None
             }
@@ -145,42 +138,23 @@ class TeacherScheduleResource(Resource):
             
             # Build class data with all related information
             class_data = class_obj.json()
-            
-            # Add subject info
-            if class_obj.subject_id:
-                subject = SubjectModel.find_by_id(class_obj.subject_id)
-                class_data['subject_name'] = subject.subject_name if subject else None
-            
-            # Add period info
-            if class_obj.period_id:
-                period = PeriodModel.find_by_id(class_obj.period_id)
-                class_data['period_name'] = period.name if period else None
-                class_data['period_start'] = period.start_time.isoformat() if period else None
-                class_data['period_end'] = period.end_time.isoformat() if period else None
-            else:
-                class_data['period_name'] = None
-                class_data['period_start'] = None
-                class_data['period_end'] = None
-            
-            # Add classroom info
-            if class_obj.classroom_id:
-                classroom = ClassroomModel.find_by_id(class_obj.classroom_id)
-                class_data['classroom_name'] = classroom.room_name if classroom else None
-            else:
-                class_data['classroom_name'] = None
+            class_data['subject_name'] = subject_name
+            class_data['period_name'] = period_name
+            class_data['period_start'] = period_start.isoformat() if period_start else None
+            class_data['period_end'] = period_end.isoformat() if period_end else None
+            class_data['classroom_name'] = room_name
             
             # Add year level info
-            year_level = YearLevelModel.find_by_id(class_obj.year_level_id)
-            if year_level:
-                class_data['year_level_id'] = str(year_level._id)
-                class_data['year_level_name'] = year_level.level_name
-                class_data['year_level_order'] = year_level.level_order
+            if level_name is not None:
+                class_data['year_level_id'] = str(class_obj.year_level_id)
+                class_data['year_level_name'] = level_name
+                class_data['year_level_order'] = level_order
             
             # Add term and year info
-            class_data['term_id'] = str(term._id) if term else None
-            class_data['term_number'] = term.term_number if term else None
-            class_data['year_id'] = str(year._id) if year else None
-            class_data['year_name'] = year.year_name if year else None
+            class_data['term_id'] = str(term._id)
+            class_data['term_number'] = term.term_number
+            class_data['year_id'] = str(year._id)
+            class_data['year_name'] = year.year_name
             
             all_classes.append(class_data)
         
@@ -194,7 +168,7 @@ class TeacherScheduleResource(Resource):
         response = {
             'success': True,
             'message': {
-                'teacher_id': teacher_id if teacher_id else None,
+                'teacher_id': str(teacher_id) if teacher_id else None,
                 'teacher_name': teacher_name,
                 'timetable': all_classes,
                 'all_periods': all_periods_data,
@@ -203,5 +177,6 @@ class TeacherScheduleResource(Resource):
             }
         }
         
-        return Response(json.dumps(response), 200)
-
+        body = json.dumps(response)
+        teacher_schedule_cache.set(cache_key, body, generation)
+        return Response(body, 200)
@@ -4,18 +4,24 @@ from models.teacher import TeacherModel
 from models.class_model import ClassModel
 from models.student_class import StudentClassModel
 from models.student import StudentModel
-from models.assignment import AssignmentModel
 from models.student_assignment import StudentAssignmentModel
-from models.attendance import AttendanceModel
+from models.attendance_rollup import AttendanceRollupModel
 from models.assessment_type import AssessmentTypeModel
 from models.subject import SubjectModel
 from models.term import TermModel
-from models.school_year import SchoolYearModel
 from models.term_grade import TermGradeModel
 from utils.auth_middleware import require_any_role
+from utils.pagination import parse_uuid_arg, PaginationError
+from services.identity_map import identity_map
+from services.result_cache import named_cache
 import json
 from collections import defaultdict
-from decimal import Decimal
+
+# Results keyed by (teacher, filters); dropped in every worker on writes to any source table
+teacher_students_cache = named_cache('teacher_students', (
+    'class', 'student_class', 'student', 'assignment', 'student_assignment', 'assessment_type',
+    'attendance', 'attendance_rollup', 'term_grade', 'subject', 'term'
+))
 
 
 class TeacherStudentsResource(Resource):
@@ -31,6 +37,7 @@ class TeacherStudentsResource(Resource):
         - Homework completion ratio
         - Attendance ratio
         - Test average
+        Metrics come from a fixed number of grouped queries, whatever the number of students
         """
         try:
             username = g.username if hasattr(g, 'username') else None
@@ -40,200 +47,122 @@ class TeacherStudentsResource(Resource):
                 return {'message': 'Authentication required'}, 401
             
             # Get filters
-            year_id = request.args.get('year_id')
-            term_id = request.args.get('term_id')
-            subject_id = request.args.get('subject_id')
-            class_id = request.args.get('class_id')
+            try:
+                year_id = parse_uuid_arg('year_id')
+                term_id = parse_uuid_arg('term_id')
+                subject_id = parse_uuid_arg('subject_id')
+                class_id = parse_uuid_arg('class_id')
+                teacher_id = parse_uuid_arg('teacher_id')  # Allow teacher_id as query parameter for admin
+            except PaginationError as e:
+                return {'message': str(e)}, 400
             class_name = request.args.get('class_name')
-            teacher_id_param = request.args.get('teacher_id')  # Allow teacher_id as query parameter for admin
             
             # Get teacher's classes
-            if user_role in ['admin', 'secretary']:
-                # Admin/secretary can filter by teacher_id if provided
-                if teacher_id_param:
-                    teacher_classes = ClassModel.list_by_teacher_id(teacher_id_param)
-                else:
-                    # Admin sees all classes
-                    query = ClassModel.query
-                    
-                    if subject_id and term_id:
-                        query = query.filter_by(subject_id=subject_id, term_id=term_id)
-                    elif subject_id:
-                        query = query.filter_by(subject_id=subject_id)
-                    elif term_id:
-                        query = query.filter_by(term_id=term_id)
-                    
-                    teacher_classes = query.all()
-            else:
+            if user_role not in ['admin', 'secretary']:
                 # Teacher sees only their classes
                 teacher = TeacherModel.find_by_username(username)
                 if not teacher:
                     return {'message': 'Teacher not found'}, 404
-                
-                # Get teacher's classes
-                teacher_classes = ClassModel.list_by_teacher_id(teacher._id)
-        
-            if not teacher_classes:
-                return {
-                    'success': True,
-                    'students': [],
-                    'count': 0
-                }, 200
+                teacher_id = teacher._id
             
-            # Apply filters
-            filtered_classes = []
-            for cls in teacher_classes:
-                if year_id:
-                    term = TermModel.find_by_id(cls.term_id)
-                    if not term or str(term.year_id) != str(year_id):
-                        continue
-                if term_id and str(cls.term_id) != str(term_id):
-                    continue
-                if subject_id and str(cls.subject_id) != str(subject_id):
-                    continue
-                if class_id and str(cls._id) != str(class_id):
-                    continue
-                if class_name and cls.class_name != class_name:
-                    continue
-                filtered_classes.append(cls)
+            cache_key = (teacher_id, year_id, term_id, subject_id, class_id, class_name)
+            cached = teacher_students_cache.get(cache_key)
+            if cached is not None:
+                return cached, 200
+            generation = teacher_students_cache.generation()
+            
+            # Apply filters in SQL
+            class_query = ClassModel.filter_query(
+                term_id=term_id, subject_id=subject_id, teacher_id=teacher_id, class_name=class_name
+            )
+            if class_id:
+                class_query = class_query.filter(ClassModel._id == class_id)
+            if year_id:
+                class_query = class_query.join(TermModel, TermModel._id == ClassModel.term_id).filter(
+                    TermModel.year_id == year_id
+                )
+            enrollment_query = class_query.join(
+                StudentClassModel, StudentClassModel.class_id == ClassModel._id
+            )
             
-            if not filtered_classes:
+            # Get unique students enrolled in these classes
+            student_class_map = defaultdict(list)  # student_id -> list of (class_id, subject_id, term_id)
+            for student_id, cls_id, cls_subject_id, cls_term_id, cls_name in enrollment_query.with_entities(
+                StudentClassModel.student_id, ClassModel._id, ClassModel.subject_id,
+                ClassModel.term_id, ClassModel.class_name
+            ).all():
+                student_class_map[student_id].append({
+                    'class_id': cls_id,
+                    'subject_id': cls_subject_id,
+                    'term_id': cls_term_id,
+                    'class_name': cls_name
+                })
+            
+            if not student_class_map:
                 return {
                     'success': True,
                     'students': [],
                     'count': 0
                 }, 200
-        
-            # Get unique students enrolled in these classes
-            student_ids = set()
-            student_class_map = defaultdict(list)  # student_id -> list of (class_id, subject_id, term_id)
             
-            for cls in filtered_classes:
-                enrollments = StudentClassModel.find_by_class_id(cls._id)
-                for enrollment in enrollments:
-                    student_ids.add(enrollment.student_id)
-                    student_class_map[enrollment.student_id].append({
-                        'class_id': cls._id,
-                        'subject_id': cls.subject_id,
-                        'term_id': cls.term_id,
-                        'class_name': cls.class_name
-                    })
-        
-            # Get homework and test assessment types
-            homework_type = AssessmentTypeModel.query.filter_by(type_name='Homework').first()
-            test_type = AssessmentTypeModel.query.filter_by(type_name='Test').first()
+            # Distinct (student, subject, term) pairs the metrics are measured over
+            combos = enrollment_query.filter(
+                ClassModel.subject_id.isnot(None)
+            ).with_entities(
+                StudentClassModel.student_id.label('student_id'),
+                ClassModel.subject_id.label('subject_id'),
+                ClassModel.term_id.label('term_id')
+            ).distinct().subquery()
             
+            # Get homework and test assessment types
+            homework_type = AssessmentTypeModel.find_by_name('Homework')
+            test_type = AssessmentTypeModel.find_by_name('Test')
             homework_type_id = homework_type._id if homework_type else None
             test_type_id = test_type._id if test_type else None
-        
+            
+            # One grouped query for homework and test counts of every student
+            assessment_stats = StudentAssignmentModel.assessment_stats(combos, [homework_type_id, test_type_id])
+            
+            # Attendance counts for every student/subject/term involved, from the rollup
+            attendance_counts = AttendanceRollupModel.find_counts(
+                student_class_map.keys(),
+                {(c['subject_id'], c['term_id']) for infos in student_class_map.values() for c in infos
+                 if c['subject_id'] and c['term_id']}
+            )
+            
+            students = {
+                s._id: s for s in StudentModel.query.filter(
+                    StudentModel._id.in_(enrollment_query.with_entities(StudentClassModel.student_id))
+                ).all()
+            }
+            all_subject_ids = {c['subject_id'] for infos in student_class_map.values() for c in infos if c['subject_id']}
+            identity_map.prefetch(SubjectModel, all_subject_ids)
+            
+            # Term grades only when a term is selected (the subject filter already narrowed the classes)
+            final_grades = TermGradeModel.find_final_grades(students.keys(), all_subject_ids, term_id) if term_id else {}
+            
             # Build student performance data
             students_data = []
             
-            for student_id in student_ids:
-                student = StudentModel.find_by_id(student_id)
+            for student_id, student_classes in student_class_map.items():
+                student = students.get(student_id)
                 if not student:
                     continue
                 
-                # Get student's classes (for reference)
-                student_classes = student_class_map[student_id]
-                
-                # Calculate metrics across all relevant classes
-                # Use sets to avoid duplicate counting for assignments
-                homework_assignments_seen = set()
-                test_assignments_seen = set()
-                attendance_records_seen = set()
-                
-                total_homework = 0
-                completed_homework = 0
-                total_tests = 0
-                test_scores_sum = Decimal('0.00')
-                test_scores_count = 0
-                
-                # Attendance tracking per subject
-                subject_attendance = defaultdict(lambda: {'present': 0, 'total': 0})
+                total_homework, completed_homework, _, _ = assessment_stats.get((student_id, homework_type_id), (0, 0, 0, 0))
+                total_tests, _, test_scores_count, test_scores_sum = assessment_stats.get((student_id, test_type_id), (0, 0, 0, 0))
                 
-                # Process each unique (subject_id, term_id) combination
-                processed_combos = set()
-                
-                for class_info in student_classes:
-                    cls_subject_id = class_info['subject_id']
-                    cls_term_id = class_info['term_id']
-                    cls_class_id = class_info['class_id']
-                    
+                # Attendance for each unique subject/term
+                total_attendance_days = 0
+                total_present_days = 0
+                for cls_subject_id, cls_term_id in {(c['subject_id'], c['term_id']) for c in student_classes}:
                     if not cls_subject_id or not cls_term_id:
                         continue
-                    
-                    # Skip if we've already processed this subject/term combo
-                    combo_key = (str(cls_subject_id), str(cls_term_id))
-                    if combo_key in processed_combos:
-                        continue
-                    processed_combos.add(combo_key)
-                    
-                    # Get homework assignments for this subject/term
-                    if homework_type_id:
-                        homework_assignments = AssignmentModel.query.filter_by(
-                            subject_id=cls_subject_id,
-                            term_id=cls_term_id,
-                            assessment_type_id=homework_type_id,
-                            status='published'
-                        ).all()
-                        
-                        for hw in homework_assignments:
-                            if str(hw._id) not in homework_assignments_seen:
-                                homework_assignments_seen.add(str(hw._id))
-                                total_homework += 1
-                                sa = StudentAssignmentModel.query.filter_by(
-                                    student_id=student_id,
-                                    assignment_id=hw._id
-                                ).first()
-                                if sa and sa.status == 'graded':
-                                    completed_homework += 1
-                    
-                    # Get test assignments for this subject/term
-                    if test_type_id:
-                        test_assignments = AssignmentModel.query.filter_by(
-                            subject_id=cls_subject_id,
-                            term_id=cls_term_id,
-                            assessment_type_id=test_type_id,
-                            status='published'
-                        ).all()
-                        
-                        for test in test_assignments:
-                            if str(test._id) not in test_assignments_seen:
-                                test_assignments_seen.add(str(test._id))
-                                total_tests += 1
-                                sa = StudentAssignmentModel.query.filter_by(
-                                    student_id=student_id,
-                                    assignment_id=test._id
-                                ).first()
-                                if sa and sa.score is not None and sa.status == 'graded':
-                                    # Calculate percentage score
-                                    percentage = (Decimal(str(sa.score)) / Decimal(str(test.max_score))) * Decimal('100')
-                                    test_scores_sum += percentage
-                                    test_scores_count += 1
-                    
-                    # Get attendance records for this subject/term
-                    # Get all classes for this term that match this subject
-                    term_classes = ClassModel.query.filter_by(
-                        term_id=cls_term_id,
-                        subject_id=cls_subject_id
-                    ).all()
-                    term_class_ids = [c._id for c in term_classes]
-                    
-                    if term_class_ids:
-                        attendance_records = AttendanceModel.query.filter(
-                            AttendanceModel.student_id == student_id,
-                            AttendanceModel.subject_id == cls_subject_id,
-                            AttendanceModel.class_id.in_(term_class_ids)
-                        ).all()
-                        
-                        for att in attendance_records:
-                            att_key = f"{str(att._id)}"
-                            if att_key not in attendance_records_seen:
-                                attendance_records_seen.add(att_key)
-                                subject_attendance[cls_subject_id]['total'] += 1
-                                if att.status == 'present':
-                                    subject_attendance[cls_subject_id]['present'] += 1
+                    present, total = attendance_counts.get(
+                        (str(student_id), str(cls_subject_id), str(cls_term_id)), (0, 0)
+                    )
+                    total_attendance_days += total
+                    total_present_days += present
                 
                 # Calculate averages
                 homework_completion_ratio = 0.0
@@ -242,21 +171,15 @@ class TeacherStudentsResource(Resource):
                 
                 test_average = 0.0
                 if test_scores_count > 0:
-                    test_average = float(test_scores_sum / Decimal(str(test_scores_count)))
+                    test_average = test_scores_sum / test_scores_count
                 
                 # Calculate overall attendance ratio (across all subjects)
-                total_attendance_days = sum(s['total'] for s in subject_attendance.values())
-                total_present_days = sum(s['present'] for s in subject_attendance.values())
                 attendance_ratio = 0.0
                 if total_attendance_days > 0:
                     attendance_ratio = (total_present_days / total_attendance_days) * 100
                 
                 # Get unique subjects for this student
-                unique_subjects = set()
-                for class_info in student_classes:
-                    if class_info['subject_id']:
-                        unique_subjects.add(class_info['subject_id'])
-                
+                unique_subjects = {c['subject_id'] for c in student_classes if c['subject_id']}
                 subjects_list = []
                 for subj_id in unique_subjects:
                     subject = SubjectModel.find_by_id(subj_id)
@@ -264,34 +187,13 @@ class TeacherStudentsResource(Resource):
                         subjects_list.append(subject.subject_name)
                 
                 # Get unique class names (deduplicate)
-                unique_class_names = list(set([c['class_name'] for c in student_classes]))
-                unique_class_names.sort()
+                unique_class_names = sorted({c['class_name'] for c in student_classes})
                 
-                # Get term grades for this student (if term_id is provided)
-                # If subject_id filter is provided, only get term grades for that subject
-                # Otherwise, get term grades for all subjects the student is enrolled in
-                term_grade_average = None
-                term_grades = []
-                if term_id:
-                    # Determine which subjects to check for term grades
-                    subjects_to_check = list(unique_subjects)
-                    if subject_id:
-                        # Only include the filtered subject if student is enrolled in it
-                        if subject_id in [str(s) for s in unique_subjects]:
-                            subjects_to_check = [subject_id]
-                        else:
-                            subjects_to_check = []
-                    
-                    # Get term grades for this student/subject/term
-                    for subj_id in subjects_to_check:
-                        term_grade = TermGradeModel.find_by_student_subject_term(
-                            student_id, subj_id, term_id
-                        )
-                        if term_grade and term_grade.final_grade is not None:
-                            term_grades.append(float(term_grade.final_grade))
-                
-                if term_grades:
-                    term_grade_average = sum(term_grades) / len(term_grades)
+                term_grades = [
+                    float(final_grades[(student_id, subj_id)]) for subj_id in unique_subjects
+                    if final_grades.get((student_id, subj_id)) is not None
+                ]
+                term_grade_average = sum(term_grades) / len(term_grades) if term_grades else None
                 
                 students_data.append({
                     'student_id': str(student._id),
@@ -314,54 +216,15 @@ class TeacherStudentsResource(Resource):
             # Sort by student name
             students_data.sort(key=lambda x: x['student_name'])
             
-            # Collect all individual test scores for distribution (deduplicate by student+assignment)
-            all_test_scores = []
-            seen_test_scores = set()  # (student_id, assignment_id) tuples
-            
-            for student_id in student_ids:
-                # Get all test assignments for filtered classes
-                processed_combos = set()
-                for class_info in student_class_map[student_id]:
-                    cls_subject_id = class_info['subject_id']
-                    cls_term_id = class_info['term_id']
-                    
-                    if not cls_subject_id or not cls_term_id or not test_type_id:
-                        continue
-                    
-                    # Skip if we've already processed this subject/term combo
-                    combo_key = (str(cls_subject_id), str(cls_term_id))
-                    if combo_key in processed_combos:
-                        continue
-                    processed_combos.add(combo_key)
-                    
-                    test_assignments = AssignmentModel.query.filter_by(
-                        subject_id=cls_subject_id,
-                        term_id=cls_term_id,
-                        assessment_type_id=test_type_id,
-                        status='published'
-                    ).all()
-                    
-                    for test in test_assignments:
-                        score_key = (str(student_id), str(test._id))
-                        if score_key in seen_test_scores:
-                            continue
-                        seen_test_scores.add(score_key)
-                        
-                        sa = StudentAssignmentModel.query.filter_by(
-                            student_id=student_id,
-                            assignment_id=test._id
-                        ).first()
-                        if sa and sa.score is not None and sa.status == 'graded':
-                            # Calculate percentage score
-                            percentage = (float(sa.score) / float(test.max_score)) * 100
-                            all_test_scores.append(percentage)
-            
-            return {
+            response = {
                 'success': True,
                 'students': students_data,
                 'count': len(students_data),
-                'test_scores': all_test_scores  # Individual test scores for distribution
-            }, 200
+                # Individual test scores for distribution (one per student and test)
+                'test_scores': StudentAssignmentModel.graded_percentages(combos, test_type_id)
+            }
+            teacher_students_cache.set(cache_key, response, generation)
+            return response, 200
         except Exception as e:
             import logging
             import traceback
@@ -371,4 +234,3 @@ class TeacherStudentsResource(Resource):
                 'success': False,
                 'message': f'Error fetching student data: {str(e)}'
             }, 500
-
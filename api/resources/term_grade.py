@@ -1,5 +1,6 @@
 from flask import request, Response
 from flask_restful import Resource
+from db import db
 from models.term_grade import TermGradeModel
 from models.student import StudentModel
 from models.subject import SubjectModel
@@ -7,6 +8,7 @@ from models.term import TermModel
 from models.class_model import ClassModel
 from models.school_year import SchoolYearModel
 from utils.auth_middleware import require_any_role
+from services.grade_recompute_service import grade_recompute_service
 import json
 import logging
 
@@ -189,26 +191,34 @@ class TermGradeCalculateResource(Resource):
         # or filters to calculate for all matching students
         
         if 'students' in data:
-            # Specific students
-            calculated = []
+            # Specific students, batched per term
+            pairs_by_term = {}
             errors = []
             
             for student_data in data['students']:
-                try:
-                    term_grade = TermGradeModel.calculate_and_save(
-                        student_id=student_data['student_id'],
-                        subject_id=student_data['subject_id'],
-                        term_id=student_data['term_id'],
-                        class_id=student_data.get('class_id'),
-                        created_by=data.get('created_by')
-                    )
-                    if term_grade:
-                        calculated.append(term_grade.json())
-                except Exception as e:
+                missing = [f for f in ('student_id', 'subject_id', 'term_id') if not student_data.get(f)]
+                if missing:
                     errors.append({
                         'student_id': student_data.get('student_id'),
-                        'error': str(e)
+                        'error': f"Missing required field: {missing[0]}"
                     })
+                    continue
+                pairs_by_term.setdefault(str(student_data['term_id']), []).append((
+                    student_data['student_id'],
+                    student_data['subject_id'],
+                    student_data.get('class_id')
+                ))
+            
+            calculated = []
+            for trm_id, pairs in pairs_by_term.items():
+                try:
+                    calculated.extend(TermGradeModel.calculate_and_save_batch(
+                        trm_id, pairs, created_by=data.get('created_by')
+                    ))
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Error calculating grades for term {trm_id}: {str(e)}")
+                    errors.extend({'student_id': str(p[0]), 'error': str(e)} for p in pairs)
             
             return {
                 'message': f'Calculated {len(calculated)} term grades',
@@ -225,53 +235,76 @@ class TermGradeCalculateResource(Resource):
             if not term_id:
                 return {'message': 'term_id is required'}, 400
             
-            # Get all student assignments for this term to find students
             from models.student_assignment import StudentAssignmentModel
             from models.assignment import AssignmentModel
             
-            # Get all assignments for this term/subject
-            assignment_query = AssignmentModel.query.filter_by(term_id=term_id)
+            # Unique student/subject combinations with work in this term (one query)
+            pair_query = db.session.query(
+                StudentAssignmentModel.student_id, AssignmentModel.subject_id
+            ).join(
+                AssignmentModel, AssignmentModel._id == StudentAssignmentModel.assignment_id
+            ).filter(AssignmentModel.term_id == term_id)
             if subject_id:
-                assignment_query = assignment_query.filter_by(subject_id=subject_id)
-            
-            assignments = assignment_query.all()
-            assignment_ids = [str(a._id) for a in assignments]
+                pair_query = pair_query.filter(AssignmentModel.subject_id == subject_id)
             
-            # Get unique student/subject combinations from student assignments
-            student_subjects = set()
-            if assignment_ids:
-                student_assignments = StudentAssignmentModel.query.filter(
-                    StudentAssignmentModel.assignment_id.in_(assignment_ids)
-                ).all()
-                
-                for sa in student_assignments:
-                    assignment = next((a for a in assignments if str(a._id) == str(sa.assignment_id)), None)
-                    if assignment:
-                        student_subjects.add((
-                            str(sa.student_id),
-                            str(assignment.subject_id),
-                            str(assignment.term_id),
-                            str(class_id) if class_id else None
-                        ))
+            pairs = [
+                (student_id, subj_id, str(class_id) if class_id else None)
+                for student_id, subj_id in pair_query.distinct().all()
+            ]
             
-            # Calculate grades
-            calculated = []
-            for student_id, subj_id, trm_id, cls_id in student_subjects:
-                try:
-                    term_grade = TermGradeModel.calculate_and_save(
-                        student_id=student_id,
-                        subject_id=subj_id,
-                        term_id=trm_id,
-                        class_id=cls_id,
-                        created_by=data.get('created_by')
-                    )
-                    if term_grade:
-                        calculated.append(term_grade.json())
-                except Exception as e:
-                    logging.error(f"Error calculating grade: {str(e)}")
+            try:
+                calculated = TermGradeModel.calculate_and_save_batch(
+                    term_id, pairs, created_by=data.get('created_by')
+                )
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error calculating grades: {str(e)}")
+                return {'message': f'Error calculating term grades: {str(e)}'}, 500
             
             return {
                 'message': f'Calculated {len(calculated)} term grades',
                 'calculated': calculated
             }, 200
 
+
+class TermGradeStatusResource(Resource):
+    """Freshness of derived term grades"""
+    
+    @require_any_role(['admin', 'teacher', 'student', 'secretary'])
+    def get(self):
+        """
+        GET /term_grade/status?student_id=&subject_id=&term_id=
+        Reports which term grades are waiting for recomputation and when each was last computed.
+        Students only see their own; everyone else must give student_id or term_id.
+        """
+        from flask import g
+        from models.student_class import StudentClassModel
+        from utils.pagination import parse_uuid_arg, PaginationError
+        
+        try:
+            student_id = parse_uuid_arg('student_id')
+            subject_id = parse_uuid_arg('subject_id')
+            term_id = parse_uuid_arg('term_id')
+        except PaginationError as e:
+            return {'message': str(e)}, 400
+        
+        if getattr(g, 'role', None) == 'student':
+            username = getattr(g, 'username', None)
+            student = StudentModel.find_by_username(username) if username else None
+            if not student:
+                return {'message': 'Student not found'}, 404
+            student_id = student._id
+        elif not student_id and not term_id:
+            return {'message': 'student_id or term_id is required'}, 400
+        
+        # Only the term grades these enrollments derive are looked up
+        entries = grade_recompute_service.status(
+            StudentClassModel.subject_terms(student_id=student_id, subject_id=subject_id, term_id=term_id)
+        )
+        pending = [e for e in entries if e['pending']]
+        
+        return {
+            'is_stale': len(pending) > 0,
+            'pending_count': len(pending),
+            'entries': entries
+        }, 200
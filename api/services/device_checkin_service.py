@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+from typing import Optional
+
+
+class DeviceCheckinService:
+    """Background drain for device check-ins staged in device_checkin.
+
+    The ingestion endpoint only stages scans and calls notify(); a daemon
+    thread per worker process then runs DeviceCheckinModel.process_pending
+    in batches until nothing is left, so a gate scanner flushing thousands of
+    events never holds a request worker for the matching work. Batches are
+    claimed with SKIP LOCKED, so every gunicorn worker can help drain.
+    The thread also wakes every DEVICE_CHECKIN_POLL_SECONDS to pick up scans
+    left behind by a process that died mid-batch.
+
+    Set DEVICE_CHECKIN_SYNC=true to process inline (tests, debugging).
+    """
+
+    def __init__(self) -> None:
+        self.sync = os.getenv('DEVICE_CHECKIN_SYNC', 'false').lower() == 'true'
+        self.batch_size = int(os.getenv('DEVICE_CHECKIN_BATCH_SIZE', '5000'))
+        self.poll_seconds = float(os.getenv('DEVICE_CHECKIN_POLL_SECONDS', '60'))
+        # How early before the period start a scan still counts, and when it becomes 'late'
+        self.early_minutes = int(os.getenv('DEVICE_CHECKIN_EARLY_MINUTES', '15'))
+        self.late_minutes = int(os.getenv('DEVICE_CHECKIN_LATE_MINUTES', '10'))
+
+        self.app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+
+    def notify(self) -> None:
+        """New scans were staged and committed"""
+        if self.sync:
+            self.drain()
+            return
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def drain(self) -> int:
+        """Process staged scans until none are left; returns how many were processed"""
+        from db import db
+        from models.device_checkin import DeviceCheckinModel
+        from services.grade_recompute_service import grade_recompute_service
+
+        total = 0
+        while True:
+            try:
+                processed, recorded = DeviceCheckinModel.process_pending(
+                    batch_size=self.batch_size,
+                    early_minutes=self.early_minutes,
+                    late_minutes=self.late_minutes
+                )
+            except Exception as e:
+                db.session.rollback()
+                logging.error("Device check-in processing failed: %s", e)
+                return total
+            if recorded:
+                grade_recompute_service.enqueue_many(recorded)
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    # ---------- Worker side ----------
+
+    def _ensure_worker(self) -> None:
+        # gunicorn --preload forks after import, so each worker process starts its own thread
+        pid = os.getpid()
+        if self._worker and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            self._worker = threading.Thread(target=self._run, name="device-checkin", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _run(self) -> None:
+        from db import db
+
+        while True:
+            self._wakeup.wait(timeout=self.poll_seconds)
+            self._wakeup.clear()
+            if self.app is None:
+                continue
+            with self.app.app_context():
+                try:
+                    self.drain()
+                finally:
+                    db.session.remove()
+
+
+device_checkin_service = DeviceCheckinService()
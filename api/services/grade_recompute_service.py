@@ -0,0 +1,324 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Iterable, List, Dict, Any
+
+try:
+    import redis
+except Exception:  # pragma: no cover
+    redis = None
+
+
+class GradeRecomputeService:
+    """Coalescing background queue for derived term grade recomputation.
+
+    Grade and attendance saves call enqueue(student_id, subject_id, term_id,
+    class_id) instead of recomputing inline. Pending keys are deduplicated and
+    a daemon worker drains them in batches through
+    TermGradeModel.calculate_and_save_batch, one batch per term.
+
+    Uses Redis (same REDIS_URL as auth_redis_service) when reachable, so every
+    gunicorn worker drains one shared queue; otherwise falls back to an
+    in-process queue. Set GRADE_RECOMPUTE_SYNC=true to recompute inline.
+
+    In Redis the queue is a sorted set scored by the time a key becomes
+    claimable. Claiming a batch pushes its keys' scores a visibility
+    timeout into the future, so keys claimed by a worker that dies are
+    picked up again; a key re-enqueued while claimed has its score lowered
+    back to now and stays queued when the batch finishes. Keys of a term
+    whose recomputation fails are not finished either, so they are retried
+    once the visibility timeout has passed. Freshness is kept
+    per (student, subject, term) in a small hash that expires after
+    GRADE_RECOMPUTE_STATUS_SECONDS.
+    """
+
+    QUEUE_KEY = "grade_recompute:queue"
+    STATUS_KEY_PREFIX = "grade_recompute:status:"
+    SEPARATOR = "|"
+
+    # Keys claimable at ARGV[1] (at most ARGV[2]), hidden until ARGV[3]
+    CLAIM_SCRIPT = """
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, key in ipairs(keys) do
+    redis.call('ZADD', KEYS[1], ARGV[3], key)
+end
+return keys
+"""
+    # Remove the claimed keys still hidden until ARGV[1] (not re-enqueued); returns those removed
+    FINISH_SCRIPT = """
+local finished = {}
+for i = 2, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) >= tonumber(ARGV[1]) then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        table.insert(finished, ARGV[i])
+    end
+end
+return finished
+"""
+
+    def __init__(self) -> None:
+        self.redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        self.sync = os.getenv('GRADE_RECOMPUTE_SYNC', 'false').lower() == 'true'
+        self.batch_size = int(os.getenv('GRADE_RECOMPUTE_BATCH_SIZE', '500'))
+        # Short wait before draining so a burst of saves collapses into one batch
+        self.coalesce_seconds = float(os.getenv('GRADE_RECOMPUTE_COALESCE_SECONDS', '1.0'))
+        # Claimed keys not finished within this time are handed to another worker
+        self.visibility_seconds = float(os.getenv('GRADE_RECOMPUTE_VISIBILITY_SECONDS', '300'))
+        self.status_seconds = int(os.getenv('GRADE_RECOMPUTE_STATUS_SECONDS', str(7 * 24 * 3600)))
+        self.max_done_entries = 10000
+
+        self.app = None
+        self.client = None
+        if redis is not None and not self.sync:
+            try:
+                self.client = redis.Redis.from_url(self.redis_url, decode_responses=True)
+                # Test connection
+                self.client.ping()
+                self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+                self._finish = self.client.register_script(self.FINISH_SCRIPT)
+            except Exception:
+                self.client = None
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # Local fallback: queued keys (with the time they become claimable),
+        # claimed keys, and freshness per status key
+        self._pending: Dict[str, float] = {}
+        self._inflight: Dict[str, float] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._done: "OrderedDict[str, float]" = OrderedDict()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._claimed_until = 0.0
+
+    def init_app(self, app) -> None:
+        self.app = app
+
+    # ---------- Keys ----------
+
+    def _make_key(self, student_id, subject_id, term_id, class_id=None) -> str:
+        return self.SEPARATOR.join([
+            str(student_id), str(subject_id), str(term_id),
+            str(class_id) if class_id else ''
+        ])
+
+    def _split_key(self, key: str):
+        student_id, subject_id, term_id, class_id = key.split(self.SEPARATOR)
+        return student_id, subject_id, term_id, class_id or None
+
+    def _status_key(self, key: str) -> str:
+        """(student, subject, term) part of a queue key: freshness is per term grade, not per class"""
+        return key.rsplit(self.SEPARATOR, 1)[0]
+
+    # ---------- Producer side ----------
+
+    def enqueue(self, student_id, subject_id, term_id, class_id=None) -> None:
+        """Mark a (student, subject, term) term grade as stale"""
+        self.enqueue_many([(student_id, subject_id, term_id, class_id)])
+
+    def enqueue_many(self, items: Iterable) -> None:
+        keys = [
+            self._make_key(*item) for item in items
+            if item[0] and item[1] and item[2]
+        ]
+        if not keys:
+            return
+
+        if self.sync:
+            self._process(keys)
+            return
+
+        now = time.time()
+        if self.client:
+            try:
+                pipe = self.client.pipeline()
+                # LT keeps the earliest time of a queued key, and makes a claimed
+                # key claimable again so the running batch leaves it queued
+                pipe.zadd(self.QUEUE_KEY, {key: now for key in keys}, lt=True)
+                for status_key in {self._status_key(key) for key in keys}:
+                    # Keep the earliest enqueue time so staleness is reported honestly
+                    pipe.hsetnx(self.STATUS_KEY_PREFIX + status_key, 'pending_since', now)
+                    pipe.expire(self.STATUS_KEY_PREFIX + status_key, self.status_seconds)
+                pipe.execute()
+            except Exception as e:
+                logging.warning("Grade recompute queue unavailable, using local queue: %s", e)
+                self.client = None
+                self._enqueue_local(keys, now)
+        else:
+            self._enqueue_local(keys, now)
+
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _enqueue_local(self, keys: List[str], now: float) -> None:
+        with self._lock:
+            for key in keys:
+                # Also makes a key waiting for a retry claimable now
+                self._pending[key] = min(self._pending.get(key, now), now)
+                self._pending_since.setdefault(self._status_key(key), now)
+
+    # ---------- Status ----------
+
+    def status(self, keys: Iterable) -> List[Dict[str, Any]]:
+        """
+        Pending and last-computed times of the given (student_id, subject_id,
+        term_id) term grades; those never enqueued (or expired) are left out
+        """
+        status_keys = list(dict.fromkeys(
+            self.SEPARATOR.join(str(part) for part in key) for key in keys
+        ))
+        if not status_keys:
+            return []
+        if self.client:
+            try:
+                pipe = self.client.pipeline()
+                for status_key in status_keys:
+                    pipe.hmget(self.STATUS_KEY_PREFIX + status_key, 'pending_since', 'last_computed')
+                found = pipe.execute()
+            except Exception:
+                found = [(None, None)] * len(status_keys)
+        else:
+            with self._lock:
+                found = [(self._pending_since.get(k), self._done.get(k)) for k in status_keys]
+
+        entries = []
+        for status_key, (pending_since, last_computed) in zip(status_keys, found):
+            if pending_since is None and last_computed is None:
+                continue
+            student_id, subject_id, term_id = status_key.split(self.SEPARATOR)
+            entries.append({
+                'student_id': student_id,
+                'subject_id': subject_id,
+                'term_id': term_id,
+                'pending': pending_since is not None,
+                'pending_since': float(pending_since) if pending_since is not None else None,
+                'last_computed': float(last_computed) if last_computed is not None else None
+            })
+        return entries
+
+    # ---------- Worker side ----------
+
+    def _ensure_worker(self) -> None:
+        # gunicorn --preload forks after import, so each worker process starts its own thread
+        pid = os.getpid()
+        if self._worker and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            self._worker = threading.Thread(target=self._run, name="grade-recompute", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(timeout=30)
+            self._wakeup.clear()
+            time.sleep(self.coalesce_seconds)
+            try:
+                while True:
+                    keys = self._pop_batch()
+                    if not keys:
+                        break
+                    self._process(keys)
+            except Exception as e:
+                logging.error("Grade recompute worker error: %s", e)
+
+    def _pop_batch(self) -> List[str]:
+        if self.client:
+            now = time.time()
+            try:
+                self._claimed_until = now + self.visibility_seconds
+                return list(self._claim(
+                    keys=[self.QUEUE_KEY], args=[now, self.batch_size, self._claimed_until]
+                ) or [])
+            except Exception as e:
+                logging.error("Grade recompute queue read failed: %s", e)
+                return []
+        now = time.time()
+        with self._lock:
+            keys = [key for key, claimable_at in self._pending.items() if claimable_at <= now][:self.batch_size]
+            for key in keys:
+                self._inflight[key] = self._pending.pop(key)
+        return keys
+
+    def _process(self, keys: List[str]) -> None:
+        """Recompute the given keys, one batch statement per term"""
+        from db import db
+        from models.term_grade import TermGradeModel
+
+        by_term: Dict[str, list] = {}
+        for key in keys:
+            student_id, subject_id, term_id, class_id = self._split_key(key)
+            by_term.setdefault(term_id, []).append((key, (student_id, subject_id, class_id)))
+
+        failed = set()
+
+        def run():
+            for term_id, entries in by_term.items():
+                try:
+                    TermGradeModel.calculate_and_save_batch(term_id, [pair for _, pair in entries])
+                except Exception as e:
+                    db.session.rollback()
+                    failed.update(key for key, _ in entries)
+                    logging.error("Error recomputing term grades for term %s, will retry: %s", term_id, e)
+
+        if self.sync or self.app is None:
+            run()
+        else:
+            with self.app.app_context():
+                try:
+                    run()
+                finally:
+                    db.session.remove()
+
+        self._mark_done([key for key in keys if key not in failed])
+        if failed:
+            self._retry_later(list(failed))
+
+    def _retry_later(self, keys: List[str]) -> None:
+        """Leave failed keys queued and pending, claimable again after the visibility timeout"""
+        if self.client or self.sync:
+            # In Redis they are still claimed until the visibility timeout
+            return
+        retry_at = time.time() + self.visibility_seconds
+        with self._lock:
+            for key in keys:
+                self._inflight.pop(key, None)
+                self._pending[key] = min(self._pending.get(key, retry_at), retry_at)
+
+    def _mark_done(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        now = time.time()
+        if self.client:
+            try:
+                # Keys re-enqueued while processing stay queued and pending
+                finished = set(self._finish(keys=[self.QUEUE_KEY], args=[self._claimed_until] + keys) or [])
+                pipe = self.client.pipeline()
+                for key in keys:
+                    status_key = self.STATUS_KEY_PREFIX + self._status_key(key)
+                    if key in finished:
+                        pipe.hdel(status_key, 'pending_since')
+                    pipe.hset(status_key, 'last_computed', now)
+                    pipe.expire(status_key, self.status_seconds)
+                pipe.execute()
+                return
+            except Exception as e:
+                logging.error("Grade recompute status update failed: %s", e)
+        with self._lock:
+            for key in keys:
+                self._inflight.pop(key, None)
+                status_key = self._status_key(key)
+                if key not in self._pending:
+                    self._pending_since.pop(status_key, None)
+                self._done[status_key] = now
+                self._done.move_to_end(status_key)
+            while len(self._done) > self.max_done_entries:
+                self._done.popitem(last=False)
+
+
+grade_recompute_service = GradeRecomputeService()
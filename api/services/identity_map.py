@@ -0,0 +1,117 @@
+import uuid
+from typing import Iterable
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+class RequestIdentityMap:
+    """Per-request memo for find_by_id lookups.
+
+    Models route find_by_id through find_by_id() here, so a handler that asks
+    for the same row many times (one subject per assignment, one class per
+    attendance record, ...) queries it once. Misses are not remembered, so
+    a row inserted later in the request is found. prefetch() warms the map
+    for a set of ids with a single IN query, so handlers can load
+    everything a loop will need up front.
+
+    The map lives in flask.g, is dropped at app-context teardown, and is
+    cleared whenever the session commits so writes made during the request
+    are never hidden.
+    """
+
+    G_KEY = '_identity_map'
+
+    def init_app(self, app) -> None:
+        app.teardown_appcontext(self._teardown)
+        event.listen(Session, 'after_commit', self._after_commit)
+
+    # ---------- Lookups ----------
+
+    def _map(self):
+        if not has_app_context():
+            return None
+        entries = g.get(self.G_KEY)
+        if entries is None:
+            entries = {}
+            setattr(g, self.G_KEY, entries)
+        return entries
+
+    @staticmethod
+    def _normalize(_id):
+        if isinstance(_id, uuid.UUID) or _id is None:
+            return _id
+        try:
+            return uuid.UUID(str(_id))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _usable(obj):
+        # Rows deleted during the request must not be handed out again
+        state = inspect(obj)
+        return not (state.deleted or state.was_deleted)
+
+    @staticmethod
+    def _load_one(model, _id):
+        from services.reference_cache import reference_cache
+        if model.__tablename__ in reference_cache.TABLES:
+            return reference_cache.get(model, _id)
+        return model.query.filter_by(_id=_id).first()
+
+    def find_by_id(self, model, _id):
+        """Row of model with primary key _id (None if missing), loaded at most once per request"""
+        _id = self._normalize(_id)
+        if _id is None:
+            return None
+
+        entries = self._map()
+        if entries is None:
+            return self._load_one(model, _id)
+
+        key = (model.__tablename__, _id)
+        obj = entries.get(key)
+        if obj is not None and self._usable(obj):
+            return obj
+        obj = self._load_one(model, _id)
+        if obj is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = obj
+        return obj
+
+    def prefetch(self, model, ids: Iterable) -> None:
+        """Load every id not yet in the map with one IN query"""
+        entries = self._map()
+        if entries is None:
+            return
+        table = model.__tablename__
+        wanted = {self._normalize(_id) for _id in ids}
+        wanted.discard(None)
+        missing = [_id for _id in wanted if (table, _id) not in entries]
+        if not missing:
+            return
+
+        from services.reference_cache import reference_cache
+        if table in reference_cache.TABLES:
+            found = reference_cache.get_many(model, missing)
+        else:
+            found = {row._id: row for row in model.query.filter(model._id.in_(missing)).all()}
+        for _id, row in found.items():
+            entries[(table, _id)] = row
+
+    # ---------- Lifecycle ----------
+
+    def clear(self) -> None:
+        if has_app_context():
+            g.pop(self.G_KEY, None)
+
+    def _after_commit(self, session) -> None:
+        self.clear()
+
+    def _teardown(self, exception=None) -> None:
+        self.clear()
+
+
+identity_map = RequestIdentityMap()
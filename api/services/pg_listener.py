@@ -0,0 +1,80 @@
+import os
+import time
+import select
+import logging
+import threading
+from typing import Callable, Optional
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except Exception:  # pragma: no cover
+    psycopg2 = None
+
+
+class NotifyListener:
+    """Background thread LISTENing on one PostgreSQL channel for this worker process.
+
+    Runs on its own autocommit connection and calls on_notify(payload) for
+    every notification. After each (re)connect it calls on_connect(), since
+    anything sent while it was not listening is lost. listening is False
+    until the LISTEN is in place and again while reconnecting.
+    """
+
+    def __init__(self, name: str, channel: str, on_notify: Callable[[str], None],
+                 on_connect: Callable[[], None]) -> None:
+        self.name = name
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+        self.dsn: Optional[str] = None
+        self.listening = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def configured(self) -> bool:
+        return psycopg2 is not None and bool(self.dsn)
+
+    def ensure(self) -> None:
+        # gunicorn --preload forks after import, so each worker process starts its own thread
+        if not self.configured:
+            return
+        pid = os.getpid()
+        if self._thread and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == pid:
+                return
+            self.listening = False
+            self._thread = threading.Thread(target=self._listen, name=self.name, daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                self.on_connect()
+                self.listening = True
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logging.warning("%s listener disconnected: %s", self.name, e)
+            finally:
+                self.listening = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(5)
@@ -0,0 +1,198 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Set
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from services.pg_listener import NotifyListener
+
+
+class ReferenceCache:
+    """Read-through, in-process cache for slowly changing reference tables.
+
+    Models for term, school_year, period, subject, year_level, assessment_type
+    and classroom route find_by_id through get() (behind the request identity
+    map in services/identity_map.py). Hits are merged into the
+    current session with load=False, so they cost no database round trip and
+    behave like normally loaded rows (callers may still modify and save them).
+
+    Invalidation: fn_audit_trigger bumps reference_data_version and sends
+    pg_notify('reference_data_changed', <table>) on every write to these
+    tables. Each worker process LISTENs on a dedicated connection and drops
+    the affected table. Commits made by this process are also applied
+    locally right away. While the listener is down, versions are polled every
+    REFERENCE_CACHE_VERSION_CHECK_SECONDS; if that fails too, the cache is
+    bypassed.
+    """
+
+    CHANNEL = 'reference_data_changed'
+    TABLES = ('term', 'school_year', 'period', 'subject', 'year_level', 'assessment_type', 'classroom')
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv('REFERENCE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_entries = int(os.getenv('REFERENCE_CACHE_MAX_ENTRIES', '5000'))
+        self.version_check_seconds = float(os.getenv('REFERENCE_CACHE_VERSION_CHECK_SECONDS', '5'))
+
+        self.app = None
+        self._lock = threading.Lock()
+        self._entries: Dict[str, "OrderedDict[uuid.UUID, object]"] = {t: OrderedDict() for t in self.TABLES}
+        # Bumped on every invalidation; a load started before the bump is not stored
+        self._generations: Dict[str, int] = {t: 0 for t in self.TABLES}
+        self._db_versions: Dict[str, int] = {}
+        self._last_version_check = 0.0
+        self._listener = NotifyListener("reference-cache", self.CHANNEL, self.invalidate, self.clear)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self._listener.dsn = app.config.get('SQLALCHEMY_DATABASE_URI')
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+
+    # ---------- Lookups ----------
+
+    def get(self, model, _id):
+        """Return the row of model with primary key _id, or None"""
+        from db import db
+
+        if isinstance(_id, str):
+            try:
+                _id = uuid.UUID(_id)
+            except ValueError:
+                return None
+        if _id is None:
+            return None
+
+        table = model.__tablename__
+        if not self.enabled or table not in self._entries or not self._is_fresh():
+            return model.query.filter_by(_id=_id).first()
+
+        # Already in this session (possibly with unsaved changes): use it as is
+        existing = db.session.identity_map.get(inspect(model).identity_key_from_primary_key((_id,)))
+        if existing is not None:
+            return existing
+
+        with self._lock:
+            cached = self._entries[table].get(_id)
+            if cached is not None:
+                self._entries[table].move_to_end(_id)
+            generation = self._generations[table]
+        if cached is not None:
+            return db.session.merge(cached, load=False)
+
+        obj = model.query.filter_by(_id=_id).first()
+        if obj is None:
+            return None
+        # Keep a detached master copy and hand the session its own merged instance
+        db.session.expunge(obj)
+        self._store(table, _id, obj, generation)
+        return db.session.merge(obj, load=False)
+
+    def get_many(self, model, ids) -> Dict[uuid.UUID, object]:
+        """{_id: row} for the given UUIDs; cache misses are loaded with one IN query"""
+        from db import db
+
+        table = model.__tablename__
+        ids = list(ids)
+        if not ids:
+            return {}
+        if not self.enabled or table not in self._entries or not self._is_fresh():
+            return {row._id: row for row in model.query.filter(model._id.in_(ids)).all()}
+
+        found = {}
+        to_load = []
+        for _id in ids:
+            existing = db.session.identity_map.get(inspect(model).identity_key_from_primary_key((_id,)))
+            if existing is not None:
+                found[_id] = existing
+                continue
+            with self._lock:
+                cached = self._entries[table].get(_id)
+            if cached is not None:
+                found[_id] = db.session.merge(cached, load=False)
+            else:
+                to_load.append(_id)
+
+        if to_load:
+            with self._lock:
+                generation = self._generations[table]
+            for obj in model.query.filter(model._id.in_(to_load)).all():
+                db.session.expunge(obj)
+                self._store(table, obj._id, obj, generation)
+                found[obj._id] = db.session.merge(obj, load=False)
+        return found
+
+    def _store(self, table, _id, obj, generation) -> None:
+        with self._lock:
+            if self._generations[table] != generation:
+                return
+            entries = self._entries[table]
+            entries[_id] = obj
+            entries.move_to_end(_id)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    # ---------- Invalidation ----------
+
+    def invalidate(self, table) -> None:
+        with self._lock:
+            if table in self._entries:
+                self._entries[table].clear()
+                self._generations[table] += 1
+
+    def clear(self) -> None:
+        for table in self.TABLES:
+            self.invalidate(table)
+
+    def _after_flush(self, session, flush_context) -> None:
+        changed = session.info.setdefault('reference_cache_changed', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table in self._entries:
+                changed.add(table)
+
+    def _after_commit(self, session) -> None:
+        changed: Set[str] = session.info.pop('reference_cache_changed', set())
+        for table in changed:
+            self.invalidate(table)
+
+    def _after_rollback(self, session, previous_transaction) -> None:
+        session.info.pop('reference_cache_changed', None)
+
+    # ---------- Freshness ----------
+
+    def _is_fresh(self) -> bool:
+        """True when cached entries can be trusted without asking the database"""
+        self._listener.ensure()
+        if self._listener.listening:
+            return True
+        if time.time() - self._last_version_check < self.version_check_seconds:
+            return True
+        return self._check_versions()
+
+    def _check_versions(self) -> bool:
+        from db import db
+
+        try:
+            # Separate connection so a failure cannot roll back the caller's session
+            with db.engine.connect() as conn:
+                rows = conn.execute(text("SELECT table_name, version FROM reference_data_version")).all()
+        except Exception as e:
+            logging.warning("Reference cache version check failed, bypassing cache: %s", e)
+            self.clear()
+            return False
+        versions = {table: version for table, version in rows}
+        for table in self.TABLES:
+            if versions.get(table) != self._db_versions.get(table):
+                self.invalidate(table)
+        self._db_versions = versions
+        self._last_version_check = time.time()
+        return True
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from services.pg_listener import NotifyListener
+
+
+class ResultCache:
+    """In-process TTL cache for computed API responses, keyed by the request's filters.
+
+    Each cache declares the tables its results are derived from. A commit
+    that wrote to any of them (ORM flushes and ORM-executed INSERT/UPDATE/
+    DELETE statements alike) drops the whole cache in this process right
+    away and is then sent with pg_notify('result_cache_changed', ...) so the
+    other worker processes drop the same entries. While this process's
+    listener is down the caches are bypassed. Writes made by raw SQL are
+    picked up once entries expire after ttl_seconds. A ttl of 0 disables
+    the cache.
+
+    scoped_by=(table, column) narrows invalidation for one of the tables:
+    keys then start with the value of that column the entry is about (None
+    for entries covering every row), and flushing rows of the table only
+    drops the entries for their old and new column values, plus the None
+    ones. Bulk statements on the table still drop everything.
+    """
+
+    def __init__(self, name: str, tables: Iterable[str], ttl_seconds: float, max_entries: int = 256,
+                 scoped_by: Optional[Tuple[str, str]] = None) -> None:
+        self.name = name
+        self.tables: Set[str] = set(tables)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.scoped_by = scoped_by
+        if scoped_by:
+            self.tables.add(scoped_by[0])
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[object, tuple]" = OrderedDict()
+        self._generation = 0
+        _registry.append(self)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key) -> Optional[object]:
+        if not self.enabled or not _is_fresh():
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self) -> int:
+        """Read before computing a value; pass to set() so results computed across an invalidation are dropped"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def discard_scopes(self, values: Iterable) -> None:
+        """Drop the entries whose key starts with one of values, or with None"""
+        values = {str(value) for value in values}
+        with self._lock:
+            for key in [k for k in self._entries if k[0] is None or str(k[0]) in values]:
+                del self._entries[key]
+            self._generation += 1
+
+
+_registry: List[ResultCache] = []
+
+CHANNEL = 'result_cache_changed'
+# NOTIFY payloads must stay under 8000 bytes; larger scope lists become full clears
+MAX_PAYLOAD_BYTES = 7900
+
+
+def named_cache(name: str, tables: Iterable[str], default_ttl_seconds: float = 30,
+                scoped_by: Optional[Tuple[str, str]] = None) -> ResultCache:
+    """Create a ResultCache whose ttl can be overridden with <NAME>_CACHE_SECONDS"""
+    ttl = float(os.getenv(f'{name.upper()}_CACHE_SECONDS', str(default_ttl_seconds)))
+    return ResultCache(name, tables, ttl, scoped_by=scoped_by)
+
+
+# ---------- Invalidation ----------
+
+def _changed_tables(session) -> Set[str]:
+    return session.info.setdefault('result_cache_changed', set())
+
+
+def _bulk_tables(session) -> Set[str]:
+    return session.info.setdefault('result_cache_bulk', set())
+
+
+def _scope_values(session) -> Dict[str, set]:
+    return session.info.setdefault('result_cache_scopes', {})
+
+
+def _after_flush(session, flush_context) -> None:
+    changed = _changed_tables(session)
+    scoped = [cache for cache in _registry if cache.scoped_by]
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if not table:
+            continue
+        changed.add(table)
+        for cache in scoped:
+            scope_table, column = cache.scoped_by
+            if scope_table != table:
+                continue
+            # Current value and, for updates, the one it replaced
+            history = inspect(obj).attrs[column].history
+            values = _scope_values(session).setdefault(cache.name, set())
+            values.update(v for v in list(history.deleted) + [getattr(obj, column)] if v is not None)
+
+
+def _do_orm_execute(orm_execute_state) -> None:
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(statement, 'table', None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+            _bulk_tables(orm_execute_state.session).add(table.name)
+
+
+def _invalidations(changed: Set[str], bulk: Set[str], scopes: Dict[str, set]) -> Dict[str, Optional[List[str]]]:
+    """{cache name: scope values to discard, or None to clear it} for a commit"""
+    invalidations = {}
+    for cache in _registry:
+        touched = cache.tables & changed
+        if not touched:
+            continue
+        scope_table = cache.scoped_by[0] if cache.scoped_by else None
+        if touched == {scope_table} and scope_table not in bulk:
+            invalidations[cache.name] = sorted(str(value) for value in scopes.get(cache.name, ()))
+        else:
+            logging.debug("Result cache %s invalidated by writes to %s", cache.name, sorted(touched))
+            invalidations[cache.name] = None
+    return invalidations
+
+
+def apply_invalidations(invalidations: Dict[str, Optional[List[str]]]) -> None:
+    for cache in _registry:
+        if cache.name not in invalidations:
+            continue
+        values = invalidations[cache.name]
+        if values is None:
+            cache.clear()
+        else:
+            cache.discard_scopes(values)
+
+
+def _origin() -> str:
+    # Computed per call: gunicorn --preload forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _publish(invalidations: Dict[str, Optional[List[str]]]) -> None:
+    """Tell the other worker processes what this commit invalidated"""
+    from db import db
+
+    payload = json.dumps({'origin': _origin(), 'caches': invalidations})
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        payload = json.dumps({'origin': _origin(), 'caches': {name: None for name in invalidations}})
+    try:
+        # Separate connection: the committed session must not be reused from its own event
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': CHANNEL, 'payload': payload})
+            conn.commit()
+    except Exception as e:
+        logging.warning("Result cache invalidation could not be published: %s", e)
+
+
+def _on_notify(payload: str) -> None:
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logging.warning("Ignoring malformed result cache notification: %r", payload)
+        return
+    if message.get('origin') == _origin():
+        return  # already applied when this process committed
+    apply_invalidations(message.get('caches') or {})
+
+
+def _clear_all() -> None:
+    for cache in _registry:
+        cache.clear()
+
+
+_listener = NotifyListener("result-cache", CHANNEL, _on_notify, _clear_all)
+
+
+def _is_fresh() -> bool:
+    """False while writes from other processes could be missed (listener configured but down)"""
+    if not _listener.configured:
+        return True
+    _listener.ensure()
+    return _listener.listening
+
+
+def _after_commit(session) -> None:
+    changed: Set[str] = session.info.pop('result_cache_changed', set())
+    bulk: Set[str] = session.info.pop('result_cache_bulk', set())
+    scopes: Dict[str, set] = session.info.pop('result_cache_scopes', {})
+    if not changed:
+        return
+    invalidations = _invalidations(changed, bulk, scopes)
+    if not invalidations:
+        return
+    apply_invalidations(invalidations)
+    if _listener.configured:
+        _publish(invalidations)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop('result_cache_changed', None)
+    session.info.pop('result_cache_bulk', None)
+    session.info.pop('result_cache_scopes', None)
+
+
+def init_app(app) -> None:
+    _listener.dsn = app.config.get('SQLALCHEMY_DATABASE_URI')
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_rollback)
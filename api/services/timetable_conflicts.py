@@ -0,0 +1,100 @@
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Resources that can hold one class per slot, with the class column naming them
+RESOURCE_KINDS = (('year_level', 'year_level_id'), ('teacher', 'teacher_id'), ('classroom', 'classroom_id'))
+
+
+class TimetableOccupancy:
+    """Per-term occupancy bitmaps of year levels, teachers and classrooms.
+
+    Each term's (day_of_week, period_id) slots are numbered as they are first
+    seen, and every resource gets an int bitmap of the slots it holds in that
+    term. Building it is a single pass over ClassModel.occupancy_rows(): a
+    class whose bit is already set for one of its resources is a double
+    booking. Only the first class of each booking is kept, plus every class
+    of the double bookings, for /class/conflicts. (Class writes check their
+    own slot with ClassModel.slot_clash; the generator keeps its own bitmaps.)
+
+    Slots are matched by period, not by clock time, so two different periods
+    that overlap are not reported.
+    """
+
+    def __init__(self, rows: Iterable = ()) -> None:
+        self._slot_bits: Dict[uuid.UUID, Dict[Tuple[int, uuid.UUID], int]] = {}
+        self._bitmaps: Dict[Tuple[uuid.UUID, str, uuid.UUID], int] = defaultdict(int)
+        # First class holding each (term, kind, resource, bit) that is set
+        self._holders: Dict[Tuple, object] = {}
+        # Classes of the (term, kind, resource, bit) held more than once, in discovery order
+        self._clashing: Dict[Tuple, List] = {}
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def load(cls, term_ids: Optional[Iterable] = None) -> "TimetableOccupancy":
+        """Occupancy of the given terms (all terms when None) from one query"""
+        from models.class_model import ClassModel
+        if term_ids is not None:
+            term_ids = [_id for _id in (cls._uuid(t) for t in term_ids) if _id is not None]
+        return cls(ClassModel.occupancy_rows(term_ids))
+
+    @staticmethod
+    def _uuid(value) -> Optional[uuid.UUID]:
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            return None
+
+    def _bit(self, term_id, day_of_week, period_id) -> int:
+        slots = self._slot_bits.setdefault(term_id, {})
+        key = (int(day_of_week), period_id)
+        bit = slots.get(key)
+        if bit is None:
+            bit = slots[key] = len(slots)
+        return bit
+
+    def add(self, row) -> None:
+        """Book a class row (_id, class_name, term_id, year_level_id, teacher_id, classroom_id, period_id, day_of_week)"""
+        bit = self._bit(row.term_id, row.day_of_week, row.period_id)
+        mask = 1 << bit
+        for kind, column in RESOURCE_KINDS:
+            resource_id = getattr(row, column)
+            if resource_id is None:
+                continue
+            key = (row.term_id, kind, resource_id)
+            if self._bitmaps[key] & mask:
+                self._clashing.setdefault(key + (bit,), [self._holders[key + (bit,)]]).append(row)
+            else:
+                self._bitmaps[key] |= mask
+                self._holders[key + (bit,)] = row
+
+    def conflicts(self) -> List[dict]:
+        """Every double booking: one entry per resource and slot held by more than one class"""
+        slot_of = {
+            (term_id, bit): slot
+            for term_id, slots in self._slot_bits.items()
+            for slot, bit in slots.items()
+        }
+        conflicts = []
+        for key, rows in self._clashing.items():
+            term_id, kind, resource_id, bit = key
+            day_of_week, period_id = slot_of[(term_id, bit)]
+            conflicts.append({
+                'type': kind,
+                'resource_id': str(resource_id),
+                'term_id': str(term_id),
+                'day_of_week': day_of_week,
+                'period_id': str(period_id),
+                'classes': [
+                    {
+                        '_id': str(row._id),
+                        'class_name': row.class_name,
+                        'year_level_id': str(row.year_level_id)
+                    }
+                    for row in rows
+                ]
+            })
+        return conflicts
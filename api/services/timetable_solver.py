@@ -0,0 +1,327 @@
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+class TimetableSolver:
+    """Constraint search for a conflict-free term timetable.
+
+    A course is one subject taught to one year level for a number of weekly
+    hours, by one of its candidate teachers (None for an unstaffed course),
+    optionally in a classroom of a given type. Slots are the days x periods
+    grid, numbered day-major, so the occupancy of every year level, teacher
+    and classroom is an int bitmap and "where can this course go?" is a
+    handful of AND/NOT operations.
+
+    The search is depth-first with forward checking: it always extends the
+    course whose classroom type is most in demand (hours still to place
+    over the free slots of its rooms; more hours than free slots is a dead
+    end), then the one with the least slack (usable slots minus hours
+    still to place, counting at most ceil(hours / days) hours per day).
+    Scarce rooms are thus shared out before the year levels' timetables
+    fill up around them. It picks the course's teacher when placing its
+    first hour, and tries the slots on the days where the year level and
+    teacher are least busy first, which spreads each timetable over the
+    week and rarely needs to backtrack. Classrooms of a type are
+    interchangeable, so the first free one is taken without branching.
+
+    occupied lists (day, period_id, year_level_id, teacher_id, classroom_id)
+    of classes that stay in place; their slots are unavailable to the
+    resources involved.
+    """
+
+    def __init__(self, days: Sequence[int], period_ids: Sequence, courses: Sequence[dict],
+                 rooms_by_type: Dict[object, List], occupied: Iterable[Tuple] = (),
+                 time_limit_seconds: float = 5.0) -> None:
+        self.days = list(days)
+        self.period_ids = list(period_ids)
+        self.courses = list(courses)
+        self.rooms_by_type = rooms_by_type
+        self.time_limit_seconds = time_limit_seconds
+
+        periods = len(self.period_ids)
+        self._slot_count = len(self.days) * periods
+        self._all = (1 << self._slot_count) - 1
+        self._day_masks = [((1 << periods) - 1) << (d * periods) for d in range(len(self.days))]
+        self._slot_index = {
+            (day, period_id): d * periods + p
+            for d, day in enumerate(self.days)
+            for p, period_id in enumerate(self.period_ids)
+        }
+
+        self._year_level_bits: Dict[object, int] = defaultdict(int)
+        self._teacher_bits: Dict[object, int] = defaultdict(int)
+        self._room_bits: Dict[object, int] = defaultdict(int)
+        for day, period_id, year_level_id, teacher_id, classroom_id in occupied:
+            bit = self._slot_index.get((day, period_id))
+            if bit is None:
+                continue
+            mask = 1 << bit
+            if year_level_id is not None:
+                self._year_level_bits[year_level_id] |= mask
+            if teacher_id is not None:
+                self._teacher_bits[teacher_id] |= mask
+            if classroom_id is not None:
+                self._room_bits[classroom_id] |= mask
+
+        count = len(self.courses)
+        self._remaining = [course['hours'] for course in self.courses]
+        # Hours still to place per classroom type, against the free slots of its rooms
+        self._room_demand: Dict[object, int] = defaultdict(int)
+        for course in self.courses:
+            if course.get('room_type_id') is not None:
+                self._room_demand[course['room_type_id']] += course['hours']
+        self._cap = [max(1, math.ceil(course['hours'] / max(1, len(self.days)))) for course in self.courses]
+        self._day_counts = [[0] * len(self.days) for _ in range(count)]
+        self._teacher: List[Optional[object]] = [None] * count
+        # (course, bit, teacher, classroom) per placed hour
+        self._placements: List[Tuple[int, int, object, object]] = []
+        self._best: List[Tuple[int, int, object, object]] = []
+        self.nodes = 0
+        self._deadline = 0.0
+
+        # (slack, options) per course, recomputed only when a placement touches
+        # its year level, one of its teachers or its classroom type
+        self._evaluated: List[Optional[tuple]] = [None] * count
+        self._courses_by_year_level: Dict[object, List[int]] = defaultdict(list)
+        self._courses_by_teacher: Dict[object, List[int]] = defaultdict(list)
+        self._courses_by_room_type: Dict[object, List[int]] = defaultdict(list)
+        for c, course in enumerate(self.courses):
+            self._courses_by_year_level[course['year_level_id']].append(c)
+            for teacher in course['teacher_ids']:
+                if teacher is not None:
+                    self._courses_by_teacher[teacher].append(c)
+            if course.get('room_type_id') is not None:
+                self._courses_by_room_type[course['room_type_id']].append(c)
+
+    # ---------- Bitmaps ----------
+
+    def _free_room_mask(self, room_type) -> int:
+        free = 0
+        for room in self.rooms_by_type.get(room_type, ()):
+            free |= self._all & ~self._room_bits[room]
+        return free
+
+    def _options(self, c) -> List[Tuple[object, int]]:
+        """(teacher, mask of slots the course's next hour can take) per teacher still possible"""
+        course = self.courses[c]
+        base = self._all & ~self._year_level_bits[course['year_level_id']]
+        for d, placed in enumerate(self._day_counts[c]):
+            if placed >= self._cap[c]:
+                base &= ~self._day_masks[d]
+        if course.get('room_type_id') is not None:
+            base &= self._free_room_mask(course['room_type_id'])
+        if not base:
+            return []
+        teachers = [self._teacher[c]] if self._placed(c) else course['teacher_ids']
+        options = []
+        for teacher in teachers:
+            mask = base & ~self._teacher_bits[teacher] if teacher is not None else base
+            if mask:
+                options.append((teacher, mask))
+        return options
+
+    def _placed(self, c) -> bool:
+        return self._remaining[c] < self.courses[c]['hours']
+
+    # ---------- Search ----------
+
+    def _room_pressure(self) -> Optional[Dict[object, float]]:
+        """{room type: hours still to place / free slots of its rooms}; None when a type is overbooked"""
+        pressure = {}
+        for room_type, demand in self._room_demand.items():
+            if not demand:
+                continue
+            free = sum((self._all & ~self._room_bits[room]).bit_count() for room in self.rooms_by_type.get(room_type, ()))
+            if demand > free:
+                return None
+            pressure[room_type] = demand / free
+        return pressure
+
+    def _most_constrained(self):
+        """Course needing the scarcest classrooms, then with the least slack, and its options; (None, None) at a dead end"""
+        pressure = self._room_pressure()
+        if pressure is None:
+            return None, None
+        best = None
+        for c, remaining in enumerate(self._remaining):
+            if not remaining:
+                continue
+            if self._evaluated[c] is None:
+                options = self._options(c)
+                slack = max((self._capacity(c, mask) for _, mask in options), default=0) - remaining
+                self._evaluated[c] = (slack, options)
+            slack, options = self._evaluated[c]
+            if slack < 0:
+                return None, None
+            key = (-pressure.get(self.courses[c].get('room_type_id'), 0), slack, -remaining)
+            if best is None or key < best[0]:
+                best = (key, c, options)
+        return (best[1], best[2]) if best else (None, None)
+
+    def _capacity(self, c, mask) -> int:
+        """Hours the course can still place in mask, given its per-day cap"""
+        capacity = 0
+        for d, day_mask in enumerate(self._day_masks):
+            left = self._cap[c] - self._day_counts[c][d]
+            if left > 0:
+                capacity += min(left, (mask & day_mask).bit_count())
+        return capacity
+
+    def _touch(self, c, teacher, room) -> None:
+        course = self.courses[c]
+        stale = [c]
+        stale += self._courses_by_year_level[course['year_level_id']]
+        if teacher is not None:
+            stale += self._courses_by_teacher[teacher]
+        if room is not None:
+            stale += self._courses_by_room_type[course['room_type_id']]
+        for other in stale:
+            self._evaluated[other] = None
+
+    def _place(self, c, bit, teacher, room) -> None:
+        course = self.courses[c]
+        mask = 1 << bit
+        self._year_level_bits[course['year_level_id']] |= mask
+        if teacher is not None:
+            self._teacher_bits[teacher] |= mask
+        if room is not None:
+            self._room_bits[room] |= mask
+        self._teacher[c] = teacher
+        self._remaining[c] -= 1
+        if course.get('room_type_id') is not None:
+            self._room_demand[course['room_type_id']] -= 1
+        self._day_counts[c][bit // len(self.period_ids)] += 1
+        self._placements.append((c, bit, teacher, room))
+        self._touch(c, teacher, room)
+        if len(self._placements) > len(self._best):
+            self._best = list(self._placements)
+
+    def _unplace(self) -> None:
+        c, bit, teacher, room = self._placements.pop()
+        course = self.courses[c]
+        mask = ~(1 << bit)
+        self._year_level_bits[course['year_level_id']] &= mask
+        if teacher is not None:
+            self._teacher_bits[teacher] &= mask
+        if room is not None:
+            self._room_bits[room] &= mask
+        self._remaining[c] += 1
+        if course.get('room_type_id') is not None:
+            self._room_demand[course['room_type_id']] += 1
+        self._day_counts[c][bit // len(self.period_ids)] -= 1
+        if not self._placed(c):
+            self._teacher[c] = None
+        self._touch(c, teacher, room)
+
+    def _free_room(self, c, bit):
+        room_type = self.courses[c].get('room_type_id')
+        if room_type is None:
+            return None
+        for room in self.rooms_by_type.get(room_type, ()):
+            if not self._room_bits[room] >> bit & 1:
+                return room
+        return None
+
+    def _candidates(self, c, options):
+        """(teacher, bit) choices for the course's next hour, least busy days and teachers first"""
+        year_level_bits = self._year_level_bits[self.courses[c]['year_level_id']]
+        periods = len(self.period_ids)
+        candidates = []
+        for teacher, mask in options:
+            teacher_bits = self._teacher_bits[teacher] if teacher is not None else 0
+            day_load = [
+                ((year_level_bits & day_mask).bit_count(), (teacher_bits & day_mask).bit_count())
+                for day_mask in self._day_masks
+            ]
+            teacher_load = teacher_bits.bit_count()
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                bit = low.bit_length() - 1
+                candidates.append((teacher_load, day_load[bit // periods], bit % periods, teacher, bit))
+        candidates.sort(key=lambda candidate: candidate[:3])
+        for _, _, _, teacher, bit in candidates:
+            yield teacher, bit
+
+    def _search(self, left) -> bool:
+        """Iterative depth-first search (a school's hours would exceed the recursion limit)"""
+        # One frame per decision: (course, iterator over its remaining candidates);
+        # every frame below the top has its current candidate placed
+        stack = []
+        while True:
+            if not left:
+                return True
+            self.nodes += 1
+            if time.monotonic() > self._deadline:
+                raise SolverTimeout()
+            c, options = self._most_constrained()
+            if c is not None:
+                stack.append((c, self._candidates(c, options)))
+            elif stack:
+                # Dead end: undo the choice that led here
+                self._unplace()
+                left += 1
+
+            while True:
+                if not stack:
+                    return False
+                c, candidates = stack[-1]
+                candidate = next(candidates, None)
+                if candidate is not None:
+                    teacher, bit = candidate
+                    self._place(c, bit, teacher, self._free_room(c, bit))
+                    left -= 1
+                    break
+                # Exhausted: drop the frame and undo the parent's choice
+                stack.pop()
+                if stack:
+                    self._unplace()
+                    left += 1
+
+    def solve(self) -> bool:
+        """Search for a complete timetable; False when none exists or the time limit ran out"""
+        if not self._slot_count:
+            return not any(self._remaining)
+        self._deadline = time.monotonic() + self.time_limit_seconds
+        try:
+            return self._search(sum(self._remaining))
+        except SolverTimeout:
+            return False
+
+    # ---------- Results ----------
+
+    def _slot(self, bit) -> Tuple[int, object]:
+        periods = len(self.period_ids)
+        return self.days[bit // periods], self.period_ids[bit % periods]
+
+    def placements(self, complete: bool = True) -> List[dict]:
+        """Placed hours of the solution (or of the deepest partial one when complete is False)"""
+        placed = self._placements if complete else self._best
+        result = []
+        for c, bit, teacher, room in placed:
+            day, period_id = self._slot(bit)
+            result.append({
+                'course': self.courses[c],
+                'day_of_week': day,
+                'period_id': period_id,
+                'teacher_id': teacher,
+                'classroom_id': room
+            })
+        return result
+
+    def unplaced(self) -> List[dict]:
+        """Courses with hours missing from the deepest partial timetable"""
+        placed = defaultdict(int)
+        for c, _, _, _ in self._best:
+            placed[c] += 1
+        return [
+            {'course': course, 'hours_unplaced': course['hours'] - placed[c]}
+            for c, course in enumerate(self.courses)
+            if placed[c] < course['hours']
+        ]
@@ -36,6 +36,16 @@ BEGIN
         END
     );
 
+    -- Reference tables are cached in every API worker: bump the version and
+    -- notify listeners (delivered on commit) so the caches drop stale rows
+    IF TG_TABLE_NAME IN ('term', 'school_year', 'period', 'subject', 'year_level', 'assessment_type', 'classroom') THEN
+        INSERT INTO reference_data_version(table_name, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, now())
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = reference_data_version.version + 1, updated_at = now();
+        PERFORM pg_notify('reference_data_changed', TG_TABLE_NAME);
+    END IF;
+
     RETURN NULL;  -- AFTER trigger, nothing to modify
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,18 @@
+-- ============================================================
+-- Columns previously added by ad-hoc ALTERs at API import time
+-- ============================================================
+
+-- Resource: optional year level, and uploaded_by nullable for admin uploads
+ALTER TABLE resource ADD COLUMN IF NOT EXISTS year_level_id UUID REFERENCES year_level(_id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS idx_resource_year_level_id ON resource(year_level_id);
+ALTER TABLE resource ALTER COLUMN uploaded_by DROP NOT NULL;
+
+-- Student: track if student is still enrolled
+ALTER TABLE student ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- Teacher: base salary
+ALTER TABLE professor ADD COLUMN IF NOT EXISTS base_salary NUMERIC(10, 2);
+
+-- Student year grade: running sums for incremental updates
+ALTER TABLE student_year_grade ADD COLUMN IF NOT EXISTS percentage_total NUMERIC(12, 4);
+ALTER TABLE student_year_grade ADD COLUMN IF NOT EXISTS graded_count INTEGER;
@@ -0,0 +1,52 @@
+-- ============================================================
+-- Natural-key uniqueness (required by the INSERT ... ON CONFLICT upserts)
+-- Duplicates are removed first, keeping the most recently updated row
+-- ============================================================
+
+-- One grade per student per assignment
+DELETE FROM student_assignment t USING (
+    SELECT _id, row_number() OVER (
+        PARTITION BY student_id, assignment_id
+        ORDER BY updated_date DESC NULLS LAST, created_date DESC NULLS LAST
+    ) AS rn
+    FROM student_assignment
+) d
+WHERE t._id = d._id AND d.rn > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_assignment_student_assignment
+    ON student_assignment(student_id, assignment_id);
+
+-- One attendance record per student per class per day
+DELETE FROM attendance t USING (
+    SELECT _id, row_number() OVER (
+        PARTITION BY student_id, class_id, date
+        ORDER BY updated_date DESC NULLS LAST, created_date DESC NULLS LAST
+    ) AS rn
+    FROM attendance
+) d
+WHERE t._id = d._id AND d.rn > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_student_class_date
+    ON attendance(student_id, class_id, date);
+
+-- One term grade per student per subject per term
+DELETE FROM term_grade t USING (
+    SELECT _id, row_number() OVER (
+        PARTITION BY student_id, subject_id, term_id
+        ORDER BY updated_date DESC NULLS LAST, created_date DESC NULLS LAST
+    ) AS rn
+    FROM term_grade
+) d
+WHERE t._id = d._id AND d.rn > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_term_grade_student_subject_term
+    ON term_grade(student_id, subject_id, term_id);
+
+-- One enrollment per student per class
+DELETE FROM student_class t USING (
+    SELECT _id, row_number() OVER (
+        PARTITION BY student_id, class_id
+        ORDER BY _id
+    ) AS rn
+    FROM student_class
+) d
+WHERE t._id = d._id AND d.rn > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_class_student_class
+    ON student_class(student_id, class_id);
@@ -0,0 +1,16 @@
+-- ============================================================
+-- Secondary indexes for the hottest filters
+-- (student_id-leading lookups are covered by the unique keys in 0002)
+-- ============================================================
+
+-- Class rosters and per-class grade/attendance views
+CREATE INDEX IF NOT EXISTS idx_student_class_class_id ON student_class(class_id);
+CREATE INDEX IF NOT EXISTS idx_student_assignment_assignment_id ON student_assignment(assignment_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_class_date ON attendance(class_id, date);
+
+-- Timetables and teacher schedules
+CREATE INDEX IF NOT EXISTS idx_class_year_level_id ON class(year_level_id);
+CREATE INDEX IF NOT EXISTS idx_class_teacher_term ON class(teacher_id, term_id);
+
+-- Assignment listings and gradebooks
+CREATE INDEX IF NOT EXISTS idx_assignment_class_term ON assignment(class_id, term_id);
@@ -0,0 +1,15 @@
+-- ============================================================
+-- Per-table version counters for the API's reference-data cache.
+-- fn_audit_trigger (sql/audit_setup.sql) bumps a row and sends
+-- pg_notify('reference_data_changed', <table>) on every write.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS reference_data_version (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+INSERT INTO reference_data_version (table_name)
+VALUES ('term'), ('school_year'), ('period'), ('subject'), ('year_level'), ('assessment_type'), ('classroom')
+ON CONFLICT (table_name) DO NOTHING;
@@ -0,0 +1,124 @@
+-- ============================================================
+-- Per (student, subject, term) attendance counts, kept current by a
+-- trigger on attendance so ratio reads never scan raw attendance rows.
+-- Term comes from the attendance row's class; subject from the row,
+-- falling back to the class subject.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS attendance_rollup (
+    student_id UUID NOT NULL,
+    subject_id UUID NOT NULL,
+    term_id UUID NOT NULL,
+    present_count INTEGER NOT NULL DEFAULT 0,
+    absent_count INTEGER NOT NULL DEFAULT 0,
+    late_count INTEGER NOT NULL DEFAULT 0,
+    excused_count INTEGER NOT NULL DEFAULT 0,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (student_id, subject_id, term_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_attendance_rollup_term_subject ON attendance_rollup(term_id, subject_id);
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one attendance row from the rollup
+CREATE OR REPLACE FUNCTION attendance_rollup_apply(p_student UUID, p_subject UUID, p_class UUID, p_status VARCHAR, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_subject UUID;
+    v_term UUID;
+BEGIN
+    SELECT COALESCE(p_subject, c.subject_id), c.term_id INTO v_subject, v_term
+    FROM class c WHERE c._id = p_class;
+
+    IF v_subject IS NULL OR v_term IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO attendance_rollup AS r (
+        student_id, subject_id, term_id,
+        present_count, absent_count, late_count, excused_count, total_count, updated_at
+    )
+    VALUES (
+        p_student, v_subject, v_term,
+        CASE WHEN p_status = 'present' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'absent' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'late' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'excused' THEN p_sign ELSE 0 END,
+        p_sign,
+        now()
+    )
+    ON CONFLICT (student_id, subject_id, term_id) DO UPDATE SET
+        present_count = r.present_count + EXCLUDED.present_count,
+        absent_count = r.absent_count + EXCLUDED.absent_count,
+        late_count = r.late_count + EXCLUDED.late_count,
+        excused_count = r.excused_count + EXCLUDED.excused_count,
+        total_count = r.total_count + EXCLUDED.total_count,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_attendance_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Re-submitted rosters rewrite rows without changing anything counted
+    IF TG_OP = 'UPDATE'
+        AND OLD.student_id = NEW.student_id
+        AND OLD.class_id = NEW.class_id
+        AND OLD.subject_id IS NOT DISTINCT FROM NEW.subject_id
+        AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM attendance_rollup_apply(OLD.student_id, OLD.subject_id, OLD.class_id, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM attendance_rollup_apply(NEW.student_id, NEW.subject_id, NEW.class_id, NEW.status, 1);
+    END IF;
+
+    RETURN NULL;  -- AFTER trigger, nothing to modify
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the rollup from raw attendance (all terms, or one term); returns rows written
+CREATE OR REPLACE FUNCTION rebuild_attendance_rollup(p_term UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    -- Block attendance writes so no trigger delta lands between delete and insert
+    LOCK TABLE attendance IN SHARE MODE;
+
+    DELETE FROM attendance_rollup WHERE p_term IS NULL OR term_id = p_term;
+
+    INSERT INTO attendance_rollup (
+        student_id, subject_id, term_id,
+        present_count, absent_count, late_count, excused_count, total_count, updated_at
+    )
+    SELECT
+        a.student_id,
+        COALESCE(a.subject_id, c.subject_id),
+        c.term_id,
+        count(*) FILTER (WHERE a.status = 'present'),
+        count(*) FILTER (WHERE a.status = 'absent'),
+        count(*) FILTER (WHERE a.status = 'late'),
+        count(*) FILTER (WHERE a.status = 'excused'),
+        count(*),
+        now()
+    FROM attendance a
+    JOIN class c ON c._id = a.class_id
+    WHERE COALESCE(a.subject_id, c.subject_id) IS NOT NULL
+      AND (p_term IS NULL OR c.term_id = p_term)
+    GROUP BY a.student_id, COALESCE(a.subject_id, c.subject_id), c.term_id;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_attendance_rollup();
+
+DROP TRIGGER IF EXISTS trg_attendance_rollup ON attendance;
+CREATE TRIGGER trg_attendance_rollup
+AFTER INSERT OR UPDATE OR DELETE ON attendance
+FOR EACH ROW EXECUTE FUNCTION fn_attendance_rollup();
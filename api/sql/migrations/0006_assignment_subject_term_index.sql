@@ -0,0 +1,6 @@
+-- ============================================================
+-- Per-student metrics join each student's subject/term pairs to
+-- the published assignments of that subject and term
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_assignment_subject_term ON assignment(subject_id, term_id);
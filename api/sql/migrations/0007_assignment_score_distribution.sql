@@ -0,0 +1,157 @@
+-- ============================================================
+-- Per-assignment snapshot of graded score percentages
+-- (score / max_score * 100): count, mean, min/max, percentiles,
+-- a 10-bucket histogram (0-10, ..., 90-100) and the sorted scores.
+-- Kept current by statement-level triggers on student_assignment
+-- and assignment, so dashboards read one row per assignment
+-- instead of every student's grade.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS assignment_score_distribution (
+    assignment_id UUID PRIMARY KEY REFERENCES assignment(_id) ON DELETE CASCADE,
+    class_id UUID NOT NULL,
+    graded_count INTEGER NOT NULL,
+    mean_score DOUBLE PRECISION NOT NULL,
+    min_score DOUBLE PRECISION NOT NULL,
+    max_score DOUBLE PRECISION NOT NULL,
+    p25_score DOUBLE PRECISION NOT NULL,
+    median_score DOUBLE PRECISION NOT NULL,
+    p75_score DOUBLE PRECISION NOT NULL,
+    p90_score DOUBLE PRECISION NOT NULL,
+    histogram INTEGER[] NOT NULL,
+    scores DOUBLE PRECISION[] NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_assignment_score_distribution_class ON assignment_score_distribution(class_id);
+
+-- Recompute the snapshot of the given assignments (all assignments when NULL); returns rows written
+CREATE OR REPLACE FUNCTION refresh_assignment_score_distribution(p_assignment_ids UUID[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    WITH graded AS (
+        SELECT a._id AS assignment_id, a.class_id,
+               CAST(sa.score * 100 / a.max_score AS DOUBLE PRECISION) AS pct
+        FROM assignment a
+        JOIN student_assignment sa ON sa.assignment_id = a._id
+        WHERE (p_assignment_ids IS NULL OR a._id = ANY(p_assignment_ids))
+          AND sa.status = 'graded'
+          AND sa.score IS NOT NULL
+          AND a.max_score <> 0
+    ),
+    buckets AS (
+        SELECT assignment_id, array_agg(n ORDER BY bucket) AS histogram
+        FROM (
+            SELECT ids.assignment_id, b.bucket, count(g.pct) AS n
+            FROM (SELECT DISTINCT assignment_id FROM graded) ids
+            CROSS JOIN generate_series(1, 10) AS b(bucket)
+            LEFT JOIN graded g
+                ON g.assignment_id = ids.assignment_id
+               AND LEAST(GREATEST(width_bucket(g.pct, 0, 100, 10), 1), 10) = b.bucket
+            GROUP BY ids.assignment_id, b.bucket
+        ) counted
+        GROUP BY assignment_id
+    )
+    INSERT INTO assignment_score_distribution AS d (
+        assignment_id, class_id, graded_count, mean_score, min_score, max_score,
+        p25_score, median_score, p75_score, p90_score, histogram, scores, updated_at
+    )
+    SELECT g.assignment_id, g.class_id, count(*), avg(g.pct), min(g.pct), max(g.pct),
+           percentile_cont(0.25) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.75) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.9) WITHIN GROUP (ORDER BY g.pct),
+           b.histogram,
+           array_agg(g.pct ORDER BY g.pct),
+           now()
+    FROM graded g
+    JOIN buckets b ON b.assignment_id = g.assignment_id
+    GROUP BY g.assignment_id, g.class_id, b.histogram
+    ON CONFLICT (assignment_id) DO UPDATE SET
+        class_id = EXCLUDED.class_id,
+        graded_count = EXCLUDED.graded_count,
+        mean_score = EXCLUDED.mean_score,
+        min_score = EXCLUDED.min_score,
+        max_score = EXCLUDED.max_score,
+        p25_score = EXCLUDED.p25_score,
+        median_score = EXCLUDED.median_score,
+        p75_score = EXCLUDED.p75_score,
+        p90_score = EXCLUDED.p90_score,
+        histogram = EXCLUDED.histogram,
+        scores = EXCLUDED.scores,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+
+    -- Assignments left without graded scores have no distribution
+    DELETE FROM assignment_score_distribution d
+    WHERE (p_assignment_ids IS NULL OR d.assignment_id = ANY(p_assignment_ids))
+      AND NOT EXISTS (
+          SELECT 1 FROM student_assignment sa
+          JOIN assignment a ON a._id = sa.assignment_id
+          WHERE sa.assignment_id = d.assignment_id
+            AND sa.status = 'graded'
+            AND sa.score IS NOT NULL
+            AND a.max_score <> 0
+      );
+
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level: one refresh per affected assignment, however many grades a statement writes.
+-- Transition tables allow a single event per trigger, hence one trigger per operation.
+CREATE OR REPLACE FUNCTION fn_student_assignment_distribution()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_assignment_score_distribution(ARRAY(SELECT DISTINCT assignment_id FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_assignment_score_distribution(ARRAY(
+            SELECT assignment_id FROM new_rows UNION SELECT assignment_id FROM old_rows
+        ));
+    ELSE
+        PERFORM refresh_assignment_score_distribution(ARRAY(SELECT DISTINCT assignment_id FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_assignment_distribution()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Only a new max_score or class changes the snapshot
+    PERFORM refresh_assignment_score_distribution(ARRAY(
+        SELECT n._id FROM new_rows n JOIN old_rows o ON o._id = n._id
+        WHERE n.max_score IS DISTINCT FROM o.max_score OR n.class_id IS DISTINCT FROM o.class_id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_assignment_score_distribution();
+
+DROP TRIGGER IF EXISTS trg_student_assignment_distribution_insert ON student_assignment;
+CREATE TRIGGER trg_student_assignment_distribution_insert
+AFTER INSERT ON student_assignment
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_student_assignment_distribution();
+
+DROP TRIGGER IF EXISTS trg_student_assignment_distribution_update ON student_assignment;
+CREATE TRIGGER trg_student_assignment_distribution_update
+AFTER UPDATE ON student_assignment
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_student_assignment_distribution();
+
+DROP TRIGGER IF EXISTS trg_student_assignment_distribution_delete ON student_assignment;
+CREATE TRIGGER trg_student_assignment_distribution_delete
+AFTER DELETE ON student_assignment
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_student_assignment_distribution();
+
+DROP TRIGGER IF EXISTS trg_assignment_distribution_update ON assignment;
+CREATE TRIGGER trg_assignment_distribution_update
+AFTER UPDATE ON assignment
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_assignment_distribution();
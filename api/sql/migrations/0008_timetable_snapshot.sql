@@ -0,0 +1,91 @@
+-- ============================================================
+-- Materialized timetable grid per (year level, term), served by
+-- /class/timetable. ClassModelResource rebuilds the grids its
+-- writes touch; the triggers below drop grids whose classes,
+-- subjects, teachers, periods or classrooms change through any
+-- other path, so the next read rebuilds them.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS timetable_snapshot (
+    year_level_id UUID NOT NULL REFERENCES year_level(_id) ON DELETE CASCADE,
+    term_id UUID NOT NULL REFERENCES term(_id) ON DELETE CASCADE,
+    timetable JSONB NOT NULL,
+    built_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (year_level_id, term_id)
+);
+
+-- Statement-level: one DELETE per statement, however many classes it writes.
+-- Transition tables allow a single event per trigger, hence one trigger per operation.
+CREATE OR REPLACE FUNCTION fn_class_timetable_snapshot()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        DELETE FROM timetable_snapshot s
+        USING (SELECT DISTINCT year_level_id, term_id FROM new_rows) n
+        WHERE s.year_level_id = n.year_level_id AND s.term_id = n.term_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM timetable_snapshot s
+        USING (SELECT DISTINCT year_level_id, term_id FROM old_rows) o
+        WHERE s.year_level_id = o.year_level_id AND s.term_id = o.term_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reference rows can only be updated while classes point at them (the class
+-- foreign keys block deletes). TG_ARGV[0] names the class column holding their id.
+CREATE OR REPLACE FUNCTION fn_timetable_reference_snapshot()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format(
+        'DELETE FROM timetable_snapshot s USING class c '
+        'WHERE c.%I IN (SELECT n._id FROM new_rows n JOIN old_rows o ON o._id = n._id WHERE n IS DISTINCT FROM o) '
+        'AND s.year_level_id = c.year_level_id AND s.term_id = c.term_id',
+        TG_ARGV[0]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_class_timetable_snapshot_insert ON class;
+CREATE TRIGGER trg_class_timetable_snapshot_insert
+AFTER INSERT ON class
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_class_timetable_snapshot();
+
+DROP TRIGGER IF EXISTS trg_class_timetable_snapshot_update ON class;
+CREATE TRIGGER trg_class_timetable_snapshot_update
+AFTER UPDATE ON class
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_class_timetable_snapshot();
+
+DROP TRIGGER IF EXISTS trg_class_timetable_snapshot_delete ON class;
+CREATE TRIGGER trg_class_timetable_snapshot_delete
+AFTER DELETE ON class
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_class_timetable_snapshot();
+
+DROP TRIGGER IF EXISTS trg_subject_timetable_snapshot ON subject;
+CREATE TRIGGER trg_subject_timetable_snapshot
+AFTER UPDATE ON subject
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_timetable_reference_snapshot('subject_id');
+
+DROP TRIGGER IF EXISTS trg_professor_timetable_snapshot ON professor;
+CREATE TRIGGER trg_professor_timetable_snapshot
+AFTER UPDATE ON professor
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_timetable_reference_snapshot('teacher_id');
+
+DROP TRIGGER IF EXISTS trg_period_timetable_snapshot ON period;
+CREATE TRIGGER trg_period_timetable_snapshot
+AFTER UPDATE ON period
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_timetable_reference_snapshot('period_id');
+
+DROP TRIGGER IF EXISTS trg_classroom_timetable_snapshot ON classroom;
+CREATE TRIGGER trg_classroom_timetable_snapshot
+AFTER UPDATE ON classroom
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION fn_timetable_reference_snapshot('classroom_id');
@@ -0,0 +1,6 @@
+-- ============================================================
+-- Student schedules list every class sharing a name with one the
+-- student is enrolled in (the class group across terms)
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_class_class_name ON class(class_name);
@@ -0,0 +1,26 @@
+-- ============================================================
+-- One cached year grade per student per subject per school year,
+-- so StudentYearGradeModel.apply_deltas can add to the running
+-- sums with INSERT ... ON CONFLICT instead of read-modify-write
+-- ============================================================
+
+-- Students with duplicate rows keep the most recent one, with its sums
+-- reset to "never initialized" so the next grade save rebuilds it
+WITH ranked AS (
+    SELECT _id, row_number() OVER (
+        PARTITION BY student_id, subject_id, year_id
+        ORDER BY last_updated DESC NULLS LAST, _id
+    ) AS rn,
+    count(*) OVER (PARTITION BY student_id, subject_id, year_id) AS copies
+    FROM student_year_grade
+),
+removed AS (
+    DELETE FROM student_year_grade t USING ranked d
+    WHERE t._id = d._id AND d.rn > 1
+)
+UPDATE student_year_grade t SET percentage_total = NULL, graded_count = NULL
+FROM ranked d
+WHERE t._id = d._id AND d.rn = 1 AND d.copies > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_student_year_grade_student_subject_year
+    ON student_year_grade(student_id, subject_id, year_id);
@@ -0,0 +1,93 @@
+-- ============================================================
+-- Serialize assignment score distribution refreshes per assignment.
+-- Two sessions grading the same assignment each recomputed the
+-- snapshot without the other's uncommitted grade, and the last
+-- commit won; with the lock the second refresh waits and sees both.
+-- ============================================================
+
+-- Recompute the snapshot of the given assignments (all assignments when NULL); returns rows written
+CREATE OR REPLACE FUNCTION refresh_assignment_score_distribution(p_assignment_ids UUID[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    -- Concurrent refreshes of an assignment run one after the other: each
+    -- statement below takes a new snapshot, so the one that waited sees the
+    -- grades committed by the other. Single-assignment refreshes share the
+    -- global lock that a full refresh takes exclusively.
+    IF p_assignment_ids IS NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext('assignment_score_distribution'));
+    ELSE
+        PERFORM pg_advisory_xact_lock_shared(hashtext('assignment_score_distribution'));
+        PERFORM pg_advisory_xact_lock(hashtext('assignment_score_distribution'), hashtext(ids.assignment_id::text))
+        FROM (SELECT DISTINCT unnest(p_assignment_ids) AS assignment_id ORDER BY 1) ids;
+    END IF;
+
+    WITH graded AS (
+        SELECT a._id AS assignment_id, a.class_id,
+               CAST(sa.score * 100 / a.max_score AS DOUBLE PRECISION) AS pct
+        FROM assignment a
+        JOIN student_assignment sa ON sa.assignment_id = a._id
+        WHERE (p_assignment_ids IS NULL OR a._id = ANY(p_assignment_ids))
+          AND sa.status = 'graded'
+          AND sa.score IS NOT NULL
+          AND a.max_score <> 0
+    ),
+    buckets AS (
+        SELECT assignment_id, array_agg(n ORDER BY bucket) AS histogram
+        FROM (
+            SELECT ids.assignment_id, b.bucket, count(g.pct) AS n
+            FROM (SELECT DISTINCT assignment_id FROM graded) ids
+            CROSS JOIN generate_series(1, 10) AS b(bucket)
+            LEFT JOIN graded g
+                ON g.assignment_id = ids.assignment_id
+               AND LEAST(GREATEST(width_bucket(g.pct, 0, 100, 10), 1), 10) = b.bucket
+            GROUP BY ids.assignment_id, b.bucket
+        ) counted
+        GROUP BY assignment_id
+    )
+    INSERT INTO assignment_score_distribution AS d (
+        assignment_id, class_id, graded_count, mean_score, min_score, max_score,
+        p25_score, median_score, p75_score, p90_score, histogram, scores, updated_at
+    )
+    SELECT g.assignment_id, g.class_id, count(*), avg(g.pct), min(g.pct), max(g.pct),
+           percentile_cont(0.25) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.75) WITHIN GROUP (ORDER BY g.pct),
+           percentile_cont(0.9) WITHIN GROUP (ORDER BY g.pct),
+           b.histogram,
+           array_agg(g.pct ORDER BY g.pct),
+           now()
+    FROM graded g
+    JOIN buckets b ON b.assignment_id = g.assignment_id
+    GROUP BY g.assignment_id, g.class_id, b.histogram
+    ON CONFLICT (assignment_id) DO UPDATE SET
+        class_id = EXCLUDED.class_id,
+        graded_count = EXCLUDED.graded_count,
+        mean_score = EXCLUDED.mean_score,
+        min_score = EXCLUDED.min_score,
+        max_score = EXCLUDED.max_score,
+        p25_score = EXCLUDED.p25_score,
+        median_score = EXCLUDED.median_score,
+        p75_score = EXCLUDED.p75_score,
+        p90_score = EXCLUDED.p90_score,
+        histogram = EXCLUDED.histogram,
+        scores = EXCLUDED.scores,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+
+    -- Assignments left without graded scores have no distribution
+    DELETE FROM assignment_score_distribution d
+    WHERE (p_assignment_ids IS NULL OR d.assignment_id = ANY(p_assignment_ids))
+      AND NOT EXISTS (
+          SELECT 1 FROM student_assignment sa
+          JOIN assignment a ON a._id = sa.assignment_id
+          WHERE sa.assignment_id = d.assignment_id
+            AND sa.status = 'graded'
+            AND sa.score IS NOT NULL
+            AND a.max_score <> 0
+      );
+
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,98 @@
+-- ============================================================
+-- Keep attendance_rollup right when a class moves to another
+-- term or subject: its attendance counts move from the old
+-- (subject, term) pairs to the new ones.
+-- ============================================================
+
+-- The class row is read FOR SHARE, so an attendance write waits for an
+-- uncommitted class move (and a class move waits for uncommitted
+-- attendance) instead of counting under a pair that is being left
+CREATE OR REPLACE FUNCTION attendance_rollup_apply(p_student UUID, p_subject UUID, p_class UUID, p_status VARCHAR, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_subject UUID;
+    v_term UUID;
+BEGIN
+    SELECT COALESCE(p_subject, c.subject_id), c.term_id INTO v_subject, v_term
+    FROM class c WHERE c._id = p_class
+    FOR SHARE;
+
+    IF v_subject IS NULL OR v_term IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO attendance_rollup AS r (
+        student_id, subject_id, term_id,
+        present_count, absent_count, late_count, excused_count, total_count, updated_at
+    )
+    VALUES (
+        p_student, v_subject, v_term,
+        CASE WHEN p_status = 'present' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'absent' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'late' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'excused' THEN p_sign ELSE 0 END,
+        p_sign,
+        now()
+    )
+    ON CONFLICT (student_id, subject_id, term_id) DO UPDATE SET
+        present_count = r.present_count + EXCLUDED.present_count,
+        absent_count = r.absent_count + EXCLUDED.absent_count,
+        late_count = r.late_count + EXCLUDED.late_count,
+        excused_count = r.excused_count + EXCLUDED.excused_count,
+        total_count = r.total_count + EXCLUDED.total_count,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) every attendance row of a class,
+-- counted under p_subject (unless the row has its own) and p_term
+CREATE OR REPLACE FUNCTION attendance_rollup_apply_class(p_class UUID, p_subject UUID, p_term UUID, p_sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p_term IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO attendance_rollup AS r (
+        student_id, subject_id, term_id,
+        present_count, absent_count, late_count, excused_count, total_count, updated_at
+    )
+    SELECT
+        a.student_id,
+        COALESCE(a.subject_id, p_subject),
+        p_term,
+        p_sign * count(*) FILTER (WHERE a.status = 'present'),
+        p_sign * count(*) FILTER (WHERE a.status = 'absent'),
+        p_sign * count(*) FILTER (WHERE a.status = 'late'),
+        p_sign * count(*) FILTER (WHERE a.status = 'excused'),
+        p_sign * count(*),
+        now()
+    FROM attendance a
+    WHERE a.class_id = p_class
+      AND COALESCE(a.subject_id, p_subject) IS NOT NULL
+    GROUP BY a.student_id, COALESCE(a.subject_id, p_subject)
+    ON CONFLICT (student_id, subject_id, term_id) DO UPDATE SET
+        present_count = r.present_count + EXCLUDED.present_count,
+        absent_count = r.absent_count + EXCLUDED.absent_count,
+        late_count = r.late_count + EXCLUDED.late_count,
+        excused_count = r.excused_count + EXCLUDED.excused_count,
+        total_count = r.total_count + EXCLUDED.total_count,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_class_attendance_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM attendance_rollup_apply_class(OLD._id, OLD.subject_id, OLD.term_id, -1);
+    PERFORM attendance_rollup_apply_class(NEW._id, NEW.subject_id, NEW.term_id, 1);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_class_attendance_rollup ON class;
+CREATE TRIGGER trg_class_attendance_rollup
+AFTER UPDATE OF term_id, subject_id ON class
+FOR EACH ROW
+WHEN (OLD.term_id IS DISTINCT FROM NEW.term_id OR OLD.subject_id IS DISTINCT FROM NEW.subject_id)
+EXECUTE FUNCTION fn_class_attendance_rollup();
@@ -0,0 +1,6 @@
+-- ============================================================
+-- Class POST/PUT check the term's (day, period) slot for another
+-- class with the same year level, teacher or classroom
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_class_term_day_period ON class(term_id, day_of_week, period_id);
@@ -0,0 +1,66 @@
+-- ============================================================
+-- Serialize timetable grid builds with the writes that drop them.
+-- A grid built on first read from rows read before a subject,
+-- teacher, period, classroom or class change committed was stored
+-- after the change's trigger had found nothing to delete, and the
+-- stale grid stayed. Builds (TimetableSnapshotModel._lock) and the
+-- triggers below now take the same per-(year level, term) lock:
+-- a trigger waits for a running build and deletes what it stored,
+-- and a build that waited reads the committed change.
+-- ============================================================
+
+-- Keys are year_level_id || term_id, locked in "C" collation order like
+-- the Python side sorts them, so two lockers never deadlock
+CREATE OR REPLACE FUNCTION lock_timetable_snapshots(p_keys TEXT[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('timetable_snapshot'), hashtext(k.key))
+    FROM (SELECT DISTINCT key COLLATE "C" AS key FROM unnest(p_keys) AS u(key) WHERE key IS NOT NULL ORDER BY 1) k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_class_timetable_snapshot()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM lock_timetable_snapshots(ARRAY(SELECT year_level_id::text || term_id::text FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM lock_timetable_snapshots(ARRAY(SELECT year_level_id::text || term_id::text FROM old_rows));
+    ELSE
+        PERFORM lock_timetable_snapshots(ARRAY(
+            SELECT year_level_id::text || term_id::text FROM new_rows
+            UNION SELECT year_level_id::text || term_id::text FROM old_rows
+        ));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        DELETE FROM timetable_snapshot s
+        USING (SELECT DISTINCT year_level_id, term_id FROM new_rows) n
+        WHERE s.year_level_id = n.year_level_id AND s.term_id = n.term_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM timetable_snapshot s
+        USING (SELECT DISTINCT year_level_id, term_id FROM old_rows) o
+        WHERE s.year_level_id = o.year_level_id AND s.term_id = o.term_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_timetable_reference_snapshot()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format(
+        'SELECT lock_timetable_snapshots(ARRAY('
+        'SELECT c.year_level_id::text || c.term_id::text FROM class c '
+        'WHERE c.%I IN (SELECT n._id FROM new_rows n JOIN old_rows o ON o._id = n._id WHERE n IS DISTINCT FROM o)))',
+        TG_ARGV[0]
+    );
+    EXECUTE format(
+        'DELETE FROM timetable_snapshot s USING class c '
+        'WHERE c.%I IN (SELECT n._id FROM new_rows n JOIN old_rows o ON o._id = n._id WHERE n IS DISTINCT FROM o) '
+        'AND s.year_level_id = c.year_level_id AND s.term_id = c.term_id',
+        TG_ARGV[0]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,174 @@
+import json
+import time
+import uuid
+
+from utils.jwt_auth import jwt_auth
+
+
+class SchoolSetup:
+    """
+    Creates, through the API, one class with everything it references
+    (department, subject, teacher, school year, term, period, year level,
+    classroom) plus students enrolled in it and assignments for it, and
+    deletes them again in reverse order. Each create_* returns the new
+    _id, or None when the API refused it.
+    """
+
+    def __init__(self, client, api_key):
+        self.client = client
+        self.headers = {"Authorization": api_key}
+        self.created = []  # (route, _id), in creation order
+        self.teacher = None
+        self.students = []
+
+    @staticmethod
+    def bearer(role, username):
+        """Authorization headers of a JWT for username with role (API_KEY sets no username)"""
+        token = jwt_auth.create_access_token(
+            str(uuid.uuid4()), "{}@example.com".format(username), username,
+            admin=role == "admin", role=role
+        )
+        return {"Authorization": "Bearer {}".format(token)}
+
+    def _post(self, route, payload, key="message", headers=None):
+        response = self.client.post(route, headers=headers or self.headers, json=payload)
+        if response.status_code != 201:
+            return None
+        created = json.loads(response.get_data())[key]
+        self.created.append((route, created["_id"]))
+        return created
+
+    @staticmethod
+    def _load(name):
+        with open("tests/configs/{}_config.json".format(name), "r") as fr:
+            return json.load(fr)
+
+    @staticmethod
+    def _unique():
+        return "{}{}".format(int(time.time() * 1000), uuid.uuid4().hex[:8])
+
+    def create_class(self, day_of_week=1):
+        """Class with a subject, teacher, term, period and classroom; returns its _id"""
+        unique = self._unique()
+
+        department = self._post("/department", self._load("department"))
+        if not department:
+            return None
+        subject = self._load("subject")
+        subject["department_id"] = department["_id"]
+        subject["subject_name"] = "subject_{}".format(unique)
+        subject = self._post("/subject", subject)
+
+        teacher = self._load("teacher")
+        teacher["email_address"] = "teacher.{}@example.com".format(unique)
+        # The username is derived from the name and must be unique
+        teacher["surname"] = "Teacher{}".format(unique)
+        self.teacher = self._post("/teacher", teacher)
+
+        school_year = self._post("/school_year", self._load("school_year"))
+        if not (subject and self.teacher and school_year):
+            return None
+        term = self._load("term")
+        term["year_id"] = school_year["_id"]
+        term = self._post("/term", term)
+        period = self._load("period")
+        period["year_id"] = school_year["_id"]
+        period = self._post("/period", period)
+        year_level = self._post("/year_level", self._load("year_level"))
+
+        room_type = self._post("/classroom_types", self._load("classroom_types"))
+        classroom = self._load("classroom")
+        classroom["room_type"] = room_type["_id"] if room_type else None
+        classroom = self._post("/classroom", classroom)
+        if not (term and period and year_level and classroom):
+            return None
+
+        self.subject_id = subject["_id"]
+        self.term_id = term["_id"]
+        self.year_id = school_year["_id"]
+        self.year_level_id = year_level["_id"]
+        self.period_id = period["_id"]
+        self.classroom_id = classroom["_id"]
+        class_ = self._post("/class", {
+            "class_name": "class_{}".format(unique),
+            "subject_id": self.subject_id,
+            "teacher_id": self.teacher["_id"],
+            "term_id": self.term_id,
+            "period_id": period["_id"],
+            "classroom_id": classroom["_id"],
+            "year_level_id": year_level["_id"],
+            "day_of_week": day_of_week
+        })
+        self.class_id = class_["_id"] if class_ else None
+        return self.class_id
+
+    def create_student(self):
+        """Student enrolled in the class; returns its _id"""
+        student = self._load("student")
+        student["email"] = "student.{}@example.com".format(self._unique())
+        student = self._post("/student", student)
+        if not student:
+            return None
+        self.students.append(student)
+        if not self._post("/student_class", {"student_id": student["_id"], "class_id": self.class_id}):
+            return None
+        return student["_id"]
+
+    def create_term(self, term_number):
+        """Another term of the class's school year; returns its _id"""
+        term = self._load("term")
+        term["year_id"] = self.year_id
+        term["term_number"] = term_number
+        term = self._post("/term", term)
+        return term["_id"] if term else None
+
+    def record_attendance(self, student_id, status, day):
+        """Attendance of the student in the class on day (YYYY-MM-DD)"""
+        response = self.client.post("/attendance", headers=self.headers, json={
+            "class_id": self.class_id,
+            "date": day,
+            "attendance": [{"student_id": student_id, "status": status}]
+        })
+        if response.status_code == 201:
+            for record in json.loads(response.get_data())["created"]:
+                self.created.append(("/attendance", record["_id"]))
+        return response
+
+    def create_assessment_type(self, type_name):
+        """Assessment type named type_name, reusing an existing one; returns its _id"""
+        created = self._post("/assessment_type", {"type_name": type_name}, key="assessment_type")
+        if created:
+            return created["_id"]
+        response = self.client.get("/assessment_type", headers=self.headers)
+        for assessment_type in json.loads(response.get_data()).get("assessment_types", []):
+            if assessment_type["type_name"] == type_name:
+                return assessment_type["_id"]
+        return None
+
+    def create_assignment(self, assessment_type_id, max_score=20, status="published", headers=None):
+        """Assignment for the class, created by whoever headers authenticate; returns its _id"""
+        assignment = self._post("/assignment", {
+            "title": "assignment_{}".format(self._unique()),
+            "subject_id": self.subject_id,
+            "class_id": self.class_id,
+            "assessment_type_id": assessment_type_id,
+            "term_id": self.term_id,
+            "max_score": max_score,
+            "status": status
+        }, key="assignment", headers=headers)
+        return assignment["_id"] if assignment else None
+
+    def grade(self, student_id, assignment_id, score):
+        return self.client.post("/grade/batch", headers=self.headers, json={
+            "grades": [{
+                "student_id": student_id,
+                "assignment_id": assignment_id,
+                "score": score,
+                "status": "graded"
+            }]
+        })
+
+    def delete(self):
+        for route, _id in reversed(self.created):
+            self.client.delete("{}/{}".format(route, _id), headers=self.headers)
+        self.created = []
@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from tests.school_setup import SchoolSetup
 import uuid
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
@@ -78,6 +79,42 @@ class TestAssignment(unittest.TestCase):
         self.assertIn("assignments", res_answer)
         self.assertIsInstance(res_answer["assignments"], list)
 
+    def test_get_teacher_assignments_invalid_filter(self):
+        """Test filtering the teacher assignment listing with a malformed id"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            response = self.client.get("/assignment/teacher?class_id=not-a-uuid",
+                                       headers=SchoolSetup.bearer("teacher", school.teacher["username"]))
+            self.assertEqual(response.status_code, 400)
+        finally:
+            school.delete()
+
+    def test_get_teacher_assignments_filtered(self):
+        """Test that class_id and status narrow the teacher assignment listing"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            teacher_headers = SchoolSetup.bearer("teacher", school.teacher["username"])
+            assessment_type_id = school.create_assessment_type("Test")
+            published_id = school.create_assignment(assessment_type_id, status="published", headers=teacher_headers)
+            draft_id = school.create_assignment(assessment_type_id, status="draft", headers=teacher_headers)
+            if not (published_id and draft_id):
+                self.skipTest("Assignments not created")
+
+            def listed(query):
+                response = self.client.get("/assignment/teacher?{}".format(query), headers=teacher_headers)
+                self.assertEqual(response.status_code, 200)
+                return {a["_id"] for a in json.loads(response.get_data())["assignments"]}
+
+            self.assertEqual(listed("class_id={}".format(school.class_id)), {published_id, draft_id})
+            self.assertEqual(listed("class_id={}&status=draft".format(school.class_id)), {draft_id})
+            self.assertEqual(listed("class_id={}".format(uuid.uuid4())), set())
+        finally:
+            school.delete()
+
     def test_create_assignment_missing(self):
         """Test creating assignment with missing required fields"""
         incomplete_data = {"title": "Test Assignment"}
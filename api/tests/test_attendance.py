@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from tests.school_setup import SchoolSetup
 import uuid
 import time
 from datetime import date, datetime
@@ -102,6 +103,59 @@ class TestAttendance(unittest.TestCase):
             res_answer = json.loads(response.get_data())
             self.assertIn("attendance_records", res_answer)
 
+    def test_get_attendance_presence_for_student(self):
+        """Test weekly presence counts for a student without attendance"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+        
+        response = self.client.get("/attendance/presence?student_id={}&period=week".format(self.student_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["period"], "week")
+        self.assertEqual(res_answer["buckets"], [])
+
+    def test_post_device_checkins(self):
+        """Test staging an NDJSON batch of device check-ins with a malformed line"""
+        badge_id = "test-badge-{}".format(uuid.uuid4().hex[:8])
+        body = "\n".join([
+            json.dumps({"badge_id": badge_id, "scanned_at": "2025-03-10T07:58:12"}),
+            json.dumps({"badge_id": badge_id, "scanned_at": "2025-03-10T07:58:12"}),
+            "not json"
+        ])
+        response = self.client.post("/monitoring_data/checkins", data=body,
+                                    headers={"Authorization": API_KEY,
+                                             "Content-Type": "application/x-ndjson"})
+        self.assertEqual(response.status_code, 202)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["received"], 3)
+        self.assertEqual(res_answer["accepted"], 1)
+        self.assertEqual(res_answer["invalid"], 1)
+        self.assertEqual(res_answer["errors"][0]["line"], 3)
+
+    def test_get_rosters_class_missing(self):
+        """Test requesting several rosters when one class does not exist"""
+        url = "/attendance/roster?class_ids={},{}&dates=2025-03-10,2025-03-11".format(
+            uuid.uuid4(), uuid.uuid4())
+        response = self.client.get(url, headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 404)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["message"], "Class not found")
+
+    def test_post_attendance_class_missing(self):
+        """Test submitting a roster for a non-existent class"""
+        roster = {
+            "class_id": str(uuid.uuid4()),
+            "date": "2025-03-10",
+            "attendance": [{"student_id": self.student_id, "status": "present"}]
+        }
+        response = self.client.post("/attendance",
+                                    headers={"Authorization": API_KEY},
+                                    json=roster)
+        self.assertEqual(response.status_code, 404)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["message"], "Class not found")
+
     def test_get_attendance_invalid_params(self):
         """Test getting attendance with invalid parameters"""
         response = self.client.get("/attendance",
@@ -110,6 +164,44 @@ class TestAttendance(unittest.TestCase):
         res_answer = json.loads(response.get_data())
         self.assertIn("student_id", res_answer["message"].lower() or "class_id" in res_answer["message"].lower())
 
+    def test_attendance_rollup_follows_class_term(self):
+        """Test the attendance rollup moves with a class that changes term"""
+        from models.attendance_rollup import AttendanceRollupModel
+
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            student_id = school.create_student()
+            new_term_id = school.create_term(2)
+            if not student_id or not new_term_id:
+                self.skipTest("Student or term not created")
+            self.assertEqual(school.record_attendance(student_id, "present", "2026-03-02").status_code, 201)
+            self.assertEqual(school.record_attendance(student_id, "absent", "2026-03-03").status_code, 201)
+
+            def counts(term_id):
+                with self.api.app.app_context():
+                    return AttendanceRollupModel.find_counts(
+                        [student_id], [(school.subject_id, term_id)]
+                    ).get((student_id, school.subject_id, term_id))
+
+            self.assertEqual(counts(school.term_id), (1, 2))
+
+            response = self.client.put('/class',
+                                       headers={"Authorization": API_KEY},
+                                       json={"_id": school.class_id, "term_id": new_term_id})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(counts(school.term_id), (0, 0))
+            self.assertEqual(counts(new_term_id), (1, 2))
+
+            # Back to its term so the class is deleted before the new term
+            self.client.put('/class',
+                            headers={"Authorization": API_KEY},
+                            json={"_id": school.class_id, "term_id": school.term_id})
+            self.assertEqual(counts(school.term_id), (1, 2))
+        finally:
+            school.delete()
+
 
 if __name__ == '__main__':
     unittest.main()
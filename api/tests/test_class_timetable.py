@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from tests.school_setup import SchoolSetup
 import uuid
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
@@ -69,6 +70,21 @@ class TestClassTimetable(unittest.TestCase):
             self.assertIn("message", res_answer)
             self.assertIn("timetable", res_answer["message"])
 
+    def test_get_class_timetable_not_modified(self):
+        """Test revalidating an unchanged timetable with its ETag"""
+        if not self.year_level_id:
+            self.skipTest("Year level not created")
+
+        response = self.client.get("/class/timetable/{}".format(self.year_level_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get("ETag")
+        self.assertIsNotNone(etag)
+
+        response = self.client.get("/class/timetable/{}".format(self.year_level_id),
+                                   headers={"Authorization": API_KEY, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
     def test_get_class_timetable_invalid(self):
         """Test getting timetable for invalid year level"""
         wrong_id = str(uuid.uuid4())
@@ -77,5 +93,131 @@ class TestClassTimetable(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+    def test_get_class_conflicts_school_wide(self):
+        """Test listing every timetable conflict in the school"""
+        response = self.client.get("/class/conflicts",
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertTrue(res_answer["success"])
+        self.assertIsInstance(res_answer["message"]["conflicts"], list)
+        for conflict in res_answer["message"]["conflicts"]:
+            self.assertIn(conflict["type"], ["year_level", "teacher", "classroom"])
+            self.assertGreater(len(conflict["classes"]), 1)
+
+    def test_create_class_in_occupied_slot(self):
+        """Test that a second class in the year level's booked slot is refused, and another day is free"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class(day_of_week=1):
+                self.skipTest("Class not created")
+            second = {
+                "class_name": "second_{}".format(uuid.uuid4().hex[:8]),
+                "term_id": school.term_id,
+                "year_level_id": school.year_level_id,
+                "period_id": school.period_id,
+                "day_of_week": 1
+            }
+            response = self.client.post("/class", headers={"Authorization": API_KEY}, json=second)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.get_data())["message"],
+                             "This period and day is already assigned to another class in this year level")
+
+            second["day_of_week"] = 2
+            response = self.client.post("/class", headers={"Authorization": API_KEY}, json=second)
+            self.assertEqual(response.status_code, 201)
+            school.created.append(("/class", json.loads(response.get_data())["message"]["_id"]))
+        finally:
+            school.delete()
+
+    def test_get_class_timetable_periods_of_served_years(self):
+        """Test that an unfiltered timetable lists only the periods of its terms' school years"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class(day_of_week=1):
+                self.skipTest("Class not created")
+            other_year = school._post("/school_year", {"year_name": "other_{}".format(uuid.uuid4().hex[:8]),
+                                                       "start_date": "2027-01-03",
+                                                       "end_date": "2027-12-18"})
+            if not other_year:
+                self.skipTest("School year not created")
+            other_period = school._post("/period", dict(school._load("period"), year_id=other_year["_id"]))
+            if not other_period:
+                self.skipTest("Period not created")
+
+            response = self.client.get("/class/timetable/{}".format(school.year_level_id),
+                                       headers={"Authorization": API_KEY})
+            self.assertEqual(response.status_code, 200)
+            message = json.loads(response.get_data())["message"]
+            self.assertEqual([entry["_id"] for entry in message["timetable"]], [school.class_id])
+            self.assertEqual([period["_id"] for period in message["all_periods"]], [school.period_id])
+        finally:
+            school.delete()
+
+    def test_generate_timetable_missing_term(self):
+        """Test generating a timetable without a term"""
+        response = self.client.post("/class/timetable/generate",
+                                    headers={"Authorization": API_KEY},
+                                    json={"year_levels": []})
+        self.assertIn(response.status_code, [400, 401, 403])
+        if response.status_code == 400:
+            res_answer = json.loads(response.get_data())
+            self.assertFalse(res_answer["success"])
+            self.assertEqual(res_answer["message"], "term_id is required")
+
+    def test_generate_timetable_invalid_types(self):
+        """Test generating a timetable from malformed days, year levels or subjects"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            invalid = [
+                ({"days": "12345", "year_levels": [{"year_level_id": school.year_level_id}]},
+                 "days must be distinct integers from 1 (Monday) to 7"),
+                ({"year_levels": [school.year_level_id]},
+                 "Each year_levels entry must be an object"),
+                ({"year_levels": [{"year_level_id": school.year_level_id, "subjects": {"subject_id": school.subject_id}}]},
+                 "subjects must be a list of objects")
+            ]
+            for payload, message in invalid:
+                payload["term_id"] = school.term_id
+                response = self.client.post("/class/timetable/generate",
+                                            headers={"Authorization": API_KEY},
+                                            json=payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(response.get_data())["message"], message)
+        finally:
+            school.delete()
+
+    def test_generate_timetable_infeasible(self):
+        """Test that hours that cannot all be placed are reported with 422"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            # The class already holds the year level's only slot (Monday, the year's one period)
+            if not school.create_class(day_of_week=1):
+                self.skipTest("Class not created")
+            response = self.client.post("/class/timetable/generate",
+                                        headers={"Authorization": API_KEY},
+                                        json={
+                                            "term_id": school.term_id,
+                                            "days": [1],
+                                            "year_levels": [{
+                                                "year_level_id": school.year_level_id,
+                                                "subjects": [{"subject_id": school.subject_id, "weekly_hours": 2}]
+                                            }],
+                                            "dry_run": True,
+                                            "time_limit_seconds": 1
+                                        })
+            self.assertEqual(response.status_code, 422)
+            res_answer = json.loads(response.get_data())
+            self.assertFalse(res_answer["success"])
+            self.assertEqual(res_answer["unplaced"], [{
+                "year_level_id": school.year_level_id,
+                "subject_id": school.subject_id,
+                "hours_unplaced": 2
+            }])
+        finally:
+            school.delete()
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from tests.school_setup import SchoolSetup
 import uuid
 import time
 
@@ -93,6 +94,124 @@ class TestGrade(unittest.TestCase):
             res_answer = json.loads(response.get_data())
             self.assertIn("grades", res_answer)
 
+    def test_gradebook_class_missing(self):
+        """Test getting the gradebook for a non-existent class"""
+        wrong_id = str(uuid.uuid4())
+        response = self.client.get("/gradebook/class/{}".format(wrong_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 404)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["message"], "Class not found")
+
+    def test_rebuild_year_grades(self):
+        """Test explicitly rebuilding cached year grades for a student"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+
+        response = self.client.post('/grade/year/rebuild',
+                                    headers={"Authorization": API_KEY},
+                                    json={"student_id": self.student_id})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertTrue(res_answer["success"])
+        self.assertEqual(res_answer["rebuilt"], 0)
+
+    def test_year_grade_rebuilt_when_cached_row_missing(self):
+        """Test that a grade change without a cached year grade rebuilds it from every grade"""
+        from models.student_year_grade import StudentYearGradeModel
+
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            student_id = school.create_student()
+            test_type_id = school.create_assessment_type("Test")
+            first_id = school.create_assignment(test_type_id, max_score=20)
+            second_id = school.create_assignment(test_type_id, max_score=20)
+            if not (student_id and first_id and second_id):
+                self.skipTest("Graded assignments not created")
+            self.assertEqual(school.grade(student_id, first_id, 10).status_code, 200)
+            self.assertEqual(school.grade(student_id, second_id, 16).status_code, 200)
+
+            def cached():
+                with self.api.app.app_context():
+                    return StudentYearGradeModel.find_by_student_subject_year(
+                        student_id, school.subject_id, school.year_id)
+
+            with self.api.app.app_context():
+                cached_grade = StudentYearGradeModel.find_by_student_subject_year(
+                    student_id, school.subject_id, school.year_id)
+                self.assertEqual(cached_grade.graded_count, 2)
+                cached_grade.delete_from_db()
+
+            # Removing the second grade must leave the first one counted
+            response = self.client.post("/grade/batch", headers={"Authorization": API_KEY}, json={
+                "grades": [{"student_id": student_id, "assignment_id": second_id, "status": "submitted"}]
+            })
+            self.assertEqual(response.status_code, 200)
+            cached_grade = cached()
+            self.assertEqual(cached_grade.graded_count, 1)
+            self.assertEqual(float(cached_grade.calculated_average), 10.0)
+        finally:
+            school.delete()
+
+    def test_batch_grades_missing_references(self):
+        """Test batch grading reports a failure for each invalid cell"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+
+        batch_data = {
+            "grades": [
+                {"student_id": self.student_id, "assignment_id": str(uuid.uuid4()), "score": 10},
+                {"student_id": self.student_id}
+            ]
+        }
+        response = self.client.post('/grade/batch',
+                                    headers={"Authorization": API_KEY},
+                                    json=batch_data)
+        self.assertEqual(response.status_code, 400)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["failed"], 2)
+        self.assertEqual(res_answer["results"][0]["message"], "Assignment not found")
+        self.assertIn("required", res_answer["results"][1]["message"])
+
+    def test_batch_grades_invalid_scores(self):
+        """Test batch grading rejects bad scores per cell and still saves the valid ones"""
+        school = SchoolSetup(self.client, API_KEY)
+        try:
+            if not school.create_class():
+                self.skipTest("Class not created")
+            student_id = school.create_student()
+            test_type_id = school.create_assessment_type("Test")
+            assignment_id = school.create_assignment(test_type_id, max_score=20)
+            if not student_id or not assignment_id:
+                self.skipTest("Assignment not created")
+
+            cell = {"student_id": student_id, "assignment_id": assignment_id, "status": "graded"}
+            batch_data = {
+                "grades": [
+                    dict(cell, score="abc"),
+                    dict(cell, score=-1),
+                    dict(cell, score=25),
+                    dict(cell, score=12, status="unknown"),
+                    dict(cell, score=15)
+                ]
+            }
+            response = self.client.post('/grade/batch',
+                                        headers={"Authorization": API_KEY},
+                                        json=batch_data)
+            self.assertEqual(response.status_code, 200)
+            res_answer = json.loads(response.get_data())
+            self.assertEqual(res_answer["saved"], 1)
+            self.assertEqual(res_answer["failed"], 4)
+            self.assertEqual(res_answer["results"][0]["message"], "score must be a number")
+            self.assertIn("between 0 and 20", res_answer["results"][1]["message"])
+            self.assertIn("between 0 and 20", res_answer["results"][2]["message"])
+            self.assertIn("status must be one of", res_answer["results"][3]["message"])
+            self.assertTrue(res_answer["results"][4]["success"])
+        finally:
+            school.delete()
+
     def test_create_grade_missing(self):
         """Test creating grade with missing required fields"""
         incomplete_data = {"student_id": self.student_id}
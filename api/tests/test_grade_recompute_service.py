@@ -0,0 +1,93 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services.grade_recompute_service import GradeRecomputeService
+
+
+class TestGradeRecomputeService(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Creates a service on the in-process queue, without its worker thread
+        """
+        self.service = GradeRecomputeService()
+        self.service.client = None
+        self.service.sync = False
+        patcher = mock.patch.object(self.service, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_enqueues_coalesce(self):
+        """Test that saving the same grade repeatedly queues one recomputation"""
+        for _ in range(3):
+            self.service.enqueue('student-1', 'subject-1', 'term-1', 'class-1')
+        self.service.enqueue_many([
+            ('student-1', 'subject-1', 'term-1', 'class-1'),
+            ('student-2', 'subject-1', 'term-1', 'class-1')
+        ])
+
+        batch = self.service._pop_batch()
+        self.assertEqual(sorted(batch), [
+            'student-1|subject-1|term-1|class-1',
+            'student-2|subject-1|term-1|class-1'
+        ])
+        self.assertEqual(self.service._pop_batch(), [])
+
+    def test_status_of_requested_keys(self):
+        """Test that status reports only the requested term grades"""
+        self.service.enqueue('student-1', 'subject-1', 'term-1', 'class-1')
+        self.service.enqueue('student-2', 'subject-1', 'term-1', 'class-1')
+
+        entries = self.service.status([('student-1', 'subject-1', 'term-1'), ('student-3', 'subject-1', 'term-1')])
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['student_id'], 'student-1')
+        self.assertTrue(entries[0]['pending'])
+        self.assertIsNone(entries[0]['last_computed'])
+
+    def test_enqueue_while_processing_stays_pending(self):
+        """Test that a grade saved during its own recomputation is recomputed again"""
+        self.service.enqueue('student-1', 'subject-1', 'term-1', 'class-1')
+        batch = self.service._pop_batch()
+        self.service.enqueue('student-1', 'subject-1', 'term-1', 'class-1')
+        self.service._mark_done(batch)
+
+        entries = self.service.status([('student-1', 'subject-1', 'term-1')])
+        self.assertTrue(entries[0]['pending'])
+        self.assertIsNotNone(entries[0]['last_computed'])
+        self.assertEqual(self.service._pop_batch(), batch)
+
+        self.service._mark_done(batch)
+        entries = self.service.status([('student-1', 'subject-1', 'term-1')])
+        self.assertFalse(entries[0]['pending'])
+
+    def test_failed_term_stays_pending_and_is_retried(self):
+        """Test that keys of a term whose recomputation raises are not reported fresh"""
+        def calculate_and_save_batch(term_id, pairs):
+            if term_id == 'term-2':
+                raise RuntimeError('database unavailable')
+
+        term_grade = SimpleNamespace(TermGradeModel=SimpleNamespace(calculate_and_save_batch=calculate_and_save_batch))
+        modules = {'db': SimpleNamespace(db=mock.MagicMock()), 'models.term_grade': term_grade}
+
+        self.service.enqueue('student-1', 'subject-1', 'term-1', 'class-1')
+        self.service.enqueue('student-1', 'subject-1', 'term-2', 'class-2')
+        with mock.patch.dict('sys.modules', modules):
+            self.service._process(self.service._pop_batch())
+
+        fresh, failed = self.service.status([('student-1', 'subject-1', 'term-1'), ('student-1', 'subject-1', 'term-2')])
+        self.assertFalse(fresh['pending'])
+        self.assertIsNotNone(fresh['last_computed'])
+        self.assertTrue(failed['pending'])
+        self.assertIsNone(failed['last_computed'])
+
+        # Retried once the visibility timeout has passed
+        self.assertEqual(self.service._pop_batch(), [])
+        later = time.time() + self.service.visibility_seconds + 1
+        with mock.patch('services.grade_recompute_service.time.time', return_value=later):
+            self.assertEqual(self.service._pop_batch(), ['student-1|subject-1|term-2|class-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
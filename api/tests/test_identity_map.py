@@ -0,0 +1,112 @@
+import unittest
+import uuid
+import os
+import re
+from flask import Flask, g
+from sqlalchemy import event
+from db import db
+from webPlatform_api import Webapi
+from models.class_model import ClassModel
+from services.identity_map import identity_map
+from tests.school_setup import SchoolSetup
+
+POSTGRES_USER = os.getenv("POSTGRES_USER")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+POSTGRES_DB = os.getenv("POSTGRES_DB")
+POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+API_KEY = os.getenv("API_KEY")
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Creates a new flask instance and one class to look up
+        """
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        self.app.config['CORS_HEADERS'] = 'Content-Type'
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = \
+            "postgresql://{}:{}@{}:{}/{}".format(POSTGRES_USER,
+                                                 POSTGRES_PASSWORD,
+                                                 POSTGRES_HOST,
+                                                 POSTGRES_PORT,
+                                                 POSTGRES_DB)
+        db.init_app(self.app)
+
+        self.api = Webapi()
+        self.client = self.api.app.test_client()
+        self.school = SchoolSetup(self.client, API_KEY)
+        class_id = self.school.create_class()
+        self.class_id = uuid.UUID(class_id) if class_id else None
+
+    def tearDown(self) -> None:
+        """
+        Deletes the class and everything it references
+        """
+        self.school.delete()
+
+    def _class_queries(self):
+        """List collecting the SELECTs on class run from now until the test ends"""
+        statements = []
+
+        def collect(conn, cursor, statement, parameters, context, executemany):
+            # "class" is a reserved word, so the table name is quoted
+            if re.match(r'\s*SELECT\b.*\bFROM "class"', statement, re.S):
+                statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", collect)
+        self.addCleanup(event.remove, db.engine, "before_cursor_execute", collect)
+        return statements
+
+    def test_prefetch_loads_once(self):
+        """Test that prefetched rows are served without further queries"""
+        if not self.class_id:
+            self.skipTest("Class not created")
+        with self.api.app.app_context():
+            queries = self._class_queries()
+            identity_map.prefetch(ClassModel, [self.class_id, str(self.class_id)])
+            self.assertEqual(len(queries), 1)
+
+            for _ in range(3):
+                self.assertEqual(identity_map.find_by_id(ClassModel, str(self.class_id))._id, self.class_id)
+            self.assertEqual(len(queries), 1)
+
+    def test_misses_are_not_remembered(self):
+        """Test that a row inserted after a miss in the same request is found"""
+        if not self.class_id:
+            self.skipTest("Class not created")
+        with self.api.app.app_context():
+            existing = identity_map.find_by_id(ClassModel, self.class_id)
+            missing_id = uuid.uuid4()
+            identity_map.prefetch(ClassModel, [missing_id])
+            self.assertIsNone(identity_map.find_by_id(ClassModel, missing_id))
+
+            try:
+                created = ClassModel(existing.term_id, existing.year_level_id, "identity_map_class")
+                created._id = missing_id
+                db.session.add(created)
+                db.session.flush()
+                self.assertIs(identity_map.find_by_id(ClassModel, missing_id), created)
+            finally:
+                db.session.rollback()
+
+    def test_commit_resets_map(self):
+        """Test that a commit drops the rows remembered so far"""
+        if not self.class_id:
+            self.skipTest("Class not created")
+        with self.api.app.app_context():
+            identity_map.find_by_id(ClassModel, self.class_id)
+            self.assertIn(("class", self.class_id), g.get(identity_map.G_KEY))
+
+            db.session.commit()
+            self.assertIsNone(g.get(identity_map.G_KEY))
+
+            queries = self._class_queries()
+            self.assertEqual(identity_map.find_by_id(ClassModel, self.class_id)._id, self.class_id)
+            self.assertEqual(len(queries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services import result_cache
+from services.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Creates a plain cache and one scoped by class.teacher_id, outside the shared registry
+        """
+        self.cache = ResultCache('test_plain', ('term',), ttl_seconds=30)
+        self.scoped = ResultCache('test_scoped', ('term',), ttl_seconds=30, scoped_by=('class', 'teacher_id'))
+        self.addCleanup(result_cache._registry.remove, self.cache)
+        self.addCleanup(result_cache._registry.remove, self.scoped)
+
+    def _commit(self, changed, bulk=(), scopes=None):
+        session = SimpleNamespace(info={
+            'result_cache_changed': set(changed),
+            'result_cache_bulk': set(bulk),
+            'result_cache_scopes': scopes or {}
+        })
+        result_cache._after_commit(session)
+
+    def test_entries_expire_after_ttl(self):
+        """Test that an entry is served until its ttl has passed"""
+        with mock.patch('services.result_cache.time.time', return_value=1000.0):
+            self.cache.set('key', 'value')
+        with mock.patch('services.result_cache.time.time', return_value=1029.0):
+            self.assertEqual(self.cache.get('key'), 'value')
+        with mock.patch('services.result_cache.time.time', return_value=1031.0):
+            self.assertIsNone(self.cache.get('key'))
+
+    def test_stale_generation_is_not_stored(self):
+        """Test that a value computed across an invalidation is dropped"""
+        generation = self.cache.generation()
+        self.cache.clear()
+        self.cache.set('key', 'stale', generation)
+        self.assertIsNone(self.cache.get('key'))
+
+        self.cache.set('key', 'fresh', self.cache.generation())
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+    def test_scoped_write_discards_only_its_scopes(self):
+        """Test that a class flush drops its teachers' entries and the unscoped ones"""
+        for key in [('teacher-1', 'term-1'), ('teacher-2', 'term-1'), (None, 'term-1')]:
+            self.scoped.set(key, key)
+        self.cache.set('key', 'value')
+
+        self._commit({'class'}, scopes={'test_scoped': {'teacher-1'}})
+
+        self.assertIsNone(self.scoped.get(('teacher-1', 'term-1')))
+        self.assertIsNone(self.scoped.get((None, 'term-1')))
+        self.assertEqual(self.scoped.get(('teacher-2', 'term-1')), ('teacher-2', 'term-1'))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_bulk_or_other_table_writes_clear_all(self):
+        """Test that bulk statements on the scoped table and writes to other tables drop everything"""
+        self.scoped.set(('teacher-2', 'term-1'), 'value')
+        self._commit({'class'}, bulk={'class'}, scopes={'test_scoped': {'teacher-1'}})
+        self.assertIsNone(self.scoped.get(('teacher-2', 'term-1')))
+
+        self.scoped.set(('teacher-2', 'term-1'), 'value')
+        self.cache.set('key', 'value')
+        self._commit({'class', 'term'}, scopes={'test_scoped': {'teacher-1'}})
+        self.assertIsNone(self.scoped.get(('teacher-2', 'term-1')))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_notifications_from_other_workers_are_applied(self):
+        """Test that another process's invalidations are applied and this process's own are skipped"""
+        self.scoped.set(('teacher-1', 'term-1'), 'value')
+        self.cache.set('key', 'value')
+
+        with mock.patch('services.result_cache._origin', return_value='host:1'):
+            result_cache._on_notify('{"origin": "host:1", "caches": {"test_plain": null}}')
+            self.assertEqual(self.cache.get('key'), 'value')
+
+            result_cache._on_notify('{"origin": "host:2", "caches": {"test_plain": null, "test_scoped": ["teacher-1"]}}')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.scoped.get(('teacher-1', 'term-1')))
+
+
+if __name__ == '__main__':
+    unittest.main()
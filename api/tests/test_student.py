@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from utils.pagination import DEFAULT_LIMIT
 import uuid
 import time
 
@@ -125,6 +126,41 @@ class TestStudent(unittest.TestCase):
         self.assertEqual(res_answer["message"]["given_name"],
                          "Vena")
 
+    def test_list_students_paginated(self):
+        # Add unique email field (required for student creation)
+        test_student = self.student.copy()
+        unique_student_email = (
+            f"student.{int(time.time() * 1000)}."
+            f"{uuid.uuid4().hex[:8]}@example.com"
+        )
+        test_student['email'] = unique_student_email
+
+        response = self.client.post('/student',
+                                    headers={"Authorization": API_KEY},
+                                    json=test_student)
+        self.assertEqual(response.status_code, 201)
+        res_answer = json.loads(response.get_data())
+        self.student_id = res_answer["message"]["_id"]
+
+        response = self.client.get("/student?limit=1",
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(len(res_answer["message"]), 1)
+        self.assertEqual(res_answer["pagination"]["limit"], 1)
+
+        # Without ?limit= pages stay bounded by the default page size
+        response = self.client.get("/student",
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["pagination"]["limit"], DEFAULT_LIMIT)
+        self.assertLessEqual(len(res_answer["message"]), DEFAULT_LIMIT)
+
+        response = self.client.get("/student?cursor=not-a-cursor",
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 400)
+
     def test_get_student_missing(self):
         # Add unique email field (required for student creation)
         test_student = self.student.copy()
@@ -92,6 +92,22 @@ class TestStudentAssignment(unittest.TestCase):
         self.assertIn(response.status_code, [200, 404])
 
 
+    def test_get_student_assignments_not_modified(self):
+        """Test revalidating a student's assignment listing with its ETag"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+
+        response = self.client.get("/student/assignments/{}".format(self.student_id),
+                                   headers={"Authorization": API_KEY})
+        if response.status_code != 200:
+            self.skipTest("Listing not available")
+        etag = response.headers.get("ETag")
+        self.assertIsNotNone(etag)
+
+        response = self.client.get("/student/assignments/{}".format(self.student_id),
+                                   headers={"Authorization": API_KEY, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
 if __name__ == '__main__':
     unittest.main()
 
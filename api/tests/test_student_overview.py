@@ -4,6 +4,7 @@ from db import db
 import os
 from flask import Flask
 from webPlatform_api import Webapi
+from tests.school_setup import SchoolSetup
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -49,6 +50,53 @@ class TestStudentOverview(unittest.TestCase):
             res_answer = json.loads(response.get_data())
             self.assertIn("student_metrics", res_answer)
 
+    def _graded_test_overview(self):
+        """Two students graded 10/20 and 16/20 on one test; returns the first student's overview"""
+        if not self.school.create_class():
+            self.skipTest("Class not created")
+        first_id = self.school.create_student()
+        second_id = self.school.create_student()
+        test_type_id = self.school.create_assessment_type("Test")
+        assignment_id = self.school.create_assignment(test_type_id, max_score=20)
+        if not (first_id and second_id and assignment_id):
+            self.skipTest("Graded test not created")
+        self.assertEqual(self.school.grade(first_id, assignment_id, 10).status_code, 200)
+        self.assertEqual(self.school.grade(second_id, assignment_id, 16).status_code, 200)
+
+        response = self.client.get(
+            "/student/overview?student_id={}&term_id={}".format(first_id, self.school.term_id),
+            headers=SchoolSetup.bearer("admin", "overview_admin"))
+        self.assertEqual(response.status_code, 200)
+        return assignment_id, json.loads(response.get_data())
+
+    def test_student_overview_test_distribution(self):
+        """Test the test score distribution snapshot follows grade writes"""
+        self.school = SchoolSetup(self.client, API_KEY)
+        try:
+            assignment_id, res_answer = self._graded_test_overview()
+            distributions = res_answer["test_distributions"]
+            self.assertEqual(len(distributions), 1)
+            self.assertEqual(distributions[0]["assignment_id"], assignment_id)
+            self.assertEqual(distributions[0]["graded_count"], 2)
+            self.assertAlmostEqual(distributions[0]["mean"], 65.0)
+            self.assertAlmostEqual(distributions[0]["min"], 50.0)
+            self.assertAlmostEqual(distributions[0]["max"], 80.0)
+            self.assertEqual(sum(distributions[0]["histogram"]), 2)
+        finally:
+            self.school.delete()
+
+    def test_student_overview_excludes_own_score(self):
+        """Test class_test_scores leaves out the student's own score"""
+        self.school = SchoolSetup(self.client, API_KEY)
+        try:
+            _, res_answer = self._graded_test_overview()
+            self.assertEqual(res_answer["student_test_scores"], [50.0])
+            self.assertEqual(res_answer["class_test_scores"], [80.0])
+            self.assertEqual(res_answer["student_position"]["rank"], 2)
+            self.assertEqual(res_answer["student_position"]["total_students"], 2)
+        finally:
+            self.school.delete()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -93,6 +93,15 @@ class TestStudentSchedule(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+    def test_get_student_schedule_invalid_term(self):
+        """Test filtering a student's schedule with a malformed term id"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+
+        response = self.client.get("/student/schedule/{}?term_id=not-a-uuid".format(self.student_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -172,6 +172,36 @@ class TestSubject(unittest.TestCase):
         self.assertTrue(res_answer["success"])
         self.assertEqual(res_answer["message"]["subject_name"], "Matemática Avançada")
 
+    def test_get_subject_after_update(self):
+        """Test that a cached subject is refreshed after an update"""
+        response = self.client.post('/subject',
+                                    headers={"Authorization": API_KEY},
+                                    json=self.subject)
+
+        self.assertEqual(response.status_code, 201)
+        res_answer = json.loads(response.get_data())
+        self.subject_id = res_answer["message"]["_id"]
+
+        # First read populates the reference cache
+        response = self.client.get("/subject/{}".format(self.subject_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+
+        update_data = {
+            "_id": self.subject_id,
+            **self.subject_update
+        }
+        response = self.client.put("/subject",
+                                   headers={"Authorization": API_KEY},
+                                   json=update_data)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/subject/{}".format(self.subject_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertEqual(res_answer["message"]["subject_name"], "Matemática Avançada")
+
     def test_put_subject_wrong(self):
         """Test updating a non-existent subject"""
         wrong_id = str(uuid.uuid4())
@@ -77,6 +77,16 @@ class TestTeacherSchedule(unittest.TestCase):
                                    headers={"Authorization": API_KEY})
         self.assertEqual(response.status_code, 404)
 
+    def test_get_teacher_schedule_invalid_term(self):
+        """Test that a malformed term filter is rejected"""
+        if not self.teacher_id:
+            self.skipTest("Teacher not created")
+
+        response = self.client.get(
+            "/teacher/schedule/{}?term_id=not-a-uuid".format(self.teacher_id),
+            headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 400)
+
 
 if __name__ == '__main__':
     unittest.main()
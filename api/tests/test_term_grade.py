@@ -91,6 +91,19 @@ class TestTermGrade(unittest.TestCase):
         self.assertIn("term_grades", res_answer)
         self.assertIsInstance(res_answer["term_grades"], list)
 
+    def test_get_term_grade_status(self):
+        """Test the freshness report for a student's derived term grades"""
+        if not self.student_id:
+            self.skipTest("Student not created")
+
+        response = self.client.get("/term_grade/status?student_id={}".format(self.student_id),
+                                   headers={"Authorization": API_KEY})
+        self.assertEqual(response.status_code, 200)
+        res_answer = json.loads(response.get_data())
+        self.assertFalse(res_answer["is_stale"])
+        self.assertEqual(res_answer["pending_count"], 0)
+        self.assertEqual(res_answer["entries"], [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+
+from services.timetable_conflicts import TimetableOccupancy
+
+TERM = uuid.uuid4()
+OTHER_TERM = uuid.uuid4()
+PERIOD = uuid.uuid4()
+
+
+def class_row(name, year_level_id=None, teacher_id=None, classroom_id=None, term_id=TERM, day_of_week=1,
+              period_id=PERIOD):
+    return SimpleNamespace(
+        _id=uuid.uuid4(), class_name=name, term_id=term_id, year_level_id=year_level_id or uuid.uuid4(),
+        teacher_id=teacher_id, classroom_id=classroom_id, period_id=period_id, day_of_week=day_of_week
+    )
+
+
+class TestTimetableOccupancy(unittest.TestCase):
+
+    def _conflicts(self, *rows):
+        return {
+            conflict['type']: sorted(c['class_name'] for c in conflict['classes'])
+            for conflict in TimetableOccupancy(rows).conflicts()
+        }
+
+    def test_double_bookings_in_a_term(self):
+        """Test that a year level, teacher or classroom holding a slot twice is reported"""
+        year_level, teacher, classroom = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        self.assertEqual(
+            self._conflicts(class_row('a', year_level_id=year_level), class_row('b', year_level_id=year_level)),
+            {'year_level': ['a', 'b']}
+        )
+        self.assertEqual(
+            self._conflicts(class_row('a', teacher_id=teacher), class_row('b', teacher_id=teacher)),
+            {'teacher': ['a', 'b']}
+        )
+        self.assertEqual(
+            self._conflicts(class_row('a', classroom_id=classroom), class_row('b', classroom_id=classroom),
+                            class_row('c', classroom_id=classroom)),
+            {'classroom': ['a', 'b', 'c']}
+        )
+
+    def test_conflict_details(self):
+        """Test that a conflict names the resource, the slot and its classes"""
+        teacher = uuid.uuid4()
+        first, second = class_row('a', teacher_id=teacher, day_of_week=3), class_row('b', teacher_id=teacher, day_of_week=3)
+        conflicts = TimetableOccupancy([first, second]).conflicts()
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0]['resource_id'], str(teacher))
+        self.assertEqual(conflicts[0]['term_id'], str(TERM))
+        self.assertEqual(conflicts[0]['day_of_week'], 3)
+        self.assertEqual(conflicts[0]['period_id'], str(PERIOD))
+        self.assertEqual([c['_id'] for c in conflicts[0]['classes']], [str(first._id), str(second._id)])
+
+    def test_other_terms_days_and_periods_are_free(self):
+        """Test that the same resources in another term, day or period are not a conflict"""
+        year_level, teacher, classroom = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        resources = {'year_level_id': year_level, 'teacher_id': teacher, 'classroom_id': classroom}
+        self.assertEqual(self._conflicts(
+            class_row('a', **resources),
+            class_row('b', term_id=OTHER_TERM, **resources),
+            class_row('c', day_of_week=2, **resources),
+            class_row('d', period_id=uuid.uuid4(), **resources)
+        ), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
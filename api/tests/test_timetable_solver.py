@@ -0,0 +1,132 @@
+import unittest
+from collections import Counter
+
+from services.timetable_solver import TimetableSolver
+
+DAYS = [1, 2, 3, 4, 5]
+PERIODS = ['p1', 'p2', 'p3', 'p4']
+
+
+class TestTimetableSolver(unittest.TestCase):
+
+    def _courses(self):
+        """Two year levels sharing teachers and a lab; 17 of their 20 weekly slots each"""
+        courses = []
+        for year_level in ('y1', 'y2'):
+            courses += [
+                {'year_level_id': year_level, 'subject_id': 'math', 'hours': 5, 'teacher_ids': ['t1', 't2'], 'room_type_id': None},
+                {'year_level_id': year_level, 'subject_id': 'science', 'hours': 4, 'teacher_ids': ['t3'], 'room_type_id': 'lab'},
+                {'year_level_id': year_level, 'subject_id': 'history', 'hours': 3, 'teacher_ids': ['t4', 't5'], 'room_type_id': None},
+                {'year_level_id': year_level, 'subject_id': 'art', 'hours': 5, 'teacher_ids': [None], 'room_type_id': None}
+            ]
+        return courses
+
+    def assertNoClashes(self, placements, occupied=()):
+        """Each year level, teacher and classroom holds a slot at most once"""
+        booked = Counter()
+        for day, period_id, year_level_id, teacher_id, classroom_id in occupied:
+            for kind, resource in (('year_level', year_level_id), ('teacher', teacher_id), ('classroom', classroom_id)):
+                if resource is not None:
+                    booked[(kind, resource, day, period_id)] += 1
+        for placement in placements:
+            slot = (placement['day_of_week'], placement['period_id'])
+            resources = (
+                ('year_level', placement['course']['year_level_id']),
+                ('teacher', placement['teacher_id']),
+                ('classroom', placement['classroom_id'])
+            )
+            for kind, resource in resources:
+                if resource is not None:
+                    booked[(kind, resource) + slot] += 1
+        self.assertEqual([key for key, count in booked.items() if count > 1], [])
+
+    def test_feasible_timetable(self):
+        """Test that a solved timetable places every hour once, without clashes"""
+        courses = self._courses()
+        solver = TimetableSolver(DAYS, PERIODS, courses, {'lab': ['lab1']})
+        self.assertTrue(solver.solve())
+        placements = solver.placements()
+        self.assertNoClashes(placements)
+
+        hours = Counter()
+        teachers = {}
+        for placement in placements:
+            course = placement['course']
+            key = (course['year_level_id'], course['subject_id'])
+            hours[key] += 1
+            # One teacher per course, taken from its candidates
+            self.assertIn(placement['teacher_id'], course['teacher_ids'])
+            self.assertEqual(teachers.setdefault(key, placement['teacher_id']), placement['teacher_id'])
+            if course['room_type_id'] == 'lab':
+                self.assertEqual(placement['classroom_id'], 'lab1')
+            else:
+                self.assertIsNone(placement['classroom_id'])
+        self.assertEqual(hours, Counter({(c['year_level_id'], c['subject_id']): c['hours'] for c in courses}))
+        self.assertEqual(solver.unplaced(), [])
+
+    def test_occupied_slots_are_avoided(self):
+        """Test that classes staying in place keep their year level, teacher and classroom slots"""
+        occupied = [
+            (1, 'p1', 'y1', None, None),
+            (2, 'p1', None, 't1', None),
+            (3, 'p1', None, None, 'lab1')
+        ]
+        courses = [
+            {'year_level_id': 'y1', 'subject_id': 'math', 'hours': 5, 'teacher_ids': ['t1'], 'room_type_id': 'lab'}
+        ]
+        solver = TimetableSolver(DAYS, PERIODS, courses, {'lab': ['lab1']}, occupied=occupied)
+        self.assertTrue(solver.solve())
+        placements = solver.placements()
+        self.assertEqual(len(placements), 5)
+        self.assertNoClashes(placements, occupied)
+
+    def test_school_sharing_one_gym(self):
+        """Test that a school-sized timetable with one shared gym is solved within the time limit"""
+        subjects = [('math', 5), ('portuguese', 5), ('english', 3), ('science', 3), ('history', 2),
+                    ('geography', 2), ('art', 2), ('music', 2), ('pe', 2), ('ict', 2)]
+        courses = [
+            {
+                'year_level_id': 'y{}'.format(year_level),
+                'subject_id': subject,
+                'hours': hours,
+                'teacher_ids': ['{}-{}'.format(subject, t) for t in range(6)],
+                'room_type_id': 'gym' if subject == 'pe' else None
+            }
+            for year_level in range(12)
+            for subject, hours in subjects
+        ]
+        periods = ['p{}'.format(p) for p in range(7)]
+        # PE takes 24 of the gym's 35 slots
+        solver = TimetableSolver(DAYS, periods, courses, {'gym': ['gym1']}, time_limit_seconds=10)
+        self.assertTrue(solver.solve())
+        placements = solver.placements()
+        self.assertEqual(len(placements), sum(course['hours'] for course in courses))
+        self.assertNoClashes(placements)
+
+    def test_overbooked_room_type_fails_fast(self):
+        """Test that more hours than a room type's free slots are rejected without searching"""
+        courses = [
+            {'year_level_id': 'y{}'.format(y), 'subject_id': 'pe', 'hours': 4, 'teacher_ids': [None], 'room_type_id': 'gym'}
+            for y in range(3)
+        ]
+        occupied = [(1, 'p1', None, None, 'gym1')]
+        solver = TimetableSolver(DAYS, ['p1', 'p2'], courses, {'gym': ['gym1']}, occupied=occupied)
+        self.assertFalse(solver.solve())
+        self.assertEqual(solver.nodes, 1)
+
+    def test_infeasible_timetable_reports_unplaced(self):
+        """Test that hours exceeding the free slots are reported as unplaced"""
+        courses = [
+            {'year_level_id': 'y1', 'subject_id': 'math', 'hours': 2, 'teacher_ids': ['t1'], 'room_type_id': None},
+            {'year_level_id': 'y2', 'subject_id': 'math', 'hours': 2, 'teacher_ids': ['t1'], 'room_type_id': None}
+        ]
+        # One teacher for four hours in three slots
+        solver = TimetableSolver([1], ['p1', 'p2', 'p3'], courses, {}, time_limit_seconds=1)
+        self.assertFalse(solver.solve())
+        unplaced = solver.unplaced()
+        self.assertEqual(sum(item['hours_unplaced'] for item in unplaced), 1)
+        self.assertNoClashes(solver.placements(complete=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
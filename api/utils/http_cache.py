@@ -0,0 +1,23 @@
+import json
+import hashlib
+
+from flask import Response, request
+
+
+def etag_for(payload):
+    """Strong ETag over the JSON serialization of payload"""
+    body = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def json_response_with_etag(payload, status=200, etag=None):
+    """
+    JSON Response carrying an ETag; 304 with an empty body when the request's
+    If-None-Match already names it. Pass etag when it is known without
+    serializing payload (e.g. from a cache).
+    """
+    etag = etag or etag_for(payload)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(json.dumps(payload), status, mimetype='application/json', headers=headers)
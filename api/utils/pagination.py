@@ -0,0 +1,140 @@
+import os
+import json
+import uuid
+import base64
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request
+
+from db import db
+
+# Requests without ?limit= get DEFAULT_LIMIT rows; no request gets more than MAX_LIMIT.
+# Clients wanting a whole listing follow pagination.next_cursor (the frontend's
+# ApiService.get does).
+DEFAULT_LIMIT = int(os.getenv('PAGINATION_DEFAULT_LIMIT', '200'))
+MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', '1000'))
+
+
+class PaginationError(ValueError):
+    """Invalid limit, cursor or filter query parameter"""
+
+
+class Page:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, next_cursor, limit):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.limit = limit
+
+    def meta(self):
+        return {
+            'next_cursor': self.next_cursor,
+            'has_more': self.next_cursor is not None,
+            'limit': self.limit
+        }
+
+
+def parse_bool_arg(name):
+    """Read a 'true'/'false' query parameter; None when absent"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    return value.lower() == 'true'
+
+
+def parse_uuid_arg(name):
+    """Read a UUID query parameter; None when absent, PaginationError when malformed"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except (ValueError, TypeError):
+        raise PaginationError(f'Invalid {name} format')
+
+
+def _encode_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _decode_value(value, column):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('cursor does not match this listing')
+        return [_decode_value(v, c) for v, c in zip(values, columns)]
+    except Exception:
+        raise PaginationError('Invalid cursor')
+
+
+def parse_limit():
+    """The ?limit= parameter capped at MAX_LIMIT; DEFAULT_LIMIT when absent"""
+    value = request.args.get('limit')
+    if value is None or value == '':
+        return min(DEFAULT_LIMIT, MAX_LIMIT)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+
+def paginate(query, order_columns, descending=False, row_entity=None):
+    """
+    Apply keyset pagination to query, reading ?limit= and ?cursor= from the request.
+
+    order_columns must end with a unique, non-null column (normally _id) so the
+    ordering is total; all columns are sorted in the same direction. For queries
+    returning tuples, row_entity maps a row to the object holding those columns.
+    Returns a Page whose next_cursor resumes after its last row, or None on the
+    last page.
+    """
+    limit = parse_limit()
+    cursor = request.args.get('cursor')
+
+    if cursor:
+        values = decode_cursor(cursor, order_columns)
+        keys = db.tuple_(*order_columns)
+        bound = db.tuple_(*[db.literal(v, c.type) for v, c in zip(values, order_columns)])
+        query = query.filter(keys < bound if descending else keys > bound)
+
+    ordering = [c.desc() for c in order_columns] if descending else list(order_columns)
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = row_entity(rows[-1]) if row_entity else rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in order_columns])
+    return Page(rows, next_cursor, limit)
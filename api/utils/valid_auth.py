@@ -7,6 +7,7 @@ from flask import request, g, Response
 from utils.decode_verify_jwt import verify_accessToken, decode_token_without_verification
 
 API_KEY = os.getenv("API_KEY")
+MONITORING_DEVICE_KEY = os.getenv("MONITORING_DEVICE_KEY")
 
 
 def check_api_key():
@@ -22,8 +23,11 @@ def check_if_is_device_request():
     device_id = request.headers.get('MONITORING_DEVICE_ID')
     device_url = "/monitoring_data"
 
-    if device_key and device_id and device_url in request.url:
-        return True
+    # Devices share one key from the environment; without it device access is off
+    if not MONITORING_DEVICE_KEY:
+        return False
+    if device_key and device_id and request.path.startswith(device_url):
+        return secrets.compare_digest(device_key, MONITORING_DEVICE_KEY)
     return False
 
 
@@ -106,6 +110,8 @@ def validAuth():
     if check_if_is_device_request():
         g.user = "device_user"
         g.admin = False
+        g.role = "device"
+        g.device_id = request.headers.get('MONITORING_DEVICE_ID')
         g.email = "device@system.local"
         return
     
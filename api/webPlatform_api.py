@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import click
 # import traceback
 # import secrets
 
@@ -21,7 +22,7 @@ from resources.student_class import StudentClassResource
 from resources.student_schedule import StudentScheduleResource
 from resources.teacher_schedule import TeacherScheduleResource
 from resources.class_model import ClassModelResource, ClassResourceSubjectList, ClassResourceTeacherList, ClassResourceTermList, ClassResourcePeriodList, ClassResourceClassroomList  # noqa
-from resources.class_timetable import ClassTimetableResource, ClassConflictsResource
+from resources.class_timetable import ClassTimetableResource, ClassConflictsResource, TimetableGenerateResource
 from resources.classroom_types import ClassroomTypesResource
 from resources.classroom import ClassroomResource
 from resources.department import DepartmentResource
@@ -36,19 +37,23 @@ from resources.teacher_department import TeacherDepartmentResource
 from resources.auth import AuthLoginResource, AuthMeResource
 from resources.assessment_type import AssessmentTypeResource
 from resources.assignment import AssignmentResource, TeacherAssignmentResource
-from resources.grade import GradeResource, GradebookResource
+from resources.grade import GradeResource, GradeBatchResource, GradebookResource, YearGradeRebuildResource
 from resources.student_assignment import StudentAssignmentResource
-from resources.term_grade import TermGradeResource, TermGradeCalculateResource
+from resources.term_grade import TermGradeResource, TermGradeCalculateResource, TermGradeStatusResource
 from resources.grading_criteria import GradingCriteriaResource
 from resources.resource import ResourceResource, ResourceDownloadResource, TeacherResourceResource
 from resources.audit_log import AuditLogResource
-# Import models to ensure they're registered with SQLAlchemy before db.create_all()
+# Import models to ensure they're registered with SQLAlchemy (used by migrate.py)
 from models.resource import ResourceModel  # noqa: F401
 from models.student_mensality import StudentMensalityModel  # noqa: F401
 from models.teacher_salary import TeacherSalaryModel  # noqa: F401
 from models.staff import StaffModel  # noqa: F401
 from models.staff_salary import StaffSalaryModel  # noqa: F401
 from models.audit_log import AuditLogModel  # noqa: F401
+from models.attendance_rollup import AttendanceRollupModel  # noqa: F401
+from models.device_checkin import DeviceCheckinModel  # noqa: F401
+from models.assignment_score_distribution import AssignmentScoreDistributionModel  # noqa: F401
+from models.timetable_snapshot import TimetableSnapshotModel  # noqa: F401
 
 # Get environment variables from Doppler
 POSTGRES_USER = os.getenv("POSTGRES_USER")
@@ -119,53 +124,28 @@ db.init_app(app)
 from audit import init_audit_listener
 init_audit_listener()
 
-# Create postgres tables with error handling
-with app.app_context():
-    db.create_all()
-    # Add year_level_id column to resource table if it doesn't exist
-    # Also make uploaded_by nullable for admin uploads
-    try:
-        from sqlalchemy import text
-        db.session.execute(text("ALTER TABLE resource ADD COLUMN IF NOT EXISTS year_level_id UUID REFERENCES year_level(_id) ON DELETE SET NULL"))
-        db.session.execute(text("CREATE INDEX IF NOT EXISTS idx_resource_year_level_id ON resource(year_level_id)"))
-        # Make uploaded_by nullable if it's not already
-        db.session.execute(text("ALTER TABLE resource ALTER COLUMN uploaded_by DROP NOT NULL"))
-        db.session.commit()
-    except Exception as e:
-        # Column might already exist or table might not exist yet - that's ok
-        db.session.rollback()
-        app.logger.info(f"Resource table migration check: {str(e)}")
-    
-    # Add is_active column to student table if it doesn't exist
-    try:
-        from sqlalchemy import text
-        db.session.execute(text("ALTER TABLE student ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE"))
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        app.logger.info(f"Student is_active column check: {str(e)}")
-    
-    # Add base_salary column to professor table if it doesn't exist
-    try:
-        from sqlalchemy import text
-        db.session.execute(text("ALTER TABLE professor ADD COLUMN IF NOT EXISTS base_salary NUMERIC(10, 2)"))
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        app.logger.info(f"Professor base_salary column check: {str(e)}")
-
-    # Run audit setup (triggers, RLS) after tables exist
-    try:
-        from sqlalchemy import text
-        sql_path = os.path.join(os.path.dirname(__file__), 'sql', 'audit_setup.sql')
-        with open(sql_path, 'r', encoding='utf-8') as f:
-            audit_script = f.read()
-        db.session.execute(text(audit_script))
-        db.session.commit()
-        app.logger.info("Audit triggers and RLS setup completed")
-    except Exception as e:
-        db.session.rollback()
-        app.logger.info(f"Audit setup check: {str(e)}")
+# Background queue for term grade recomputation (needs the app for its worker context)
+from services.grade_recompute_service import grade_recompute_service
+grade_recompute_service.init_app(app)
+
+# Process-wide cache for reference tables (terms, subjects, periods, ...)
+from services.reference_cache import reference_cache
+reference_cache.init_app(app)
+
+# Per-request memo behind the models' find_by_id
+from services.identity_map import identity_map
+identity_map.init_app(app)
+
+# Background drain turning staged device check-ins into attendance
+from services.device_checkin_service import device_checkin_service
+device_checkin_service.init_app(app)
+
+# Short-lived caches for computed responses, dropped on writes to their tables in any worker
+from services.result_cache import init_app as init_result_caches
+init_result_caches(app)
+
+# Schema changes (tables, columns, indexes, audit triggers) are applied once per
+# deploy by `python migrate.py`, not at import time in every worker.
 
 
 # Add authentication middleware
@@ -241,7 +221,9 @@ api.add_resource(ClassResourceTermList, "/class/list/term/<id>")
 api.add_resource(ClassResourcePeriodList, "/class/list/period/<id>")
 api.add_resource(ClassResourceClassroomList, "/class/list/classroom/<id>")
 api.add_resource(ClassTimetableResource, "/class/timetable/<year_level_id>")
-api.add_resource(ClassConflictsResource, "/class/conflicts/<year_level_id>")
+api.add_resource(TimetableGenerateResource, "/class/timetable/generate")
+api.add_resource(ClassConflictsResource, "/class/conflicts",
+                                         "/class/conflicts/<year_level_id>")
 
 api.add_resource(ScoreRangeResource, "/score_range", "/score_range/<id>")
 api.add_resource(StudentGuardianResource, "/student_guardian")
@@ -263,12 +245,21 @@ api.add_resource(AssignmentResource, "/assignment", "/assignment/<assignment_id>
 api.add_resource(TeacherAssignmentResource, "/assignment/teacher")
 api.add_resource(StudentAssignmentResource, "/student/assignments", "/student/assignments/<student_id>")
 api.add_resource(GradeResource, "/grade", "/grade/<grade_id>")
+api.add_resource(GradeBatchResource, "/grade/batch")
 api.add_resource(GradebookResource, "/gradebook/class/<class_id>")
+api.add_resource(YearGradeRebuildResource, "/grade/year/rebuild")
 
 # ========== Phase 4: Attendance System ==========
-from resources.attendance import AttendanceResource, AttendanceRosterResource
+from resources.attendance import (
+    AttendanceResource, AttendanceRosterResource, AttendanceRollupRebuildResource, AttendancePresenceResource
+)
 api.add_resource(AttendanceResource, "/attendance", "/attendance/<attendance_id>")
-api.add_resource(AttendanceRosterResource, "/attendance/roster/<class_id>")
+api.add_resource(AttendanceRosterResource, "/attendance/roster", "/attendance/roster/<class_id>")
+api.add_resource(AttendanceRollupRebuildResource, "/attendance/rollup/rebuild")
+api.add_resource(AttendancePresenceResource, "/attendance/presence")
+
+from resources.device_checkin import DeviceCheckinResource
+api.add_resource(DeviceCheckinResource, "/monitoring_data/checkins")
 
 # Grading Criteria (Admin-only)
 api.add_resource(GradingCriteriaResource, "/grading_criteria", "/grading_criteria/<criteria_id>")
@@ -276,6 +267,7 @@ api.add_resource(GradingCriteriaResource, "/grading_criteria", "/grading_criteri
 # Term Grades
 api.add_resource(TermGradeResource, "/term_grade", "/term_grade/<grade_id>")
 api.add_resource(TermGradeCalculateResource, "/term_grade/calculate")
+api.add_resource(TermGradeStatusResource, "/term_grade/status")
 
 # Teacher Students Performance
 from resources.teacher_students import TeacherStudentsResource
@@ -315,6 +307,23 @@ api.add_resource(StaffSalaryByStaffResource, "/staff_salary/staff/<staff_id>")
 api.add_resource(StaffSalaryGridResource, "/staff_salary/grid")
 api.add_resource(GenerateStaffSalaryResource, "/staff_salary/generate")
 
+
+# ========== Maintenance commands ==========
+@app.cli.command("rebuild-attendance-rollup")
+@click.option("--term-id", default=None, help="Rebuild a single term (default: all terms)")
+def rebuild_attendance_rollup(term_id):
+    """Recompute attendance_rollup from raw attendance rows"""
+    rebuilt = AttendanceRollupModel.rebuild(term_id=term_id)
+    click.echo(f"Rebuilt {rebuilt} attendance rollup rows")
+
+
+@app.cli.command("refresh-score-distributions")
+def refresh_score_distributions():
+    """Recompute assignment_score_distribution from raw grades"""
+    refreshed = AssignmentScoreDistributionModel.refresh()
+    click.echo(f"Refreshed {refreshed} assignment score distributions")
+
+
 if __name__ != '__main__':
     gunicorn_logger = logging.getLogger('gunicorn.error')
     app.logger.handlers = gunicorn_logger.handlers
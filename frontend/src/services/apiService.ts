@@ -69,9 +69,46 @@ class ApiService {
     }
   }
 
+  // List endpoints return bounded pages: follow pagination.next_cursor and
+  // concatenate the pages' item arrays, so callers get the whole listing.
+  // Endpoints asking for an explicit ?limit= get that single page.
+  private async getAllPages<T>(endpoint: string): Promise<ApiResponse<T>> {
+    const first = await this.request<any>(endpoint, { method: 'GET' });
+    if (!first.success || !first.data?.pagination?.next_cursor || /[?&]limit=/.test(endpoint)) {
+      return first as ApiResponse<T>;
+    }
+
+    const merged = { ...first.data };
+    const listKeys = Object.keys(merged).filter((key) => Array.isArray(merged[key]));
+    const separator = endpoint.includes('?') ? '&' : '?';
+    let cursor: string | null = merged.pagination.next_cursor;
+    while (cursor) {
+      const page = await this.request<any>(
+        `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}`,
+        { method: 'GET' }
+      );
+      if (!page.success || !page.data) {
+        return page as ApiResponse<T>;
+      }
+      listKeys.forEach((key) => {
+        merged[key] = merged[key].concat(page.data[key] || []);
+      });
+      if (typeof merged.count === 'number' && typeof page.data.count === 'number') {
+        merged.count += page.data.count;
+      }
+      merged.pagination = page.data.pagination;
+      cursor = page.data.pagination?.next_cursor || null;
+    }
+
+    return {
+      success: true,
+      data: merged,
+    };
+  }
+
   // Generic CRUD methods
   async get<T>(endpoint: string): Promise<ApiResponse<T>> {
-    return this.request<T>(endpoint, { method: 'GET' });
+    return this.getAllPages<T>(endpoint);
   }
 
   async post<T>(endpoint: string, data?: any): Promise<ApiResponse<T>> {